@@ -1,8 +1,18 @@
 from pathlib import Path
-from pymodaq.utils.logger import set_logger  # to be imported by other modules.
-
-from .utils import Config
-config = Config()
 
 with open(str(Path(__file__).parent.joinpath('resources/VERSION')), 'r') as fvers:
     __version__ = fvers.read().strip()
+
+
+def __getattr__(name):
+    # pymodaq loads Qt, so it is only imported once needed: the hardware,
+    # processing and streaming modules then also run headless
+    global config
+    if name == 'set_logger':  # to be imported by other modules.
+        from pymodaq.utils.logger import set_logger
+        return set_logger
+    if name == 'config':
+        from .utils import Config
+        config = Config()
+        return config
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,164 @@
+""" Headless acquisition with the TCSPC Arduino.
+
+Configures the board, acquires histograms (tcspc), count rates (spc) or
+photon tags (tagger) and writes every frame to a file or to stdout, either
+as text lines or in the binary frame format of the stream server. Neither
+Qt nor PyMoDAQ are loaded, so it suits unattended runs and batch jobs:
+
+    tcspc-arduino --port ttyACM0 --mode tcspc --duration 3600 -o run.bin
+"""
+import argparse
+import signal
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.streaming.server import encode_frame, \
+    HISTOGRAMS, TAGS, RATES
+
+
+modes = ['tcspc', 'spc', 'tagger']
+properties = ['threshold', 'bin_size', 'offset', 'n_bins', 'refresh']
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tcspc-arduino',
+        description='Acquire with the TCSPC Arduino without GUI')
+    parser.add_argument('--list-ports', action='store_true',
+                        help='list the serial ports and exit')
+    parser.add_argument('-p', '--port', default=None,
+                        help='serial port, the first one found by default, '
+                             '"" to simulate')
+    parser.add_argument('-b', '--baudrate', type=int,
+                        default=TcspcArduinoController.default_baudrate)
+    parser.add_argument('-m', '--mode', choices=modes, default='tcspc')
+    parser.add_argument('--threshold', type=float, help='mV')
+    parser.add_argument('--bin-size', type=float, help='µs')
+    parser.add_argument('--offset', type=float, help='µs')
+    parser.add_argument('--n-bins', type=int)
+    parser.add_argument('--refresh', type=float, help='s per frame')
+    parser.add_argument('-d', '--duration', type=float, default=0.,
+                        help='s, 0 to acquire until interrupted')
+    parser.add_argument('-n', '--frames', type=int, default=0,
+                        help='number of frames, 0 for no limit')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file, - for stdout')
+    parser.add_argument('-f', '--format', choices=['text', 'binary'],
+                        default=None,
+                        help='text by default on stdout, binary for files')
+    return parser.parse_args(argv)
+
+
+def list_ports(out):
+    for name, port in TcspcArduinoController.available_ports.items():
+        out.write("%s\t%s\n" % (name, port.description))
+
+
+def configure(controller, arguments):
+    controller.timeout = max(1., 2 * (arguments.refresh or 0.))
+    controller.port = arguments.port
+    controller.baudrate = arguments.baudrate
+    controller.connect()
+    if controller.simulating == True:
+        controller.update_simulation_data()
+    for name in properties:
+        value = getattr(arguments, name)
+        if value is not None:
+            setattr(controller, name, value)
+
+
+class FrameWriter:
+    """Writes frames as text lines or binary stream frames"""
+
+    def __init__(self, out, binary, controller):
+        self.out = out
+        self.binary = binary
+        self.controller = controller
+        self.frame = 0
+
+    def write(self, kind, data):
+        self.frame += 1
+        if self.binary:
+            arrays = [data] if kind == TAGS else [np.atleast_1d(data)]
+            self.out.write(encode_frame(kind, arrays, self.frame,
+                                        self.controller._offset,
+                                        self.controller._bin_size))
+        elif kind == TAGS:
+            self.out.write(' '.join(str(t) for t in data['time']) + '\n')
+        else:
+            self.out.write(' '.join('%g' % x for x in np.atleast_1d(data))
+                           + '\n')
+        self.out.flush()
+
+
+def acquire(controller, mode, writer, duration=0., n_frames=0):
+    """Acquire and write frames until duration or n_frames is reached
+
+    Returns
+    -------
+    int: number of frames written
+    """
+    readers = { 'tcspc': (controller.start_tcspc, controller.read_histogram,
+                          HISTOGRAMS),
+                'spc': (controller.start_spc, controller.read_rate, RATES),
+                'tagger': (controller.start_tagger, controller.read_tags,
+                           TAGS) }
+    start, read, kind = readers[mode]
+    end_time = perf_counter() + duration if duration > 0 else None
+    n = 0
+    start()
+    try:
+        while (n_frames <= 0 or n < n_frames) \
+              and (end_time is None or perf_counter() < end_time):
+            writer.write(kind, read())
+            n += 1
+    finally:
+        controller.stop()
+    return n
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    if arguments.list_ports:
+        list_ports(sys.stdout)
+        return 0
+
+    if arguments.port is None:
+        ports = list(TcspcArduinoController.available_ports.keys())
+        arguments.port = ports[0] if len(ports) > 0 else ''
+    controller = TcspcArduinoController()
+    configure(controller, arguments)
+    if controller.simulating == True:
+        sys.stderr.write("No board at '%s', simulating\n" % arguments.port)
+
+    binary = arguments.format == 'binary' \
+        or (arguments.format is None and arguments.output != '-')
+    if arguments.output == '-':
+        out = sys.stdout.buffer if binary else sys.stdout
+    else:
+        out = open(arguments.output, 'wb' if binary else 'w')
+
+    # stop cleanly on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        n = acquire(controller, arguments.mode,
+                    FrameWriter(out, binary, controller), arguments.duration,
+                    arguments.frames)
+    except KeyboardInterrupt:
+        n = None
+    finally:
+        if out is not sys.stdout and out is not sys.stdout.buffer:
+            out.close()
+        if controller.serial is not None:
+            controller.disconnect()
+    if n is not None:
+        sys.stderr.write("%d frames acquired\n" % n)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
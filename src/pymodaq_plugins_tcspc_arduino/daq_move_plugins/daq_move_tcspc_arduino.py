@@ -0,0 +1,173 @@
+from pymodaq.control_modules.move_utility_classes import DAQ_Move_base, \
+    comon_parameters_fun, main, DataActuatorType
+from pymodaq.utils.daq_utils import ThreadCommand
+from pymodaq.utils.data import DataActuator
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller \
+    import TcspcArduinoController
+
+
+class DAQ_Move_tcspc_arduino(DAQ_Move_base):
+    """ Settings of the TCSPC Arduino as actuators, to scan them.
+
+    The axes are the discriminator threshold, the offset and the bin size
+    of the histograms. As a slave of the tcspc_arduino viewer, the plugin
+    shares its controller, so that DAQ_Scan can sweep a setting and grab
+    histograms at every step.
+
+    The controller caches the last value sent to the board: reading the
+    value costs no serial round trip, a move sends a single command and
+    none at all if the value is unchanged, and as the board applies a
+    setting on receipt, moves are done without polling. A value within the
+    epsilon of its axis from the cached one counts as unchanged. The board
+    only accepts settings while idle, so a move during an acquisition is
+    refused.
+
+    Attributes:
+    -----------
+    controller: TcspcArduinoController
+    """
+    _axis_names = ['threshold', 'offset', 'bin_size']
+    _controller_units = ['mV', 'µs', 'µs']
+    # per axis, the epsilon setting follows the selected axis
+    _epsilons = [0.001, 0.0001, 0.0001]
+    is_multiaxes = True
+    data_actuator_type = DataActuatorType.DataActuator
+
+    device_ids = list(TcspcArduinoController.available_ports.keys())
+    default_device_id = \
+        device_ids[0] if len(device_ids) > 0 else ''
+
+    params = [
+        { 'title': 'Device identifier', 'name': 'device_id', 'type': 'str',
+          'limits': device_ids, 'value': default_device_id },
+        { 'title': 'Baudrate', 'name': 'baudrate', 'type': 'list',
+          'limits': TcspcArduinoController.baudrates,
+          'value': TcspcArduinoController.default_baudrate },
+        ] + comon_parameters_fun(is_multiaxes, axis_names=_axis_names,
+                                 epsilon=_epsilons[0])
+
+    def ini_attributes(self):
+        self.controller: TcspcArduinoController = None
+        self.home_values = {}
+
+    def get_actuator_value(self):
+        """Get the current value from the cache of the controller
+
+        Returns
+        -------
+        DataActuator: The position obtained after scaling conversion.
+        """
+        pos = DataActuator(data=getattr(self.controller,
+                                        '_%s' % self.axis_name),
+                           units=self.axis_unit)
+        pos = self.get_position_with_scaling(pos)
+        return pos
+
+    def close(self):
+        """Terminate the communication protocol"""
+        if self.is_master and self.controller.serial is not None:
+            self.controller.disconnect()
+
+    def commit_settings(self, param):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been
+            changed by the user.
+        """
+        if param.name() == "device_id":
+            self.controller.port = param.value()
+        elif param.name() == "baudrate":
+            self.controller.set_baudrate(param.value())
+
+    def ini_stage(self, controller=None):
+        """Actuator communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one
+            actuator by controller (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.ini_stage_init(old_controller=controller,
+                            new_controller=TcspcArduinoController())
+        if self.is_master:
+            self.controller.port = self.settings['device_id']
+            self.controller.baudrate = self.settings['baudrate']
+            self.controller.connect()
+            if self.controller.simulating == True:
+                self.controller.update_simulation_data()
+            else:
+                # fill the cache once, moves only write
+                for name in self._axis_names:
+                    self.controller.get_property(name)
+        # a slave relies on the values the master sent to the board
+        self.home_values = dict((name, getattr(self.controller, '_%s' % name))
+                                for name in self._axis_names)
+
+        info = "TCSPC Arduino settings ready"
+        initialized = True
+        return info, initialized
+
+    def set_value(self, value):
+        """Send a setting if it differs from the cached one"""
+        name = self.axis_name
+        if abs(value - getattr(self.controller, '_%s' % name)) < self.epsilon:
+            return
+        if self.controller.is_acquiring:
+            self.emit_status(ThreadCommand(
+                'Update_Status', ["Cannot change %s during acquisition" % name]))
+            return
+        self.controller.set_property(name, value)
+
+    def move_abs(self, position):
+        """ Move the actuator to the absolute target defined by position
+
+        Parameters
+        ----------
+        position: (DataActuator) value of the absolute target positioning
+        """
+        position = self.check_bound(position)
+        self.target_value = position
+        position = self.set_position_with_scaling(position)
+        self.set_value(position.value())
+
+    def move_rel(self, position):
+        """ Move the actuator to the relative target actuator value defined by position
+
+        Parameters
+        ----------
+        position: (DataActuator) value of the relative target positioning
+        """
+        position = self.check_bound(self.current_value + position) \
+            - self.current_value
+        self.target_value = position + self.current_value
+        position = self.set_position_with_scaling(self.target_value)
+        self.set_value(position.value())
+
+    def move_home(self):
+        """Restore the value at initialisation"""
+        self.target_value = DataActuator(
+            data=self.home_values[self.axis_name], units=self.axis_unit)
+        self.set_value(self.home_values[self.axis_name])
+
+    def poll_moving(self):
+        """The board applies a setting on receipt, no need to poll"""
+        self.ispolling = False
+        super().poll_moving()
+
+    def stop_motion(self):
+        """Settings are applied at once, nothing to stop"""
+        self.move_done()
+
+
+if __name__ == '__main__':
+    main(__file__)
@@ -0,0 +1,189 @@
+import numpy as np
+from pymodaq.utils.daq_utils import ThreadCommand
+from pymodaq.utils.data import DataFromPlugins, Axis, DataToExport
+from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, \
+    comon_parameters, main
+from pymodaq.utils.parameter import Parameter
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller \
+    import TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.bursts import \
+    BinnedBurstSearch
+
+
+class DAQ_0DViewer_tcspc_rate(DAQ_Viewer_base):
+    """ Count rate of the TCSPC Arduino in SPC mode.
+
+    The board sends one count rate per refresh period for as long as the
+    plugin grabs. Every grab returns the rates received since the previous
+    one, so that a slow consumer such as a PID loop never lags behind: the
+    newest rate as 0D data, and all of them as a 1D 'rates' trace whose
+    axis holds the end time (s) of every rate since the start.
+
+    Optionally, bursts are searched in the counts of every refresh period,
+    and the duration and counts of those completed since the previous grab
+    are emitted as 'bursts'.
+
+    Attributes:
+    -----------
+    controller: TcspcArduinoController
+    """
+    live_mode_available = False
+    device_ids = list(TcspcArduinoController.available_ports.keys())
+    default_device_id = \
+        device_ids[0] if len(device_ids) > 0 else ''
+
+    params = comon_parameters+[
+        { 'title': 'Device identifier', 'name': 'device_id', 'type': 'str',
+          'limits': device_ids, 'value': default_device_id },
+        { 'title': 'Baudrate', 'name': 'baudrate', 'type': 'list',
+          'limits': TcspcArduinoController.baudrates,
+          'value': TcspcArduinoController.default_baudrate },
+        { 'title': 'Timeout (s)', 'name': 'timeout', 'type': 'float', 'min': 0.,
+          'value': 1. },
+        { 'title': 'Trigger threshold (mV)', 'name': 'threshold',
+          'type': 'float', 'min': -5., 'max': 5. },
+        { 'title': 'Refresh time (s)', 'name': 'refresh', 'type': 'float',
+          'min': 0.001, 'value': 0.01,
+          'tip': 'Measuring time of one rate, short for fast feedback' },
+        { 'title': 'Bursts', 'name': 'bursts', 'type': 'group',
+          'children': [
+            { 'title': 'Search', 'name': 'search_bursts', 'type': 'bool',
+              'value': False },
+            { 'title': 'Periods per window', 'name': 'n_windows',
+              'type': 'int', 'min': 1, 'value': 3 },
+            { 'title': 'Window threshold', 'name': 'burst_threshold',
+              'type': 'int', 'min': 1, 'value': 50,
+              'tip': 'Fewest counts of a window in a burst' },
+            { 'title': 'Minimum counts', 'name': 'min_burst_counts',
+              'type': 'int', 'min': 0, 'value': 0 },
+        ]},
+        ]
+
+    if len(device_ids) == 0: # simulation
+        params = params + [
+            { 'title': 'Count rate (Hz)', 'name': 'count_rate', 'type': 'int',
+              'min': 1, 'max': 1000000000, 'value': 10000 },
+        ]
+
+    def ini_attributes(self):
+        self.controller: TcspcArduinoController = None
+        self.bursts = None
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been
+            changed by the user.
+        """
+        acquiring = self.controller.is_acquiring
+        if acquiring:
+            # the board only accepts settings while idle
+            self.controller.stop()
+        if param.name() == "device_id":
+            self.controller.port = param.value()
+        elif param.name() == "baudrate":
+            self.controller.set_baudrate(param.value())
+        elif param.name() == "timeout":
+            self.controller.timeout = param.value()
+        elif param.name() in ["threshold", "refresh", "count_rate"]:
+            setattr(self.controller, param.name(), param.value())
+        if param.name() in ["refresh", "search_bursts", "n_windows",
+                            "burst_threshold", "min_burst_counts"]:
+            self.update_bursts()
+        if acquiring:
+            self.controller.start_spc()
+
+    def update_bursts(self):
+        group = self.settings.child('bursts')
+        if not group['search_bursts']:
+            self.bursts = None
+            return
+        self.bursts = BinnedBurstSearch(group['n_windows'],
+                                        group['burst_threshold'],
+                                        self.settings['refresh'],
+                                        group['min_burst_counts'])
+
+    def ini_detector(self, controller=None):
+        """Detector communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one
+            actuator/detector by controller (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.ini_detector_init(old_controller=controller,
+                               new_controller=TcspcArduinoController())
+        if self.settings['controller_status'] == "Master":
+            self.controller.port = self.settings['device_id']
+            self.controller.baudrate = self.settings['baudrate']
+            self.controller.connect()
+            if self.controller.simulating == True:
+                self.controller.update_simulation_data()
+
+        for key in ['timeout', 'refresh'] \
+                + (['count_rate'] if len(self.device_ids) == 0 else []):
+            self.commit_settings(Parameter(name=key, value=self.settings[key]))
+
+        info = "TCSPC Arduino count rate successfully initialised"
+        initialized = True
+        return info, initialized
+
+    def close(self):
+        """Terminate the communication protocol"""
+        if self.controller.is_acquiring:
+            self.controller.stop()
+        if self.controller.serial is not None:
+            self.controller.disconnect()
+
+    def grab_data(self, Naverage=1, **kwargs):
+        """Emit the count rates received since the last grab
+
+        Parameters
+        ----------
+        Naverage: int
+            Not used
+        kwargs: dict
+            others optionals arguments
+        """
+        if not self.controller.is_acquiring:
+            self.controller.start_spc()
+        rates = self.controller.read_rates()
+        end = self.controller.acquisition_counter
+        times = np.arange(end - len(rates) + 1, end + 1) \
+            * self.controller._refresh
+        data = [DataFromPlugins(name='count rate', data=[rates[-1:]],
+                                dim='Data0D', labels=['rate (Hz)']),
+                DataFromPlugins(name='rates', data=[rates], dim='Data1D',
+                                labels=['rate (Hz)'],
+                                axes=[Axis(data=times, label='Time',
+                                           units='s', index=0)])]
+        if self.bursts is not None:
+            bursts = self.bursts.add_counts(
+                np.round(rates * self.controller._refresh))
+            if len(bursts) > 0:
+                data.append(DataFromPlugins(
+                    name='bursts', dim='Data1D',
+                    data=[bursts['duration'], bursts['counts'].astype(float)],
+                    labels=['duration (s)', 'counts'],
+                    axes=[Axis(data=bursts['start'], label='Start',
+                               units='s', index=0)]))
+        self.dte_signal.emit(DataToExport('tcspc_rate', data=data))
+
+    def stop(self):
+        self.controller.stop()
+        self.emit_status(ThreadCommand('Update_Status', ['SPC stopped']))
+        return ''
+
+
+if __name__ == '__main__':
+    main(__file__)
@@ -1,6 +1,8 @@
 import numpy as np
 from datetime import datetime, timedelta
+from pathlib import Path
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from pymodaq.utils.config import get_set_local_dir
 from pymodaq.utils.daq_utils import ThreadCommand
 from pymodaq.utils.data import DataFromPlugins, Axis, DataToExport
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, \
@@ -9,18 +11,105 @@ from pymodaq.utils.parameter import Parameter
 from pymodaq.utils.parameter.utils import iter_children
 from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller \
     import TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.hardware.link_test import LinkSelfTest, \
+    stored_baudrate
+from pymodaq_plugins_tcspc_arduino.processing.bursts import \
+    PhotonBurstSearch
+from pymodaq_plugins_tcspc_arduino.processing.checkpoint \
+    import AccumulationCheckpoint
+from pymodaq_plugins_tcspc_arduino.processing.corrections \
+    import HistogramCorrector
+from pymodaq_plugins_tcspc_arduino.processing.correlation \
+    import MultiTauCorrelator
+from pymodaq_plugins_tcspc_arduino.processing.gates import TimeGates, \
+    parse_gates
+from pymodaq_plugins_tcspc_arduino.processing.kinetics import KineticSeries
+from pymodaq_plugins_tcspc_arduino.processing.precision \
+    import PrecisionEstimator
+from pymodaq_plugins_tcspc_arduino.processing.refresh_tuner \
+    import RefreshTuner
+from pymodaq_plugins_tcspc_arduino.streaming.server import StreamServer
+from pymodaq_plugins_tcspc_arduino.streaming.shared_memory \
+    import HistogramPublisher
 
 
 class TcspcWorker(QObject):
 
     dte_signal = pyqtSignal(DataToExport)
     dte_signal_temp = pyqtSignal(DataToExport)
+    status_signal = pyqtSignal(str)
+    checkpoint_signal = pyqtSignal(float)
+    pipeline_ended = pyqtSignal()
 
     def __init__(self, controller):
         QObject.__init__(self)
         self.controller = controller
         self.worker_running = False
         self._stop = False
+        self.gates = TimeGates()
+        self.precision = None
+        self.min_time = 0.
+        self.refresh_tuner = None
+        self.series = None
+        self.publisher = None
+        self.server = None
+        self.corrector = None
+        self.last_total = None
+        self.checkpoint = None
+        self.resume = False
+
+    def gated_data(self, hist):
+        """Gate intensities and ratios of hist as 0D data, None if no gates"""
+        if self.gates.n_gates == 0:
+            return None
+        self.gates.update(hist)
+        return DataFromPlugins(name='gates',
+                               data=[np.array([v]) for v in self.gates.values()],
+                               dim='Data0D', labels=self.gates.labels)
+
+    def publish(self, hist, total_hist):
+        """Hand the histograms to shared memory and stream clients"""
+        controller = self.controller
+        if self.publisher is not None:
+            self.publisher.publish(hist, total_hist, controller._offset,
+                                   controller._bin_size,
+                                   controller.frame_stats.get('refresh', 0.),
+                                   controller._threshold)
+        if self.server is not None:
+            self.server.send_histograms(hist, total_hist, controller._offset,
+                                        controller._bin_size)
+
+    def checkpoint_settings(self):
+        controller = self.controller
+        return dict(threshold=controller._threshold, offset=controller._offset,
+                    bin_size=controller._bin_size, refresh=controller._refresh)
+
+    def resume_checkpoint(self, checkpoint, total_hist):
+        """Add the last checkpoint to total_hist if resuming and it matches
+
+        Otherwise the checkpoints are cleared for the new accumulation.
+
+        Returns
+        -------
+        (float, int): elapsed time and frame count of the checkpoint
+        """
+        checkpoint.begin()
+        loaded = checkpoint.load() if self.resume else None
+        if loaded is not None:
+            state, hist = loaded
+            settings = self.checkpoint_settings()
+            if len(hist) == len(total_hist) \
+               and all(np.isclose(state[key], settings[key])
+                       for key in ['threshold', 'offset', 'bin_size']):
+                total_hist += hist
+                self.status_signal.emit(
+                    "Resumed %d frames, %.0f s of accumulation"
+                    % (state['n_frames'], state['elapsed']))
+                return state['elapsed'], state['n_frames']
+            self.status_signal.emit("The checkpoint does not match the "
+                                    "settings, starting over")
+        checkpoint.clear()
+        return 0., 0
 
     def start(self, n_bins, max_time, max_counts, x_axis):
         if self.worker_running == True:
@@ -29,31 +118,309 @@ class TcspcWorker(QObject):
         self.worker_running = True
         self._stop = False
         total_hist = np.zeros(n_bins)
+        self.last_total = total_hist
+        checkpoint = self.checkpoint
+        previous_time, n_frames = 0., 0
+        if checkpoint is not None:
+            previous_time, n_frames = self.resume_checkpoint(checkpoint,
+                                                             total_hist)
+            checkpoint_settings = self.checkpoint_settings()
+        corrector = self.corrector
+        corrected_total = np.zeros(n_bins)
+        if corrector is not None and n_frames > 0:
+            # the resumed raw counts, corrected as a single frame
+            corrected_total += corrector.correct(total_hist, previous_time)
+        precision = self.precision
+        tuner = self.refresh_tuner
+        if precision is not None:
+            precision.set_axis(x_axis.get_data())
         self.controller.start_tcspc()
+        start_time = datetime.now()
+        end_time = start_time + timedelta(seconds=max_time - previous_time) \
+            if max_time > 0 else None
+        elapsed = previous_time
+        do_save = False
+
+        try:
+            while not self._stop:
+                hist = np.array(self.controller.read_histogram(), dtype=float)
+                total_hist += hist
+                n_frames += 1
+                elapsed = previous_time \
+                    + (datetime.now() - start_time).total_seconds()
+                self.publish(hist, total_hist)
+                if checkpoint is not None \
+                   and checkpoint.update(total_hist, n_frames, elapsed,
+                                         checkpoint_settings):
+                    self.checkpoint_signal.emit(checkpoint.overhead)
+                do_save = False
+                if end_time is not None and datetime.now() >= end_time:
+                    do_save = True
+                if max_counts > 0 and max(total_hist) >= max_counts:
+                    do_save = True
+                if precision is not None:
+                    relative_precision = \
+                        precision.relative_precision(total_hist)
+                    if elapsed >= self.min_time \
+                       and relative_precision <= precision.target:
+                        do_save = True
+
+                hist_data = [hist,total_hist]
+                dfp = DataFromPlugins(name='tcspc', data=hist_data,
+                                      dim='Data1D',
+                                      labels=['current', 'total'],
+                                      axes=[x_axis], do_save=do_save)
+                data = [dfp]
+                if corrector is not None:
+                    stats = self.controller.frame_stats
+                    corrected = corrector.correct(
+                        hist, stats.get('refresh', self.controller._refresh),
+                        stats.get('cycles'))
+                    corrected_total += corrected
+                    data.append(DataFromPlugins(
+                        name='tcspc corrected',
+                        data=[corrected, corrected_total], dim='Data1D',
+                        labels=['current', 'total'], axes=[x_axis],
+                        do_save=do_save))
+                gated = self.gated_data(total_hist)
+                if gated is not None:
+                    data.append(gated)
+                if precision is not None:
+                    data.append(DataFromPlugins(
+                        name='precision', dim='Data0D',
+                        data=[np.array([relative_precision]),
+                              np.array([elapsed])],
+                        labels=['relative precision', 'acquisition time (s)']))
+                if tuner is not None:
+                    refresh = tuner.update(self.controller.frame_stats, n_bins,
+                                           self.controller.baudrate)
+                    if refresh is not None and not do_save:
+                        self.controller.retune_refresh(refresh)
+                        self.status_signal.emit(tuner.report())
+                    point = tuner.operating_point
+                    data.append(DataFromPlugins(
+                        name='operating point', dim='Data0D',
+                        data=[np.array([v]) for v in point.values()],
+                        labels=list(point.keys())))
+                if do_save == True:
+                    self.dte_signal.emit(DataToExport('tcspc', data=data))
+                    break
+
+                self.dte_signal_temp.emit(DataToExport('tcspc', data=data))
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("Acquisition ended after %d frames: %s"
+                                    % (n_frames, e))
+        finally:
+            self.controller.stop()
+            if checkpoint is not None:
+                # a completed accumulation is not resumed
+                checkpoint.save(total_hist, n_frames, elapsed,
+                                checkpoint_settings, complete=do_save)
+                self.checkpoint_signal.emit(checkpoint.overhead)
+                if checkpoint is not self.checkpoint: # replaced meanwhile
+                    checkpoint.close()
+            self.worker_running = False
+
+    def start_correlation(self, n_channels, n_levels, resolution, max_time):
+        if self.worker_running == True:
+            return
+
+        self.worker_running = True
+        self._stop = False
+        correlator = MultiTauCorrelator(n_channels, n_levels, resolution)
+        lag_axis = Axis(data=correlator.lags * self.controller.tag_resolution,
+                        label='Lag', units='µs')
+        self.controller.start_tagger()
         end_time = datetime.now() + timedelta(seconds=max_time) if max_time > 0 \
             else None
 
-        while not self._stop:
-            hist = np.array(self.controller.read_histogram(), dtype=float)
-            total_hist += hist
-            do_save = False
-            if end_time is not None and datetime.now() >= end_time:
-                do_save = True
-            if max_counts > 0 and max(total_hist) >= max_counts:
-                do_save = True
-
-            hist_data = [hist,total_hist]
-            dfp = DataFromPlugins(name='tcspc', data=hist_data, dim='Data1D',
-                                  labels=['current', 'total'], axes=[x_axis],
-                                  do_save=do_save)
-            if do_save == True:
-                self.dte_signal.emit(DataToExport('tcspc', data=[dfp]))
-                break
-
-            self.dte_signal_temp.emit(DataToExport('tcspc', data=[dfp]))
-
-        self.controller.stop()
-        self.worker_running = False
+        try:
+            while not self._stop:
+                tags = self.controller.read_tags()
+                if self.server is not None:
+                    self.server.send_tags(tags)
+                correlator.add_tags(tags['time'],
+                                    end_time=self.controller.tag_clock)
+                do_save = end_time is not None and datetime.now() >= end_time
+
+                dfp = DataFromPlugins(name='correlation',
+                                      data=[correlator.correlation()],
+                                      dim='Data1D', labels=['g2'],
+                                      axes=[lag_axis], do_save=do_save)
+                if do_save == True:
+                    self.dte_signal.emit(DataToExport('tcspc', data=[dfp]))
+                    break
+
+                self.dte_signal_temp.emit(DataToExport('tcspc', data=[dfp]))
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("Correlation ended: %s" % e)
+        finally:
+            self.controller.stop()
+            self.worker_running = False
+
+    def start_bursts(self, n_photons, window, min_counts, max_time, x_axis):
+        """Search bursts in the tag stream
+
+        Emits the burst-selected decay, from the delays of the tags if they
+        carry them, the number of bursts and the mean burst, and the
+        duration and counts of the bursts completed by every frame.
+        """
+        if self.worker_running == True:
+            return
+
+        self.worker_running = True
+        self._stop = False
+        resolution = self.controller.tag_resolution
+        search = PhotonBurstSearch(n_photons, window / resolution, min_counts,
+                                   len(x_axis.get_data()))
+        durations, counts = 0., 0
+        self.controller.start_tagger()
+        end_time = datetime.now() + timedelta(seconds=max_time) if max_time > 0 \
+            else None
+
+        try:
+            while not self._stop:
+                tags = self.controller.read_tags()
+                if self.server is not None:
+                    self.server.send_tags(tags)
+                bursts = search.add_tags(tags['time'], tags['delay'])
+                durations += resolution * bursts['duration'].sum()
+                counts += bursts['counts'].sum()
+                do_save = end_time is not None and datetime.now() >= end_time
+
+                n_bursts = max(search.n_bursts, 1)
+                data = [DataFromPlugins(name='burst decay',
+                                        data=[search.decay], dim='Data1D',
+                                        labels=['burst photons'],
+                                        axes=[x_axis], do_save=do_save),
+                        DataFromPlugins(name='bursts', dim='Data0D',
+                                        data=[np.array([search.n_bursts]),
+                                              np.array([durations / n_bursts]),
+                                              np.array([counts / n_bursts])],
+                                        labels=['bursts',
+                                                'mean duration (µs)',
+                                                'mean counts'],
+                                        do_save=do_save)]
+                if len(bursts) > 0:
+                    start_axis = Axis(data=resolution * bursts['start'],
+                                      label='Start', units='µs')
+                    data.append(DataFromPlugins(
+                        name='new bursts', dim='Data1D',
+                        data=[resolution * bursts['duration'],
+                              bursts['counts'].astype(float)],
+                        labels=['duration (µs)', 'counts'],
+                        axes=[start_axis]))
+                if do_save == True:
+                    self.dte_signal.emit(DataToExport('tcspc', data=data))
+                    break
+
+                self.dte_signal_temp.emit(DataToExport('tcspc', data=data))
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("Burst search ended: %s" % e)
+        finally:
+            self.controller.stop()
+            self.worker_running = False
+
+    def start_kinetic(self, slice_time, n_slices, display_rows, max_slices,
+                      x_axis):
+        """Accumulate successive time slices into a (slice, delay) array
+
+        While running only the newest display_rows slices are emitted, the
+        whole series once n_slices slices (0 for no limit) are complete.
+        """
+        if self.worker_running == True:
+            return
+
+        self.worker_running = True
+        self._stop = False
+        series = KineticSeries(len(x_axis.get_data()), slice_time,
+                               max_slices=max_slices)
+        self.series = series
+        delay_axis = Axis(data=x_axis.get_data(), label='Delay', units='µs',
+                          index=1)
+        self.controller.start_tcspc()
+
+        try:
+            while not self._stop:
+                hist = self.controller.read_histogram()
+                if series.add(hist,
+                              self.controller.frame_stats['refresh']) == 0:
+                    continue
+                # every coarsening merges pairs of slices
+                do_save = n_slices > 0 \
+                    and series.n_slices * 2 ** series.coarsenings >= n_slices
+                if do_save == True:
+                    self.dte_signal.emit(self.kinetic_data(series.array(),
+                                                           series.times,
+                                                           delay_axis, True))
+                    break
+
+                rows = series.newest(display_rows)
+                self.dte_signal_temp.emit(
+                    self.kinetic_data(rows, series.times[-len(rows):],
+                                      delay_axis))
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("Kinetic series ended: %s" % e)
+        finally:
+            self.controller.stop()
+            self.worker_running = False
+
+    def kinetic_data(self, slices, times, delay_axis, do_save=False):
+        time_axis = Axis(data=times, label='Time', units='s', index=0)
+        dfp = DataFromPlugins(name='kinetics', data=[slices.astype(float)],
+                              dim='Data2D', labels=['counts'],
+                              axes=[time_axis, delay_axis], do_save=do_save)
+        return DataToExport('tcspc', data=[dfp])
+
+    def start_pipeline(self, x_axis):
+        """Emit the frames of an armed acquisition in point order
+
+        The board is stopped and pipeline_ended emitted when the scan is
+        stopped or ends on a link error.
+        """
+        if self.worker_running == True:
+            return
+
+        self.worker_running = True
+        self._stop = False
+        pending = {}
+        next_point = 0
+        try:
+            while not self._stop:
+                frame = self.controller.read_point()
+                if frame is None:
+                    continue
+                index, hist = frame
+                if index < next_point:
+                    self.status_signal.emit("Discarded late frame of point %d"
+                                            % index)
+                    continue
+                pending[index] = hist
+                if index > next_point and next_point not in pending:
+                    self.status_signal.emit("Waiting for point %d, received %d"
+                                            % (next_point, index))
+
+                while next_point in pending:
+                    hist = pending.pop(next_point)
+                    data = [DataFromPlugins(name='TCSPC', data=[hist],
+                                            dim='Data1D', labels=['current'],
+                                            axes=[x_axis]),
+                            DataFromPlugins(name='point', dim='Data0D',
+                                            data=[np.array([next_point])],
+                                            labels=['point index'])]
+                    gated = self.gated_data(hist)
+                    if gated is not None:
+                        data.append(gated)
+                    self.dte_signal.emit(DataToExport('tcspc_arduino',
+                                                      data=data))
+                    next_point += 1
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("Pipelined scan ended at point %d: %s"
+                                    % (next_point, e))
+        finally:
+            self.controller.stop()
+            self.worker_running = False
+            self.pipeline_ended.emit()
 
     def stop(self):
         self._stop = True
@@ -84,7 +451,8 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
     device_ids = list(TcspcArduinoController.available_ports.keys())
     default_device_id = \
         device_ids[0] if len(device_ids) > 0 else ''
-    baudrates = TcspcArduinoController.baudrates
+    baudrates = sorted(set(TcspcArduinoController.baudrates)
+                       | set(LinkSelfTest.candidates))
 
     params = comon_parameters+[
         { 'title': 'Device identifier', 'name': 'device_id', 'type': 'str',
@@ -94,8 +462,30 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
           'value': TcspcArduinoController.default_baudrate },
         { 'title': 'Timeout (s)', 'name': 'timeout', 'type': 'float', 'min': 0.,
           'value': 1. },
+        { 'title': 'Link self-test', 'name': 'link_test', 'type': 'group',
+          'children': [
+            { 'title': 'Run', 'name': 'run_link_test', 'type': 'bool_push',
+              'value': False,
+              'tip': 'Select and store the fastest reliable baud rate' },
+            { 'title': 'Result', 'name': 'link_report', 'type': 'text',
+              'value': '', 'readonly': True },
+        ]},
         { 'title': 'Trigger threshold (mV)', 'name': 'threshold',
           'type': 'float', 'min': -5., 'max': 5. },
+        { 'title': 'Threshold sweep', 'name': 'sweep', 'type': 'group',
+          'children': [
+            { 'title': 'Start (mV)', 'name': 'sweep_start', 'type': 'float',
+              'min': -5., 'max': 5., 'value': -1. },
+            { 'title': 'Stop (mV)', 'name': 'sweep_stop', 'type': 'float',
+              'min': -5., 'max': 5., 'value': 5. },
+            { 'title': 'Step (mV)', 'name': 'sweep_step', 'type': 'float',
+              'min': 0.001, 'value': 0.1 },
+            { 'title': 'Dwell time (s)', 'name': 'dwell', 'type': 'float',
+              'min': 0.001, 'value': 0.1 },
+            { 'title': 'Run', 'name': 'run_sweep', 'type': 'bool_push',
+              'value': False,
+              'tip': 'Measure the counts versus threshold curve' },
+        ]},
         { 'title': 'Bin size (µs)', 'name': 'bin_size', 'type': 'float',
           'min': 0.1 },
         { 'title': 'Offset (µs)', 'name': 'offset', 'type': 'float', 'min': 0. },
@@ -107,6 +497,148 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
           'type': 'int', 'min': 0 },
         { 'title': 'Refresh time (s)', 'name': 'refresh', 'type': 'float',
           'min': 0.1 },
+        { 'title': 'Mode', 'name': 'mode', 'type': 'list',
+          'limits': ['TCSPC', 'Correlation', 'Kinetic', 'Bursts'],
+          'value': 'TCSPC' },
+        { 'title': 'Correlation', 'name': 'correlation', 'type': 'group',
+          'children': [
+            { 'title': 'Channels per level', 'name': 'n_channels',
+              'type': 'int', 'min': 4, 'max': 64, 'step': 2, 'value': 16 },
+            { 'title': 'Number of levels', 'name': 'n_levels', 'type': 'int',
+              'min': 1, 'max': 40, 'value': 20 },
+            { 'title': 'Resolution (ticks)', 'name': 'resolution',
+              'type': 'int', 'min': 1, 'value': 1 },
+        ]},
+        { 'title': 'Bursts', 'name': 'bursts', 'type': 'group',
+          'children': [
+            { 'title': 'Photons per window', 'name': 'n_photons',
+              'type': 'int', 'min': 2, 'value': 10 },
+            { 'title': 'Window (µs)', 'name': 'burst_window', 'type': 'float',
+              'min': 0., 'value': 500.,
+              'tip': 'Longest time of the photons of a window in a burst' },
+            { 'title': 'Minimum counts', 'name': 'min_burst_counts',
+              'type': 'int', 'min': 0, 'value': 30 },
+        ]},
+        { 'title': 'Kinetic series', 'name': 'kinetic', 'type': 'group',
+          'children': [
+            { 'title': 'Slice time (s)', 'name': 'slice_time',
+              'type': 'float', 'min': 0.1, 'value': 1.,
+              'tip': 'Rounded up to whole frames of the refresh time' },
+            { 'title': 'Number of slices', 'name': 'n_slices', 'type': 'int',
+              'min': 0, 'value': 60, 'tip': '0 to acquire until stopped' },
+            { 'title': 'Displayed slices', 'name': 'display_rows',
+              'type': 'int', 'min': 1, 'value': 100 },
+            { 'title': 'Maximum stored slices', 'name': 'max_slices',
+              'type': 'int', 'min': 2, 'value': 4096,
+              'tip': 'Beyond, slices are merged in pairs' },
+            { 'title': 'Re-slice by', 'name': 'reslice', 'type': 'int',
+              'min': 1, 'value': 1,
+              'tip': 'Show the last series with slices summed in groups' },
+        ]},
+        { 'title': 'Corrections', 'name': 'corrections', 'type': 'group',
+          'children': [
+            { 'title': 'Correct', 'name': 'correct', 'type': 'bool',
+              'value': False,
+              'tip': 'Emit corrected histograms next to the raw ones' },
+            { 'title': 'Pile-up', 'name': 'pile_up', 'type': 'bool',
+              'value': True },
+            { 'title': 'Excitation rate (Hz)', 'name': 'excitation_rate',
+              'type': 'float', 'min': 0., 'value': 0.,
+              'tip': 'Trigger rate of the pile-up correction, 0 to skip it' },
+            { 'title': 'Bin nonlinearity', 'name': 'dnl', 'type': 'bool',
+              'value': True },
+            { 'title': 'Take flat field', 'name': 'take_flat_field',
+              'type': 'bool_push', 'value': False,
+              'tip': 'Use the last total histogram, acquired with '
+                     'uncorrelated light, as flat field' },
+            { 'title': 'Flat field', 'name': 'flat_field', 'type': 'led',
+              'value': False, 'readonly': True },
+            { 'title': 'Background', 'name': 'background', 'type': 'bool',
+              'value': True },
+            { 'title': 'Background end (µs)', 'name': 'background_end',
+              'type': 'float', 'min': 0., 'value': 0.,
+              'tip': 'Delay of the excitation, the bins before it give the '
+                     'background' },
+        ]},
+        { 'title': 'Checkpoints', 'name': 'checkpoints', 'type': 'group',
+          'children': [
+            { 'title': 'Enabled', 'name': 'checkpointing', 'type': 'bool',
+              'value': False,
+              'tip': 'Periodically save the total histogram, to resume the '
+                     'accumulation after a crash' },
+            { 'title': 'File', 'name': 'checkpoint_file', 'type': 'str',
+              'value': str(Path(get_set_local_dir())
+                           .joinpath('tcspc_arduino_checkpoint.bin')) },
+            { 'title': 'Interval (s)', 'name': 'checkpoint_interval',
+              'type': 'float', 'min': 0.1, 'value': 10.,
+              'tip': 'Lengthened if checkpoints would take more than 1% '
+                     'of the time' },
+            { 'title': 'Resume', 'name': 'resume', 'type': 'bool',
+              'value': False,
+              'tip': 'Continue the accumulation of the last checkpoint if '
+                     'acquired with the same settings' },
+            { 'title': 'Overhead (%)', 'name': 'checkpoint_overhead',
+              'type': 'float', 'value': 0., 'readonly': True },
+        ]},
+        { 'title': 'Time gates (µs)', 'name': 'gates', 'type': 'str',
+          'value': '',
+          'tip': 'Comma separated start:stop windows, e.g. 0.5:1.5, 1.5:2.5' },
+        { 'title': 'Stopping', 'name': 'stopping', 'type': 'group',
+          'children': [
+            { 'title': 'Stop on', 'name': 'stop_mode', 'type': 'list',
+              'limits': ['Time or counts', 'Precision'],
+              'value': 'Time or counts',
+              'tip': 'With precision, the accumulation time is the upper '
+                     'bound' },
+            { 'title': 'Quantity', 'name': 'quantity', 'type': 'list',
+              'limits': PrecisionEstimator.quantities,
+              'value': 'intensity' },
+            { 'title': 'Relative precision', 'name': 'target',
+              'type': 'float', 'min': 1e-4, 'max': 1., 'value': 0.01 },
+            { 'title': 'Minimum time (s)', 'name': 'min_time',
+              'type': 'float', 'min': 0., 'value': 0. },
+        ]},
+        { 'title': 'Pipelined scan', 'name': 'pipeline', 'type': 'group',
+          'children': [
+            { 'title': 'Enabled', 'name': 'pipelined', 'type': 'bool',
+              'value': False,
+              'tip': 'Keep the board armed and acquire one frame of the '
+                     'refresh time per trigger while the previous one is '
+                     'still being sent' },
+            { 'title': 'Trigger', 'name': 'trigger', 'type': 'list',
+              'limits': ['external', 'software'], 'value': 'external' },
+        ]},
+        { 'title': 'Shared memory', 'name': 'sharing', 'type': 'group',
+          'children': [
+            { 'title': 'Publish', 'name': 'publish', 'type': 'bool',
+              'value': False,
+              'tip': 'Publish current and total histograms for local '
+                     'processes' },
+            { 'title': 'Name', 'name': 'shm_name', 'type': 'str',
+              'value': 'tcspc_arduino' },
+        ]},
+        { 'title': 'Stream server', 'name': 'stream', 'type': 'group',
+          'children': [
+            { 'title': 'Serve', 'name': 'serve', 'type': 'bool',
+              'value': False,
+              'tip': 'Broadcast histograms and tags to local clients' },
+            { 'title': 'Address', 'name': 'address', 'type': 'str',
+              'value': '127.0.0.1:5757',
+              'tip': 'host:port or the path of a Unix socket' },
+            { 'title': 'Frames queued per client', 'name': 'queue_size',
+              'type': 'int', 'min': 1, 'value': 16 },
+        ]},
+        { 'title': 'Adaptive refresh', 'name': 'adaptive_refresh',
+          'type': 'group', 'children': [
+            { 'title': 'Enabled', 'name': 'tune_refresh', 'type': 'bool',
+              'value': False },
+            { 'title': 'Minimum refresh (s)', 'name': 'min_refresh',
+              'type': 'float', 'min': 0.1, 'value': 0.1 },
+            { 'title': 'Maximum refresh (s)', 'name': 'max_refresh',
+              'type': 'float', 'min': 0.1, 'value': 2. },
+            { 'title': 'Target latency (s)', 'name': 'target_latency',
+              'type': 'float', 'min': 0.1, 'value': 0.5 },
+        ]},
         ]
 
     if len(device_ids) == 0: # simulation
@@ -116,15 +648,37 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
             { 'title': 'Time zero (µs)', 'name': 'time_zero', 'type': 'float',
               'min': 0., 'max': 10, 'value': 0.3 },
             { 'title': 'Count rate (Hz)', 'name': 'count_rate', 'type': 'int',
-              'min': 1, 'max': 65535, 'value': 100 },
+              'min': 1, 'max': 1000000000, 'value': 100 },
             { 'title': 'Dark rate (Hz)', 'name': 'dark_rate', 'type': 'int',
               'min': 1, 'max': 1000000000, 'value': 3000000 },
+            { 'title': 'Photon simulation', 'name': 'photons', 'type': 'group',
+              'children': [
+                { 'title': 'Enabled', 'name': 'photon_simulation',
+                  'type': 'bool', 'value': False,
+                  'tip': 'Simulate every photon, with dead times and pile-up' },
+                { 'title': 'Excitation rate (Hz)',
+                  'name': 'sim_excitation_rate', 'type': 'float', 'min': 1.,
+                  'value': 100000.,
+                  'tip': 'Pile-up is corrected with the simulated pulses '
+                         'starting the converter' },
+                { 'title': 'Detector dead time (µs)',
+                  'name': 'detector_dead_time', 'type': 'float', 'min': 0.,
+                  'value': 0.05 },
+                { 'title': 'TDC dead time (µs)', 'name': 'tdc_dead_time',
+                  'type': 'float', 'min': 0., 'value': 2. },
+            ]},
         ]
 
     start_worker = pyqtSignal(int, float, int, Axis)
+    start_correlation = pyqtSignal(int, int, int, float)
+    start_pipeline = pyqtSignal(Axis)
+    start_kinetic = pyqtSignal(float, int, int, int, Axis)
+    start_bursts = pyqtSignal(int, float, int, float, Axis)
 
     def ini_attributes(self):
         self.controller: TcspcArduinoController = None
+        self.armed = False
+        self.corrector = HistogramCorrector()
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -137,9 +691,19 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
         """
 
         if param.name() == "device_id":
-            self.controller.device_id = param.value()
+            self.controller.port = param.value()
         elif param.name() == "baudrate":
-            self.controller.baudrate = param.value()
+            if not self.controller.set_baudrate(param.value()):
+                self.emit_status(ThreadCommand('Update_Status',
+                    ["No link at %d baud" % param.value()]))
+        elif param.name() == "run_link_test":
+            if param.value():
+                self.run_link_test()
+                param.setValue(False)
+        elif param.name() == "run_sweep":
+            if param.value():
+                self.run_sweep()
+                param.setValue(False)
         elif param.name() == "timeout":
             self.controller.timeout = param.value()
         if param.name() == "threshold":
@@ -160,6 +724,39 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
         if param.name() in ["bin_size", "offset", "n_bins"]:
             self.emit_new_x_axis()
 
+        if param.name() in ["gates", "bin_size", "offset", "n_bins"]:
+            self.update_gates()
+
+        if param.name() == "take_flat_field":
+            if param.value():
+                self.take_flat_field()
+                param.setValue(False)
+
+        if param.name() in ["correct", "pile_up", "excitation_rate", "dnl",
+                            "background", "background_end", "bin_size",
+                            "offset", "n_bins"]:
+            self.update_corrections()
+
+        if param.name() in ["publish", "shm_name"]:
+            self.update_publisher()
+
+        if param.name() in ["serve", "address", "queue_size"]:
+            self.update_server()
+
+        if param.name() in ["checkpointing", "checkpoint_file",
+                            "checkpoint_interval", "resume"]:
+            self.update_checkpoint()
+
+        if param.name() == "reslice":
+            self.emit_resliced()
+
+        if param.name() in ["stop_mode", "quantity", "target", "min_time"]:
+            self.update_stopping()
+
+        if param.name() in ["tune_refresh", "min_refresh", "max_refresh",
+                            "target_latency"]:
+            self.update_refresh_tuner()
+
         if len(self.device_ids) == 0: # simulation
             if param.name() == "lifetime":
                 self.controller.lifetime = param.value()
@@ -169,6 +766,9 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
                 self.controller.count_rate = param.value()
             elif param.name() == "dark_rate":
                 self.controller.dark_rate = param.value()
+            elif param.name() in ["photon_simulation", "sim_excitation_rate",
+                                  "detector_dead_time", "tdc_dead_time"]:
+                self.update_photon_simulation()
 
     def ini_detector(self, controller=None):
         """Detector communication initialization
@@ -188,7 +788,14 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
 
         self.ini_detector_init(old_controller=controller,
                                new_controller=TcspcArduinoController())
+        self.controller.port = self.settings['device_id']
+        self.controller.baudrate = self.settings['baudrate']
         self.controller.connect()
+        baudrate = stored_baudrate(self.controller.port,
+                                   self.controller.baudrate)
+        if baudrate != self.controller.baudrate \
+           and self.controller.set_baudrate(baudrate):
+            self.settings.child('baudrate').setValue(baudrate)
 
         self.live = False
         if len(self.device_ids) == 0: # simulation
@@ -197,15 +804,30 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
                         'max_time', 'max_counts', 'refresh']:
                 self.commit_settings(Parameter(name=key,
                                                value=self.settings[key]))
+            self.update_photon_simulation()
           
         self.emit_new_x_axis()
         self.thread = QThread()
         self.worker = TcspcWorker(self.controller)
         self.worker.moveToThread(self.thread)
         self.start_worker.connect(self.worker.start)
+        self.start_correlation.connect(self.worker.start_correlation)
+        self.start_pipeline.connect(self.worker.start_pipeline)
+        self.start_kinetic.connect(self.worker.start_kinetic)
+        self.start_bursts.connect(self.worker.start_bursts)
         self.worker.dte_signal_temp.connect(self.dte_signal_temp)
         self.worker.dte_signal.connect(self.dte_signal)
+        self.worker.status_signal.connect(self.worker_status)
+        self.worker.checkpoint_signal.connect(self.checkpoint_overhead)
+        self.worker.pipeline_ended.connect(self.disarm)
         self.thread.start()
+        self.update_gates()
+        self.update_corrections()
+        self.update_stopping()
+        self.update_refresh_tuner()
+        self.update_publisher()
+        self.update_server()
+        self.update_checkpoint()
 
         info = "TCSPC Arduino successfully initialised"
         initialized = True
@@ -221,9 +843,186 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
                               axes=[self.x_axis])
         self.dte_signal_temp.emit(DataToExport(name='tcspc_arduino', data=[dfp]))
 
+    def update_gates(self):
+        if not hasattr(self, 'worker'):
+            return
+        try:
+            gates = parse_gates(self.settings['gates'])
+        except ValueError as e:
+            self.emit_status(ThreadCommand('Update_Status', [str(e)]))
+            gates = []
+        self.worker.gates.set_gates(gates)
+        self.worker.gates.set_axis(self.settings['offset'],
+                                   self.settings['bin_size'],
+                                   self.settings['n_bins'])
+
+    def update_corrections(self):
+        if not hasattr(self, 'worker'):
+            return
+        group = self.settings.child('corrections')
+        corrector = self.corrector
+        corrector.pile_up = group['pile_up']
+        corrector.excitation_rate = group['excitation_rate']
+        corrector.dnl = group['dnl']
+        corrector.background = group['background']
+        corrector.set_axis(self.controller._offset, self.controller._bin_size,
+                           self.controller._n_bins)
+        corrector.background_end = group['background_end']
+        group.child('flat_field').setValue(corrector.dnl_available)
+        self.worker.corrector = corrector if group['correct'] else None
+
+    def take_flat_field(self):
+        total = self.worker.last_total
+        if total is None or total.sum() == 0:
+            self.emit_status(ThreadCommand('Update_Status',
+                ["Acquire a flat field histogram first"]))
+            return
+        self.corrector.set_flat_field(total, self.controller._offset,
+                                      self.controller._bin_size)
+        self.settings.child('corrections', 'flat_field').setValue(
+            self.corrector.dnl_available)
+
+    def update_stopping(self):
+        if not hasattr(self, 'worker'):
+            return
+        self.worker.min_time = self.settings.child('stopping', 'min_time').value()
+        if self.settings.child('stopping', 'stop_mode').value() != 'Precision':
+            self.worker.precision = None
+            return
+        self.worker.precision = PrecisionEstimator(
+            self.settings.child('stopping', 'quantity').value(),
+            self.settings.child('stopping', 'target').value())
+
+    def update_refresh_tuner(self):
+        if not hasattr(self, 'worker'):
+            return
+        group = self.settings.child('adaptive_refresh')
+        if not group['tune_refresh']:
+            self.worker.refresh_tuner = None
+            return
+        self.worker.refresh_tuner = RefreshTuner(group['min_refresh'],
+                                                 group['max_refresh'],
+                                                 group['target_latency'])
+
+    def update_publisher(self):
+        if not hasattr(self, 'worker'):
+            return
+        if self.worker.publisher is not None:
+            publisher = self.worker.publisher
+            self.worker.publisher = None
+            publisher.close()
+        group = self.settings.child('sharing')
+        if group['publish']:
+            try:
+                self.worker.publisher = HistogramPublisher(group['shm_name'])
+            except (FileExistsError, ValueError) as e:
+                self.emit_status(ThreadCommand('Update_Status', [str(e)]))
+
+    def update_server(self):
+        if not hasattr(self, 'worker'):
+            return
+        if self.worker.server is not None:
+            server = self.worker.server
+            self.worker.server = None
+            server.close()
+        group = self.settings.child('stream')
+        if group['serve']:
+            try:
+                self.worker.server = StreamServer(group['address'],
+                                                  group['queue_size'])
+            except (OSError, ValueError) as e:
+                self.emit_status(ThreadCommand('Update_Status', [str(e)]))
+
+    def update_photon_simulation(self):
+        group = self.settings.child('photons')
+        self.controller.photon_simulation = group['photon_simulation']
+        simulator = self.controller.photon_simulator
+        simulator.excitation_rate = group['sim_excitation_rate']
+        for key in ['detector_dead_time', 'tdc_dead_time']:
+            setattr(simulator, key, group[key])
+
+    def update_checkpoint(self):
+        if not hasattr(self, 'worker'):
+            return
+        group = self.settings.child('checkpoints')
+        self.worker.resume = group['resume']
+        checkpoint = self.worker.checkpoint
+        if checkpoint is not None and group['checkpointing'] \
+           and checkpoint.path == group['checkpoint_file']:
+            checkpoint.interval = group['checkpoint_interval']
+            return
+        self.worker.checkpoint = None
+        # an accumulation in progress closes the one it uses when done
+        if checkpoint is not None and not self.worker.worker_running:
+            checkpoint.close()
+        if group['checkpointing']:
+            try:
+                self.worker.checkpoint = AccumulationCheckpoint(
+                    group['checkpoint_file'], group['checkpoint_interval'])
+            except (OSError, ValueError) as e:
+                self.emit_status(ThreadCommand('Update_Status', [str(e)]))
+
+    def checkpoint_overhead(self, overhead):
+        self.settings.child('checkpoints', 'checkpoint_overhead').setValue(
+            100. * overhead)
+
+    def run_link_test(self):
+        if self.controller.simulating:
+            self.emit_status(ThreadCommand('Update_Status',
+                ["No link to test in simulation"]))
+            return
+        if self.live:
+            self.emit_status(ThreadCommand('Update_Status',
+                ["Stop the acquisition before testing the link"]))
+            return
+        link_test = LinkSelfTest(self.controller)
+        baudrate = link_test.run()
+        self.settings.child('link_test', 'link_report').setValue(
+            link_test.report())
+        self.settings.child('baudrate').setValue(baudrate)
+
+    def run_sweep(self):
+        """Emit the counts versus threshold curve of a device-side sweep"""
+        if self.live or self.controller.is_acquiring:
+            self.emit_status(ThreadCommand('Update_Status',
+                ["Stop the acquisition before sweeping the threshold"]))
+            return
+        group = self.settings.child('sweep')
+        try:
+            thresholds, counts = self.controller.threshold_sweep(
+                group['sweep_start'], group['sweep_stop'], group['sweep_step'],
+                group['dwell'])
+        except TimeoutError as e:
+            self.emit_status(ThreadCommand('Update_Status', [str(e)]))
+            return
+        dfp = DataFromPlugins(name='discriminator',
+                              data=[counts.astype(float)], dim='Data1D',
+                              labels=['counts'],
+                              axes=[Axis(data=thresholds, label='Threshold',
+                                         units='mV')])
+        self.dte_signal.emit(DataToExport('tcspc_arduino', data=[dfp]))
+
+    def disarm(self):
+        """Arm the board again at the next point, the pipeline has ended"""
+        self.armed = False
+
+    def worker_status(self, message):
+        self.emit_status(ThreadCommand('Update_Status', [message]))
+
     def close(self):
         """Terminate the communication protocol"""
-        self.contoller.disconnect()
+        if hasattr(self, 'worker') and self.worker.publisher is not None:
+            self.worker.publisher.close()
+            self.worker.publisher = None
+        if hasattr(self, 'worker') and self.worker.server is not None:
+            self.worker.server.close()
+            self.worker.server = None
+        if hasattr(self, 'worker') and self.worker.checkpoint is not None \
+           and not self.worker.worker_running:
+            self.worker.checkpoint.close()
+            self.worker.checkpoint = None
+        if self.controller.serial is not None:
+            self.controller.disconnect()
 
     def grab_data(self, Naverage=1, **kwargs):
         """Start a grab from the detector
@@ -237,11 +1036,23 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
         kwargs: dict
             others optionals arguments
         """
+        if self.settings['mode'] == 'Correlation':
+            self.grab_correlation(kwargs.get('live', False))
+            return
+        if self.settings['mode'] == 'Kinetic':
+            self.grab_kinetic(kwargs.get('live', False))
+            return
+        if self.settings['mode'] == 'Bursts':
+            self.grab_bursts(kwargs.get('live', False))
+            return
+
+        # from the cached settings, which a slave actuator may have changed,
+        # without querying the board
         data_x_axis = self.controller.get_x_axis()
         self.x_axis = Axis(data=data_x_axis, label='Time', units='µs')
         if 'live' in kwargs:
             if kwargs['live']:
-                self.start_worker.emit(self.controller.n_bins,
+                self.start_worker.emit(self.controller._n_bins,
                                        self.controller.max_time,
                                        self.controller.max_counts, self.x_axis)
                 self.live = True
@@ -251,14 +1062,120 @@ class DAQ_1DViewer_tcspc_arduino(DAQ_Viewer_base):
                 self.live = False
                 self.worker.stop()
 
+        if self.settings.child('pipeline', 'pipelined').value():
+            self.grab_pipelined()
+            return
+
+        if self.worker.precision is not None:
+            # accumulate in the worker until precise enough, it emits the
+            # final histogram with dte_signal
+            self.start_worker.emit(self.controller._n_bins,
+                                   self.controller.max_time,
+                                   self.controller.max_counts, self.x_axis)
+            return
+
         data_tot = self.controller.get_histogram()
         dfp = DataFromPlugins(name='TCSPC', data=data_tot,
                               dim='Data1D', labels=['current'],
                               axes=[self.x_axis])
-        self.dte_signal.emit(DataToExport('tcspc_arduino', data=[dfp]))
+        data = [dfp]
+        gated = self.worker.gated_data(data_tot)
+        if gated is not None:
+            data.append(gated)
+        self.dte_signal.emit(DataToExport('tcspc_arduino', data=data))
+
+    def grab_pipelined(self):
+        """Trigger the next point of a pipelined scan
+
+        The board is armed at the first point and stays armed until the
+        acquisition is stopped; the worker emits the frames in point order.
+        """
+        software = self.settings.child('pipeline', 'trigger').value() \
+            == 'software'
+        if not self.armed:
+            self.controller.arm(external=not software)
+            self.start_pipeline.emit(self.x_axis)
+            self.armed = True
+        if software:
+            self.controller.trigger()
+
+    def grab_correlation(self, live):
+        """Correlate the tag stream in the worker thread
+
+        A live grab runs until stopped or until the accumulation time has
+        elapsed, a single grab for the accumulation time or, if none is set,
+        for one refresh period.
+        """
+        if self.live:
+            self.live = False
+            self.worker.stop()
+
+        max_time = self.controller.max_time
+        if not live and max_time <= 0:
+            max_time = self.settings['refresh']
+        self.start_correlation.emit(
+            self.settings.child('correlation', 'n_channels').value(),
+            self.settings.child('correlation', 'n_levels').value(),
+            self.settings.child('correlation', 'resolution').value(), max_time)
+        self.live = live
+
+    def grab_bursts(self, live):
+        """Search bursts in the tag stream in the worker thread
+
+        Like a correlation, a live grab runs until stopped or until the
+        accumulation time has elapsed, a single grab for the accumulation
+        time or for one refresh period.
+        """
+        if self.live:
+            self.live = False
+            self.worker.stop()
+
+        max_time = self.controller.max_time
+        if not live and max_time <= 0:
+            max_time = self.settings['refresh']
+        group = self.settings.child('bursts')
+        self.x_axis = Axis(data=self.controller.get_x_axis(), label='Time',
+                           units='µs')
+        self.start_bursts.emit(group['n_photons'], group['burst_window'],
+                               group['min_burst_counts'], max_time,
+                               self.x_axis)
+        self.live = live
+
+    def grab_kinetic(self, live):
+        """Acquire a kinetic series in the worker thread
+
+        A live grab runs until stopped, a single grab for the configured
+        number of slices.
+        """
+        if self.live:
+            self.live = False
+            self.worker.stop()
+
+        group = self.settings.child('kinetic')
+        self.x_axis = Axis(data=self.controller.get_x_axis(), label='Time',
+                           units='µs')
+        self.start_kinetic.emit(group['slice_time'],
+                                0 if live else group['n_slices'],
+                                group['display_rows'], group['max_slices'],
+                                self.x_axis)
+        self.live = live
+
+    def emit_resliced(self):
+        """Show the last kinetic series with coarser slices"""
+        if not hasattr(self, 'worker') or self.worker.series is None:
+            return
+        slices, times = self.worker.series.reslice(
+            self.settings.child('kinetic', 'reslice').value())
+        if len(slices) == 0:
+            return
+        delay_axis = Axis(data=self.controller.get_x_axis(), label='Delay',
+                          units='µs', index=1)
+        self.dte_signal_temp.emit(self.worker.kinetic_data(slices, times,
+                                                           delay_axis))
 
     def stop(self):
         self.worker.stop()
+        self.armed = False
         # where should we stop the worker thread? <<--
 #        self.thread.quit()
 #        self.thread.wait()
@@ -0,0 +1,262 @@
+import numpy as np
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from pymodaq.utils.daq_utils import ThreadCommand
+from pymodaq.utils.data import DataFromPlugins, Axis, DataToExport
+from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, \
+    comon_parameters, main
+from pymodaq.utils.parameter import Parameter
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller \
+    import TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.flim import FlimAccumulator
+
+
+class FlimWorker(QObject):
+
+    dte_signal = pyqtSignal(DataToExport)
+    dte_signal_temp = pyqtSignal(DataToExport)
+    status_signal = pyqtSignal(str)
+
+    def __init__(self, controller):
+        QObject.__init__(self)
+        self.controller = controller
+        self.worker_running = False
+        self._stop = False
+        self.accumulator = None
+
+    def start(self, n_frames, x_axis, y_axis, delay_axis):
+        if self.worker_running == True:
+            return
+
+        self.worker_running = True
+        self._stop = False
+        n_x = len(x_axis.get_data())
+        n_y = len(y_axis.get_data())
+        accumulator = FlimAccumulator(n_y, n_x, delay_axis.get_data())
+        self.accumulator = accumulator
+        self.controller.start_flim(n_x, n_y)
+
+        try:
+            while not self._stop:
+                # one line per update, the images are emitted progressively
+                markers, hists = self.controller.read_pixels(n_x)
+                accumulator.add_pixels(markers, hists)
+                do_save = n_frames > 0 \
+                    and accumulator.completed_frames >= n_frames
+
+                images = DataFromPlugins(name='flim',
+                                         data=[accumulator.intensity.copy(),
+                                               accumulator.lifetime()],
+                                         dim='Data2D',
+                                         labels=['intensity', 'lifetime'],
+                                         axes=[y_axis, x_axis],
+                                         do_save=do_save)
+                if do_save == True:
+                    cube = DataFromPlugins(name='cube',
+                                           data=[accumulator.cube],
+                                           dim='DataND', nav_indexes=(0, 1),
+                                           labels=['counts'],
+                                           axes=[y_axis, x_axis, delay_axis])
+                    self.dte_signal.emit(DataToExport('tcspc_flim',
+                                                      data=[images, cube]))
+                    break
+
+                self.dte_signal_temp.emit(DataToExport('tcspc_flim',
+                                                       data=[images]))
+        except (TimeoutError, ValueError, OSError) as e:
+            self.status_signal.emit("FLIM ended after %d frames: %s"
+                                    % (accumulator.completed_frames, e))
+        finally:
+            self.controller.stop()
+            self.worker_running = False
+
+    def stop(self):
+        self._stop = True
+
+
+class DAQ_2DViewer_tcspc_flim(DAQ_Viewer_base):
+    """ Fluorescence lifetime imaging with the TCSPC Arduino.
+
+    The board histograms the photons of every pixel clock period and sends
+    them with line and frame markers. The histograms are assembled into a
+    (y, x, delay) cube while intensity and fast (mean arrival time) lifetime
+    images are emitted line by line. At the end of a single grab the cube is
+    emitted as well.
+
+    Attributes:
+    -----------
+    controller: TcspcArduinoController
+    """
+    live_mode_available = True
+    device_ids = list(TcspcArduinoController.available_ports.keys())
+    default_device_id = \
+        device_ids[0] if len(device_ids) > 0 else ''
+
+    params = comon_parameters+[
+        { 'title': 'Device identifier', 'name': 'device_id', 'type': 'str',
+          'limits': device_ids, 'value': default_device_id },
+        { 'title': 'Baudrate', 'name': 'baudrate', 'type': 'list',
+          'limits': TcspcArduinoController.baudrates,
+          'value': TcspcArduinoController.default_baudrate },
+        { 'title': 'Timeout (s)', 'name': 'timeout', 'type': 'float', 'min': 0.,
+          'value': 1. },
+        { 'title': 'Trigger threshold (mV)', 'name': 'threshold',
+          'type': 'float', 'min': -5., 'max': 5. },
+        { 'title': 'Bin size (µs)', 'name': 'bin_size', 'type': 'float',
+          'min': 0.1 },
+        { 'title': 'Offset (µs)', 'name': 'offset', 'type': 'float', 'min': 0. },
+        { 'title': 'Number of bins', 'name': 'n_bins', 'type': 'int',
+          'min': 10, 'max': 10000, 'value': 100 },
+        { 'title': 'Pixels per line', 'name': 'n_x', 'type': 'int', 'min': 1,
+          'value': 64 },
+        { 'title': 'Lines', 'name': 'n_y', 'type': 'int', 'min': 1,
+          'value': 64 },
+        { 'title': 'Frames per grab', 'name': 'n_frames', 'type': 'int',
+          'min': 1, 'value': 1 },
+        ]
+
+    if len(device_ids) == 0: # simulation
+        params = params + [
+            { 'title': 'Pixel time (s)', 'name': 'pixel_time', 'type': 'float',
+              'min': 0., 'value': 0.001 },
+            { 'title': 'Lifetime (µs)', 'name': 'lifetime', 'type': 'float',
+              'min': 0.001, 'value': 3.5 },
+            { 'title': 'Time zero (µs)', 'name': 'time_zero', 'type': 'float',
+              'min': 0., 'max': 10, 'value': 0.3 },
+            { 'title': 'Count rate (Hz)', 'name': 'count_rate', 'type': 'int',
+              'min': 1, 'max': 65535, 'value': 100 },
+            { 'title': 'Dark rate (Hz)', 'name': 'dark_rate', 'type': 'int',
+              'min': 1, 'max': 1000000000, 'value': 3000000 },
+        ]
+
+    start_worker = pyqtSignal(int, Axis, Axis, Axis)
+
+    def ini_attributes(self):
+        self.controller: TcspcArduinoController = None
+        self.x_axis = None
+        self.y_axis = None
+        self.delay_axis = None
+        self.live = False
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been
+            changed by the user.
+        """
+        if param.name() == "device_id":
+            self.controller.port = param.value()
+        elif param.name() == "baudrate":
+            self.controller.set_baudrate(param.value())
+        elif param.name() == "timeout":
+            self.controller.timeout = param.value()
+        elif param.name() == "pixel_time":
+            self.controller.pixel_time = param.value()
+        elif param.name() in ["threshold", "bin_size", "offset", "n_bins",
+                              "lifetime", "time_zero", "count_rate",
+                              "dark_rate"]:
+            setattr(self.controller, param.name(), param.value())
+
+        if param.name() in ["bin_size", "offset", "n_bins", "n_x", "n_y"]:
+            self.emit_new_axes()
+
+    def ini_detector(self, controller=None):
+        """Detector communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one
+            actuator/detector by controller (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.ini_detector_init(old_controller=controller,
+                               new_controller=TcspcArduinoController())
+        if self.settings['controller_status'] == "Master":
+            self.controller.port = self.settings['device_id']
+            self.controller.baudrate = self.settings['baudrate']
+            self.controller.connect()
+
+        if len(self.device_ids) == 0: # simulation
+            for key in ['pixel_time', 'lifetime', 'time_zero', 'count_rate',
+                        'dark_rate', 'timeout', 'threshold', 'bin_size',
+                        'offset', 'n_bins']:
+                self.commit_settings(Parameter(name=key,
+                                               value=self.settings[key]))
+
+        self.emit_new_axes()
+        self.thread = QThread()
+        self.worker = FlimWorker(self.controller)
+        self.worker.moveToThread(self.thread)
+        self.start_worker.connect(self.worker.start)
+        self.worker.dte_signal_temp.connect(self.dte_signal_temp)
+        self.worker.dte_signal.connect(self.dte_signal)
+        self.worker.status_signal.connect(self.worker_status)
+        self.thread.start()
+
+        info = "TCSPC Arduino FLIM successfully initialised"
+        initialized = True
+        return info, initialized
+
+    def emit_new_axes(self):
+        n_x = self.settings['n_x']
+        n_y = self.settings['n_y']
+        self.x_axis = Axis(data=np.arange(n_x, dtype=float), label='x',
+                           units='pixel', index=1)
+        self.y_axis = Axis(data=np.arange(n_y, dtype=float), label='y',
+                           units='pixel', index=0)
+        self.delay_axis = Axis(data=self.controller.get_x_axis(), label='Time',
+                               units='µs', index=2)
+        dfp = DataFromPlugins(name='flim',
+                              data=[np.zeros((n_y, n_x)), np.zeros((n_y, n_x))],
+                              dim='Data2D', labels=['intensity', 'lifetime'],
+                              axes=[self.y_axis, self.x_axis])
+        self.dte_signal_temp.emit(DataToExport('tcspc_flim', data=[dfp]))
+
+    def worker_status(self, message):
+        self.emit_status(ThreadCommand('Update_Status', [message]))
+
+    def close(self):
+        """Terminate the communication protocol"""
+        if self.controller.serial is not None:
+            self.controller.disconnect()
+
+    def grab_data(self, Naverage=1, **kwargs):
+        """Start a grab from the detector
+
+        A live grab accumulates frames until stopped, a single grab the
+        configured number of frames.
+
+        Parameters
+        ----------
+        Naverage: int
+            Not used
+        kwargs: dict
+            others optionals arguments
+        """
+        if self.live:
+            self.live = False
+            self.worker.stop()
+
+        live = kwargs.get('live', False)
+        n_frames = 0 if live else self.settings['n_frames']
+        self.start_worker.emit(n_frames, self.x_axis, self.y_axis,
+                               self.delay_axis)
+        self.live = live
+
+    def stop(self):
+        self.worker.stop()
+        self.live = False
+        self.emit_status(ThreadCommand('Update_Status', ['FLIM stopped']))
+        return ''
+
+
+if __name__ == '__main__':
+    main(__file__)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import tables
+
+from pymodaq.utils.h5modules.backends import Node, GROUP
+from pymodaq.utils.h5modules.exporter import ExporterFactory, H5Exporter
+
+
+def integer_dtype(minimum, maximum):
+    """Smallest integer dtype holding values between minimum and maximum"""
+    for dtype in [np.uint8, np.uint16, np.uint32, np.uint64] if minimum >= 0 \
+            else [np.int8, np.int16, np.int32, np.int64]:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.float64)
+
+
+def bin_edges(delays):
+    """Bin edges half way between the delays, extrapolated at both ends"""
+    delays = np.asarray(delays, dtype=float)
+    if len(delays) < 2:
+        return np.array([delays[0], delays[0]]) if len(delays) else delays
+    middles = (delays[1:] + delays[:-1]) / 2
+    return np.concatenate(([2 * delays[0] - middles[0]], middles,
+                           [2 * delays[-1] - middles[-1]]))
+
+
+@ExporterFactory.register_exporter()
+class H5TcspcExporter(H5Exporter):
+    """ Exporter of TCSPC data as compact, chunked h5 datasets.
+
+    Counts are stored with the smallest integer dtype holding them and
+    compressed, in chunks spanning whole decays so that the decay of one
+    pixel or scan step is read from a single chunk. Non integral data are
+    kept as float64. Detector settings and the bin edges of the delay axis
+    are stored once, as attributes and arrays of the root group. The data
+    are copied in blocks of at most block_size bytes, so exports of large
+    scans run in bounded memory.
+    """
+
+    FORMAT_DESCRIPTION = "Compact TCSPC h5 file"
+    FORMAT_EXTENSION = "h5"
+
+    block_size = 64 * 2 ** 20
+    chunk_size = 2 ** 16
+    filters = tables.Filters(complevel=4, complib='zlib', shuffle=True)
+
+    def export_data(self, node: Node, filename: str) -> None:
+        arrays = list(self.data_arrays(node))
+        if len(arrays) == 0:
+            raise ValueError("No TCSPC data below %s" % node.path)
+
+        with tables.open_file(str(filename), 'w',
+                              title='TCSPC data exported by PyMoDAQ') as out:
+            root = out.root
+            root._v_attrs['source_file'] = str(node.h5file.filename)
+            root._v_attrs['source_node'] = node.path
+            settings = self.settings(node)
+            if settings is not None:
+                root._v_attrs['settings'] = settings
+            edges = {}
+            for path, array in arrays:
+                where, name = path.rsplit('/', 1) if '/' in path \
+                    else ('', path)
+                dataset = self.copy_array(out, self.get_group(out, where),
+                                          name, array)
+                delays = self.delay_axis(array)
+                if delays is None:
+                    continue
+                key = delays.tobytes()
+                if key not in edges:
+                    edges_name = 'bin_edges' if len(edges) == 0 \
+                        else 'bin_edges_%d' % len(edges)
+                    out.create_array(root, edges_name, bin_edges(delays))
+                    edges[key] = '/' + edges_name
+                dataset._v_attrs['bin_edges'] = edges[key]
+
+    @staticmethod
+    def get_group(out, where):
+        group = out.root
+        for name in [n for n in where.split('/') if n]:
+            group = out.create_group(group, name) \
+                if name not in group else group._f_get_child(name)
+        return group
+
+    def data_arrays(self, node, path=None):
+        """(relative path, node) of every data array at or below node"""
+        if path is None:
+            path = node.name
+        if isinstance(node, GROUP):
+            for name, child in node.children().items():
+                yield from self.data_arrays(child, '%s/%s' % (path, name))
+        elif 'data_type' in node.attrs.attrs_name \
+                and node.attrs['data_type'] == 'data':
+            yield path, node
+
+    @staticmethod
+    def settings(node):
+        """Detector settings of node or of its closest parent"""
+        while node is not None:
+            if 'settings' in node.attrs.attrs_name:
+                return node.attrs['settings']
+            if node.path == '/':
+                return None
+            node = node.parent_node
+        return None
+
+    @staticmethod
+    def delay_axis(array):
+        """Delays of the last data axis from the sibling axis arrays"""
+        shape = tuple(array.attrs['shape'])
+        parent = array.parent_node
+        for child in parent.children().values():
+            if isinstance(child, GROUP) \
+               or 'data_type' not in child.attrs.attrs_name:
+                continue
+            if child.attrs['data_type'] == 'axis' \
+               and child.attrs['index'] == len(shape) - 1 \
+               and tuple(child.attrs['shape'])[-1] == shape[-1]:
+                return np.asarray(child.read(), dtype=float)
+        return None
+
+    def blocks(self, array):
+        """Successive blocks along the first axis"""
+        shape = tuple(array.attrs['shape'])
+        row_size = int(np.prod(shape[1:], dtype=np.int64)) * 8
+        n_rows = max(1, self.block_size // max(row_size, 1))
+        for start in range(0, shape[0], n_rows):
+            yield start, np.asarray(array[start:start + n_rows])
+
+    def copy_array(self, out, group, name, array):
+        shape = tuple(array.attrs['shape'])
+        if len(shape) == 0:
+            return out.create_array(group, name, np.asarray(array.read()))
+
+        # first pass: range and integrality of the values
+        minimum, maximum = 0, 0
+        integral = True
+        for _, block in self.blocks(array):
+            if block.size == 0:
+                continue
+            minimum = min(minimum, block.min())
+            maximum = max(maximum, block.max())
+            integral = integral and bool(np.all(np.mod(block, 1) == 0))
+        dtype = integer_dtype(minimum, maximum) if integral \
+            else np.dtype(np.float64)
+
+        # chunks of whole decays, the delay axis being the last one
+        n_rows = max(1, self.chunk_size // (shape[-1] * dtype.itemsize))
+        chunkshape = (1,) * (len(shape) - 2) \
+            + ((min(n_rows, shape[-2]),) if len(shape) > 1 else ()) \
+            + (shape[-1],)
+        dataset = out.create_carray(group, name,
+                                    atom=tables.Atom.from_dtype(dtype),
+                                    shape=shape, chunkshape=chunkshape,
+                                    filters=self.filters)
+        for start, block in self.blocks(array):
+            dataset[start:start + len(block)] = block.astype(dtype)
+        for key in ['label', 'units', 'nav_indexes', 'data_dimension']:
+            if key in array.attrs.attrs_name:
+                dataset._v_attrs[key] = array.attrs[key]
+        return dataset
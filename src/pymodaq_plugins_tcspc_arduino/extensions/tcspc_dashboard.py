@@ -0,0 +1,354 @@
+from time import perf_counter
+
+import numpy as np
+from qtpy import QtWidgets
+from qtpy.QtCore import QObject, QThread, QTimer, Signal, Slot
+
+from pymodaq.utils import gui_utils as gutils
+from pymodaq.utils.config import Config, get_set_preset_path
+from pymodaq.utils.data import Axis, DataCalculated
+from pymodaq.utils.logger import set_logger, get_module_name
+from pymodaq.utils.plotting.data_viewers.viewer0D import Viewer0D
+from pymodaq.utils.plotting.data_viewers.viewer1D import Viewer1D
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller \
+    import TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.gates import parse_gates
+from pymodaq_plugins_tcspc_arduino.processing.pipeline import TcspcPipeline
+
+
+config = Config()
+logger = set_logger(get_module_name(__file__))
+
+EXTENSION_NAME = 'TCSPC dashboard'
+CLASS_NAME = 'TcspcDashboard'
+
+views = ['decay', 'rate', 'gates', 'lifetime']
+
+
+class DashboardWorker(QObject):
+    """ Runs the shared processing pipeline in its own thread.
+
+    Every frame of the detectors is accumulated, the data of a view are
+    only computed once its refresh period has elapsed and emitted with the
+    time spent computing them. The decay is emitted for the delay range
+    shown by its viewer, with at most max_points points.
+    """
+
+    view_signal = Signal(str, object, float)
+
+    def __init__(self, trace_length=1000):
+        super().__init__()
+        self.pipeline = TcspcPipeline(trace_length)
+        self.periods = dict((view, 0.) for view in views)
+        self.last_update = dict((view, 0.) for view in views)
+        self.view_range = (None, None)
+        self.max_points = 1000
+
+    @Slot(dict)
+    def set_periods(self, periods):
+        self.periods.update(periods)
+
+    @Slot(list)
+    def set_gates(self, gates):
+        self.pipeline.set_gates(gates)
+
+    @Slot(object, int)
+    def set_view_range(self, view_range, max_points):
+        """Show the decay between the delays of view_range at once"""
+        self.view_range = view_range
+        self.max_points = max_points
+        if self.pipeline.n_frames > 0:
+            self.emit_view('decay')
+
+    @Slot(int)
+    def reset(self, trace_length):
+        self.pipeline.trace_length = trace_length
+        self.pipeline.reset()
+
+    @Slot(object, object, float)
+    def process(self, delays, hist, duration):
+        """Accumulate a histogram acquired during duration (s)"""
+        now = perf_counter()
+        self.pipeline.set_axis(delays)
+        self.pipeline.add_frame(hist, duration)
+
+        for view in views:
+            period = self.periods[view]
+            if period is None or now - self.last_update[view] < period:
+                continue
+            self.last_update[view] = now
+            self.emit_view(view)
+
+    def emit_view(self, view):
+        start = perf_counter()
+        data = getattr(self, '%s_data' % view)()
+        if data is not None:
+            self.view_signal.emit(view, data, perf_counter() - start)
+
+    def decay_data(self):
+        delays, current, total, total_min, total_max = \
+            self.pipeline.decay_view(*self.view_range,
+                                     max_points=self.max_points)
+        return DataCalculated('decay',
+                              data=[current, total, total_min, total_max],
+                              labels=['current', 'total', 'total min',
+                                      'total max'],
+                              axes=[Axis('Time', units='µs', data=delays,
+                                         index=0)])
+
+    def rate_data(self):
+        times, rates = self.pipeline.rate_trace()
+        if len(times) < 2:
+            return None
+        return DataCalculated('count rate', data=[rates], labels=['rate (Hz)'],
+                              axes=[Axis('Time', units='s', data=times,
+                                         index=0)])
+
+    def gates_data(self):
+        values = self.pipeline.gate_values()
+        if len(values) == 0:
+            return None
+        return DataCalculated('gates', data=[np.array([v]) for v in values],
+                              labels=self.pipeline.gates.labels)
+
+    def lifetime_data(self):
+        return DataCalculated('lifetime',
+                              data=[np.array([self.pipeline.lifetime()])],
+                              labels=['lifetime (µs)'])
+
+
+class TcspcDashboard(gutils.CustomApp):
+    """ Live views of the TCSPC detectors of the dashboard.
+
+    The extension registers with the controllers of the selected TCSPC
+    detectors and hands every frame they read, displayed or not, to a
+    worker thread, which runs one processing pipeline shared by all views:
+    accumulation, time gates, lifetime estimate and count-rate trace. Each view refreshes at its own maximal rate, and the time spent
+    computing and drawing every view is reported once per second. The
+    decay view only receives the delay range it shows, at the resolution
+    of its display, so panning and zooming long histograms stays smooth.
+    """
+
+    params = [
+        {'title': 'Subscribe:', 'name': 'subscribe', 'type': 'bool',
+         'value': False,
+         'tip': 'Process the frames of the selected detectors'},
+        {'title': 'Gates (µs):', 'name': 'gates', 'type': 'str', 'value': '',
+         'tip': 'start:stop, start:stop, ...'},
+        {'title': 'Trace length:', 'name': 'trace_length', 'type': 'int',
+         'value': 1000, 'min': 2},
+        {'title': 'Decay points:', 'name': 'max_points', 'type': 'int',
+         'value': 1000, 'min': 10,
+         'tip': 'Beyond, bins are merged by powers of two'},
+        {'title': 'Refresh rates (Hz):', 'name': 'rates', 'type': 'group',
+         'tip': '0 to stop refreshing a view', 'children': [
+            {'title': 'Decay:', 'name': 'decay', 'type': 'float',
+             'value': 5., 'min': 0.},
+            {'title': 'Count rate:', 'name': 'rate', 'type': 'float',
+             'value': 2., 'min': 0.},
+            {'title': 'Gates:', 'name': 'gates', 'type': 'float',
+             'value': 1., 'min': 0.},
+            {'title': 'Lifetime:', 'name': 'lifetime', 'type': 'float',
+             'value': 1., 'min': 0.},
+        ]},
+        {'title': 'Refresh cost:', 'name': 'costs', 'type': 'text',
+         'value': '', 'readonly': True},
+    ]
+
+    frame_signal = Signal(object, object, float)
+    periods_signal = Signal(dict)
+    gates_signal = Signal(list)
+    reset_signal = Signal(int)
+    range_signal = Signal(object, int)
+
+    def __init__(self, dockarea, dashboard):
+        super().__init__(dockarea, dashboard)
+        self.viewers = {}
+        self.controllers = []
+        self.costs = dict((view, [0, 0., 0.]) for view in views)
+
+        self.worker = DashboardWorker(self.settings['trace_length'])
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.thread.start()
+
+        self.report_timer = QTimer()
+        self.report_timer.setInterval(1000)
+        self.report_timer.timeout.connect(self.report_costs)
+
+        self.setup_ui()
+        self.update_periods()
+
+    def setup_docks(self):
+        self.docks['settings'] = gutils.Dock('Settings')
+        self.dockarea.addDock(self.docks['settings'])
+        self.docks['settings'].addWidget(self.settings_tree)
+
+        self.docks['modmanager'] = gutils.Dock('Module Manager')
+        self.dockarea.addDock(self.docks['modmanager'], 'bottom',
+                              self.docks['settings'])
+        self.docks['modmanager'].addWidget(self.modules_manager.settings_tree)
+
+        titles = { 'decay': 'Decay', 'rate': 'Count rate', 'gates': 'Gates',
+                   'lifetime': 'Lifetime' }
+        positions = { 'decay': ('right', 'settings'),
+                      'rate': ('bottom', 'decay'),
+                      'gates': ('right', 'decay'),
+                      'lifetime': ('bottom', 'gates') }
+        for view in views:
+            self.docks[view] = gutils.Dock(titles[view])
+            position, relative = positions[view]
+            self.dockarea.addDock(self.docks[view], position,
+                                  self.docks[relative])
+            widget = QtWidgets.QWidget()
+            viewer = Viewer1D if view in ['decay', 'rate'] else Viewer0D
+            self.viewers[view] = viewer(widget)
+            self.docks[view].addWidget(widget)
+
+    def setup_actions(self):
+        self.add_action('reset', 'Reset', 'updateTree',
+                        'Start the accumulation over')
+        self.add_action('quit', 'Quit', 'close2', 'Quit the dashboard')
+
+    def setup_menu(self):
+        pass
+
+    def connect_things(self):
+        self.frame_signal.connect(self.worker.process)
+        self.periods_signal.connect(self.worker.set_periods)
+        self.gates_signal.connect(self.worker.set_gates)
+        self.reset_signal.connect(self.worker.reset)
+        self.range_signal.connect(self.worker.set_view_range)
+        self.viewers['decay'].view.plotitem.vb.sigXRangeChanged.connect(
+            self.decay_range_changed)
+        self.worker.view_signal.connect(self.show_view)
+        self.connect_action('reset', self.reset)
+        self.connect_action('quit', self.quit_fun)
+
+    def value_changed(self, param):
+        # the refresh rates are named after the views, 'gates' among them
+        if param.parent() is not None and param.parent().name() == 'rates':
+            self.update_periods()
+        elif param.name() == 'subscribe':
+            self.subscribe(param.value())
+        elif param.name() == 'gates':
+            self.update_gates()
+        elif param.name() == 'trace_length':
+            self.reset()
+        elif param.name() == 'max_points':
+            self.range_signal.emit(self.worker.view_range,
+                                   self.settings['max_points'])
+
+    def subscribe(self, subscribe):
+        """Feed the frames of the selected detectors to the pipeline
+
+        The grab_done_signal of a detector only carries the data it shows
+        once an acquisition is done, so the extension registers with the
+        controllers of the TCSPC detectors instead, which call it for every
+        frame they read.
+        """
+        for controller in self.controllers:
+            controller.frame_callbacks.remove(self.new_frame)
+        self.controllers = []
+        if subscribe:
+            for detector in self.modules_manager.detectors:
+                controller = getattr(detector, 'controller', None)
+                if isinstance(controller, TcspcArduinoController) \
+                   and controller not in self.controllers:
+                    controller.frame_callbacks.append(self.new_frame)
+                    self.controllers.append(controller)
+            if len(self.controllers) == 0:
+                logger.warning('No initialized TCSPC detector selected')
+            self.report_timer.start()
+        else:
+            self.report_timer.stop()
+
+    def new_frame(self, delays, hist, duration):
+        # called from the acquisition threads
+        self.frame_signal.emit(delays, hist, duration)
+
+    def decay_range_changed(self, view_box, x_range):
+        self.range_signal.emit(tuple(x_range), self.settings['max_points'])
+
+    def update_periods(self):
+        rates = self.settings.child('rates')
+        self.periods_signal.emit(dict(
+            (view, 1. / rates[view] if rates[view] > 0 else None)
+            for view in views))
+
+    def update_gates(self):
+        try:
+            gates = parse_gates(self.settings['gates'])
+        except ValueError as e:
+            logger.warning(str(e))
+            return
+        self.gates_signal.emit(gates)
+
+    def reset(self):
+        self.reset_signal.emit(self.settings['trace_length'])
+
+    def show_view(self, view, data, compute_time):
+        start = perf_counter()
+        self.viewers[view].show_data(data)
+        cost = self.costs[view]
+        cost[0] += 1
+        cost[1] += compute_time
+        cost[2] += perf_counter() - start
+
+    def report_costs(self):
+        """Refresh rate and mean compute and draw times of every view"""
+        lines = []
+        interval = self.report_timer.interval() / 1000
+        for view in views:
+            n, compute, draw = self.costs[view]
+            if n > 0:
+                lines.append('%s: %.1f Hz, compute %.2f ms, draw %.2f ms'
+                             % (view, n / interval, 1e3 * compute / n,
+                                1e3 * draw / n))
+            self.costs[view] = [0, 0., 0.]
+        self.settings.child('costs').setValue('\n'.join(lines))
+
+    def quit_fun(self):
+        self.subscribe(False)
+        self.thread.quit()
+        self.thread.wait()
+        if self.mainwindow is not None:
+            self.mainwindow.close()
+
+
+def main():
+    import sys
+    from pathlib import Path
+    from pymodaq.dashboard import DashBoard
+
+    app = QtWidgets.QApplication(sys.argv)
+    mainwindow = QtWidgets.QMainWindow()
+    dockarea = gutils.DockArea()
+    mainwindow.setCentralWidget(dockarea)
+
+    #  init the dashboard
+    mainwindow_dash = QtWidgets.QMainWindow()
+    area_dash = gutils.DockArea()
+    mainwindow_dash.setCentralWidget(area_dash)
+    dashboard = DashBoard(area_dash)
+    file = Path(get_set_preset_path()).joinpath(
+        f"{config('presets', 'default_preset_for_scan')}.xml")
+    if file.exists():
+        dashboard.set_preset_mode(file)
+    else:
+        msgBox = QtWidgets.QMessageBox()
+        msgBox.setText(f"The default file specified in the configuration file "
+                       f"does not exists!\n{file}\n"
+                       f"Impossible to load the TCSPC dashboard")
+        msgBox.setStandardButtons(msgBox.Ok)
+        msgBox.exec()
+
+    prog = TcspcDashboard(dockarea, dashboard)
+
+    mainwindow.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()
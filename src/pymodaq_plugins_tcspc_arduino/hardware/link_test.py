@@ -0,0 +1,128 @@
+import zlib
+from time import perf_counter
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino import config
+
+
+class LinkSelfTest:
+    """ Finds the fastest reliable baud rate between host and board.
+
+    Every candidate rate is negotiated with the board, the round trip
+    latency is measured with pings and the sustained throughput with a
+    stream of checksummed test frames. The fastest rate without a single
+    corrupted or missing frame is selected and can be stored per port in
+    the plugin configuration.
+
+    Parameters
+    ----------
+    controller: TcspcArduinoController
+        Connected controller, not acquiring.
+    candidates: list of int or None
+        Baud rates to test, default `candidates`.
+    n_frames: int
+        Number of test frames per rate.
+    frame_size: int
+        Payload bytes per test frame.
+    n_pings: int
+        Number of pings for the latency.
+    """
+
+    candidates = [115200, 230400, 460800, 500000, 921600, 1000000, 2000000]
+
+    def __init__(self, controller, candidates=None, n_frames=50,
+                 frame_size=256, n_pings=5):
+        self.controller = controller
+        if candidates is not None:
+            self.candidates = list(candidates)
+        self.n_frames = n_frames
+        self.frame_size = frame_size
+        self.n_pings = n_pings
+        self.results = {}
+
+    def latency(self):
+        times = [self.controller.ping() for _ in range(self.n_pings)]
+        if None in times:
+            return None
+        return float(np.median(times))
+
+    def throughput(self):
+        """Error-free payload bytes per second and number of bad frames"""
+        transport = self.controller.transport
+        transport.write(b'linktest %d %d\r' % (self.n_frames, self.frame_size))
+        start = perf_counter()
+        good_bytes = 0
+        errors = 0
+        for index in range(self.n_frames):
+            line = transport.readline()
+            try:
+                number, payload, crc = line.split()
+                payload = bytes.fromhex(payload.decode())
+                if int(number) != index or int(crc, 16) != zlib.crc32(payload):
+                    errors += 1
+                else:
+                    good_bytes += len(payload)
+            except ValueError:
+                errors += 1
+        elapsed = perf_counter() - start
+        transport.reset_input_buffer()
+        return good_bytes / elapsed, errors
+
+    def measure(self, baudrate):
+        result = { 'baudrate': baudrate, 'reliable': False, 'latency': None,
+                   'throughput': 0., 'errors': None }
+        if not self.controller.set_baudrate(baudrate):
+            return result
+        result['latency'] = self.latency()
+        if result['latency'] is None:
+            return result
+        result['throughput'], result['errors'] = self.throughput()
+        result['reliable'] = result['errors'] == 0
+        return result
+
+    def run(self, store=True):
+        """Test all candidates and switch to the best one.
+
+        Returns
+        -------
+        int: the selected baud rate
+        """
+        if self.controller.simulating:
+            raise RuntimeError("No link to test with a simulated board")
+        original = self.controller.baudrate
+        self.results = {}
+        for baudrate in self.candidates:
+            self.results[baudrate] = self.measure(baudrate)
+
+        reliable = [r for r in self.results.values() if r['reliable']]
+        if len(reliable) > 0:
+            best = max(reliable, key=lambda r: r['throughput'])['baudrate']
+        else:
+            best = original
+        if not self.controller.set_baudrate(best):
+            self.controller.set_baudrate(original)
+            best = original
+        if store:
+            self.store(best)
+        return best
+
+    def store(self, baudrate):
+        config['baudrates', self.controller.port] = baudrate
+        config.save()
+
+    def report(self):
+        lines = []
+        for r in self.results.values():
+            if r['latency'] is None:
+                lines.append("%d baud: no link" % r['baudrate'])
+            else:
+                lines.append("%d baud: %.1f ms round trip, %.0f B/s, %d bad "
+                             "frames" % (r['baudrate'], 1e3 * r['latency'],
+                                         r['throughput'], r['errors']))
+        return '\n'.join(lines)
+
+
+def stored_baudrate(port, default):
+    """Baud rate found by the link self-test for a port, else default"""
+    return config.to_dict().get('baudrates', {}).get(port, default)
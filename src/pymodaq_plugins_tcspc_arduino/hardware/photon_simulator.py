@@ -0,0 +1,202 @@
+import numpy as np
+
+
+tag_dtype = np.dtype([('time', np.int64), ('delay', np.int32)])
+
+
+def dead_time_filter(times, dead_time, keys=None):
+    """ Events kept by a non-paralysable dead time.
+
+    The first event is kept, and every kept event at time t blocks the
+    events of key up to t + dead_time; by default the keys are the event
+    times. The chain of kept events is followed by pointer doubling, in
+    log2 of its length vectorized steps.
+
+    Parameters
+    ----------
+    times: ndarray
+        Sorted event times.
+    dead_time: float
+        Dead time after a kept event, in the units of the times.
+    keys: ndarray or None
+        Sorted times compared to the end of the dead time.
+
+    Returns
+    -------
+    ndarray of bool: mask of the kept events
+    """
+    n = len(times)
+    if keys is None:
+        keys = times
+    kept = np.zeros(n + 1, dtype=bool)
+    if n == 0:
+        return kept[:0]
+    # next event once the dead time after an event is over, n for none
+    jump = np.append(np.searchsorted(keys, times + dead_time,
+                                     side='right'), n)
+    kept[0] = True
+    while True:
+        kept[jump[kept]] = True
+        if jump[0] == n:
+            break
+        jump = jump[jump]
+    return kept[:n]
+
+
+class PhotonSimulator:
+    """ Photon-level Monte Carlo simulation of detector and TDC.
+
+    Excitation pulses arrive every 1 / excitation_rate; fluorescence
+    photons are emitted at rate count_rate (Hz) on average, each time_zero
+    plus an exponential delay of mean lifetime after its pulse, on top of
+    dark counts of rate dark_rate. Photons are drawn in batches of at most
+    batch_size, the ones emitted late enough to fall in the next batch are
+    carried over, as are the dead times running at the end of a batch.
+
+    The detector loses the photons within detector_dead_time after a
+    detected one. In TCSPC mode, the converter is started by a pulse and
+    stopped by the first detected photon, so at most one photon per pulse
+    is timed (pile-up), and it ignores the pulses within tdc_dead_time
+    after a stop. The delay of the stop is histogrammed if it falls in the
+    bins. The pulses starting the converter, those to correct pile-up
+    with, are the pulses of stats minus the ignored ones. In tagger mode,
+    the detected photons are tagged, except within tdc_dead_time after a
+    tag. Count rates are those of the detected photons.
+
+    Times and dead times are in µs, rates in Hz, as the board settings.
+    """
+
+    def __init__(self, lifetime=20., time_zero=0.5, count_rate=10000.,
+                 dark_rate=30000., excitation_rate=100000.,
+                 detector_dead_time=0.05, tdc_dead_time=2., bin_size=0.05,
+                 offset=0.1, n_bins=100, tag_resolution=0.0625,
+                 batch_size=1000000, seed=None):
+        self.lifetime = lifetime
+        self.time_zero = time_zero
+        self.count_rate = count_rate
+        self.dark_rate = dark_rate
+        self.excitation_rate = excitation_rate
+        self.detector_dead_time = detector_dead_time
+        self.tdc_dead_time = tdc_dead_time
+        self.bin_size = bin_size
+        self.offset = offset
+        self.n_bins = n_bins
+        self.tag_resolution = tag_resolution
+        self.batch_size = batch_size
+        self.random_generator = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        """Restart the clock at 0 and forget photons and dead times"""
+        self.time = 0.
+        self._pending = np.zeros(0)
+        self._detector_free = -np.inf
+        self._tdc_free = -np.inf
+        self.stats = { 'pulses': 0, 'ignored': 0, 'emitted': 0,
+                       'detected': 0, 'recorded': 0 }
+
+    @property
+    def period(self):
+        """Excitation period (µs)"""
+        return 1e6 / self.excitation_rate
+
+    def detected_photons(self, duration):
+        """Times (µs) of the photons detected during the next duration (s)
+
+        Advances the clock by duration.
+        """
+        end = self.time + duration * 1e6
+        # expected photons per µs
+        rate = (self.count_rate + self.dark_rate) * 1e-6
+        step = self.batch_size / rate if rate > 0 else end - self.time
+        batches = [self._batch(min(start + step, end))
+                   for start in np.arange(self.time, end, step)]
+        self.time = end
+        return np.concatenate(batches) if batches else np.zeros(0)
+
+    def _batch(self, end):
+        start = self.time
+        rng = self.random_generator
+        period = self.period
+        first, last = np.ceil(start / period), np.ceil(end / period)
+        n_pulses = int(last - first)
+        # Poisson numbers of photons per pulse, uniform over the pulses
+        n_photons = rng.poisson(self.count_rate * 1e-6 * period * n_pulses)
+        pulses = (first + rng.integers(0, max(n_pulses, 1), n_photons)) \
+            * period
+        photons = pulses + self.time_zero \
+            + rng.exponential(self.lifetime, n_photons)
+        dark = rng.uniform(start, end,
+                           rng.poisson(self.dark_rate * 1e-6 * (end - start)))
+        times = np.concatenate((self._pending, photons[photons >= start],
+                                dark))
+        later = times >= end
+        self._pending = times[later]
+        times = np.sort(times[~later])
+        self.time = end
+        self.stats['pulses'] += n_pulses
+        self.stats['emitted'] += len(times)
+
+        times = times[times >= self._detector_free]
+        times = times[dead_time_filter(times, self.detector_dead_time)]
+        if len(times) > 0:
+            self._detector_free = times[-1] + self.detector_dead_time
+        self.stats['detected'] += len(times)
+        return times
+
+    def histogram(self, duration):
+        """Counts per bin of a TCSPC frame of duration (s)"""
+        times = self.detected_photons(duration)
+        period = self.period
+        pulses = np.floor(times / period) * period
+        # the first photon after a pulse stops the converter
+        first = np.concatenate(([True], pulses[1:] != pulses[:-1])) \
+            if len(times) > 0 else np.zeros(0, dtype=bool)
+        times, pulses = times[first], pulses[first]
+        # started only by the pulses once the last stop is converted
+        armed = pulses >= self._tdc_free
+        times, pulses = times[armed], pulses[armed]
+        stops = dead_time_filter(times, self.tdc_dead_time, keys=pulses)
+        times, pulses = times[stops], pulses[stops]
+        if len(times) > 0:
+            self._tdc_free = times[-1] + self.tdc_dead_time
+        self.stats['recorded'] += len(times)
+        # pulses after a stop and before the end of its conversion
+        ignored = np.ceil((times + self.tdc_dead_time) / period) - 1 \
+            - np.rint(pulses / period)
+        self.stats['ignored'] += int(ignored.sum())
+        bins = np.floor((times - pulses - self.offset)
+                        / self.bin_size).astype(np.int64)
+        bins = bins[(bins >= 0) & (bins < self.n_bins)]
+        return np.bincount(bins, minlength=self.n_bins).astype(float)
+
+    def rates(self, refresh, n_rates=1):
+        """Detected count rates (Hz) of n_rates periods of refresh (s)"""
+        start = self.time
+        times = self.detected_photons(refresh * n_rates)
+        periods = np.floor((times - start) / (refresh * 1e6)).astype(np.int64)
+        counts = np.bincount(np.clip(periods, 0, n_rates - 1),
+                             minlength=n_rates)
+        return counts / refresh
+
+    def tags(self, duration):
+        """Time tags of the photons detected during duration (s)
+
+        Returns
+        -------
+        ndarray of tag_dtype: times in ticks of tag_resolution and delays
+            in bins from the last pulse, -1 outside the bins
+        """
+        times = self.detected_photons(duration)
+        times = times[times >= self._tdc_free]
+        times = times[dead_time_filter(times, self.tdc_dead_time)]
+        if len(times) > 0:
+            self._tdc_free = times[-1] + self.tdc_dead_time
+        self.stats['recorded'] += len(times)
+        tags = np.empty(len(times), dtype=tag_dtype)
+        tags['time'] = np.floor(times / self.tag_resolution)
+        delays = np.floor((np.mod(times, self.period) - self.offset)
+                          / self.bin_size)
+        tags['delay'] = np.where((delays >= 0) & (delays < self.n_bins),
+                                 delays, -1)
+        return tags
@@ -0,0 +1,343 @@
+import collections
+import os
+import select
+import threading
+import tty
+import zlib
+from time import sleep, perf_counter
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+class PtyEmulator:
+    """ Stand-in for the board on a pseudo terminal (POSIX only).
+
+    The emulator opens a pty pair and answers commands written to its slave
+    end, so TcspcArduinoController can connect to `port` as to a board and
+    be exercised through its real serial code.
+
+    The link is modelled as well as the protocol: every command is executed
+    `latency` seconds after it arrived, and everything the board sends goes
+    through a transmit buffer of `buffer_size` bytes, emptied at the
+    emulated baud rate. Replies wait for room in the buffer, whereas a
+    frame of an acquisition that does not fit is dropped and counted in
+    `overflows`, as when the host or the line cannot keep up. Above
+    `max_baudrate`, every sent byte is corrupted with probability
+    `error_rate`, which makes the link self-test see what a marginal USB
+    serial link would produce. The corruption is drawn from its own
+    generator seeded by `seed`, so for a given seed the same bytes of the
+    same exchange are corrupted whatever the thread timing.
+
+    The histograms, rates, tags and discriminator counts are drawn from the
+    simulation of a TcspcArduinoController, `model`, which holds the
+    settings of the board; setting its photon_simulation makes them
+    photon by photon, with dead times and pile-up. Supported commands,
+    terminated by a carriage return:
+
+    * ``<property>`` answers the value of a property, ``<property> <value>``
+      sets it; properties are those of the board, threshold, bin_size,
+      offset, n_bins and refresh, and those of the simulated sample,
+      lifetime, time_zero, count_rate and dark_rate. Settings are ignored
+      during an acquisition.
+    * ``record [<n>]`` sends a histogram of n_bins lines every refresh
+      period, n of them or until stopped
+    * ``rate [<n>]`` sends a count rate (Hz) line every refresh period
+    * ``tag [<n>]`` sends every refresh period a line ``<n_tags> <clock>``
+      followed by one line per tag with its time in clock ticks
+    * ``stop`` ends the acquisition and drops the frames not yet sent
+    * ``sweep <start> <stop> <step> <dwell>`` answers ``sweep <n>`` followed
+      by n counts as little endian uint32
+    * ``ping`` answers ``pong``
+    * ``baud <rate>`` answers ``ok`` and switches rate; the new rate is kept
+      only if ``confirm`` (answered by ``ok``) arrives within
+      `confirm_timeout`, otherwise the previous rate is restored
+    * ``linktest <n_frames> <size>`` sends n_frames lines
+      ``<index> <payload hex> <crc32 hex>`` with size random payload bytes
+    """
+
+    properties = ['threshold', 'bin_size', 'offset', 'n_bins', 'refresh',
+                  'lifetime', 'time_zero', 'count_rate', 'dark_rate']
+
+    def __init__(self, baudrate=115200, max_baudrate=460800, error_rate=1e-3,
+                 confirm_timeout=1., latency=0., buffer_size=65536,
+                 seed=None):
+        self.baudrate = baudrate
+        self.max_baudrate = max_baudrate
+        self.error_rate = error_rate
+        self.confirm_timeout = confirm_timeout
+        self.latency = latency
+        self.buffer_size = buffer_size
+        data_seed, line_seed = np.random.SeedSequence(seed).spawn(2)
+        self.random_generator = np.random.default_rng(data_seed)
+        self.line_generator = np.random.default_rng(line_seed)
+        self.model = TcspcArduinoController()
+        self.model.port = ''
+        self.model.connect()
+        self.model.update_simulation_data()
+        self.commands = { 'ping': self.ping, 'baud': self.baud,
+                          'confirm': self.confirm, 'linktest': self.linktest,
+                          'record': self.record, 'rate': self.rate,
+                          'tag': self.tag, 'stop': self.stop_acquisition,
+                          'sweep': self.sweep }
+        self.overflows = 0
+        self.frames_sent = 0
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._transmitter = None
+        self._acquisition = None
+        self._stop_acquisition = threading.Event()
+        self._running = False
+        self._previous_baudrate = None
+        self._confirm_deadline = None
+        # messages waiting in the transmit buffer, and bytes they occupy
+        # together with the one being sent
+        self._queue = collections.deque()
+        self._queued = 0
+        self._buffer_changed = threading.Condition()
+
+    @property
+    def port(self):
+        """Port name relative to /dev as expected by the controller"""
+        return os.ttyname(self._slave)[len('/dev/'):]
+
+    @property
+    def acquiring(self):
+        return self._acquisition is not None and self._acquisition.is_alive()
+
+    def start(self):
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        self._transmitter = threading.Thread(target=self.transmit, daemon=True)
+        self._transmitter.start()
+
+    def stop(self):
+        self.stop_acquisition()
+        self._running = False
+        with self._buffer_changed:
+            self._buffer_changed.notify_all()
+        for thread in (self._thread, self._transmitter):
+            if thread is not None:
+                thread.join()
+        self._thread = self._transmitter = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def run(self):
+        buffer = b''
+        while self._running:
+            self.check_confirmation()
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                buffer += os.read(self._master, 4096)
+            except OSError:
+                break
+            while True:
+                end = min([i for i in (buffer.find(b'\r'), buffer.find(b'\n'))
+                           if i >= 0], default=-1)
+                if end < 0:
+                    break
+                line, buffer = buffer[:end], buffer[end + 1:]
+                if self.latency > 0:
+                    sleep(self.latency)
+                self.execute(line.decode(errors='replace').split())
+
+    def execute(self, words):
+        if len(words) == 0:
+            return
+        if words[0] in self.properties:
+            command, arguments = self.property, words
+        else:
+            command, arguments = self.commands.get(words[0]), words[1:]
+        if command is None:
+            self.send('error unknown command %s' % words[0])
+            return
+        try:
+            command(*arguments)
+        except (TypeError, ValueError) as e:
+            self.send('error %s' % e)
+
+    def queue(self, data, frame=False):
+        """Put data in the transmit buffer, False if dropped
+
+        A reply waits for room in the buffer, a frame that does not fit is
+        dropped. Data larger than the whole buffer waits until it is empty.
+        """
+        with self._buffer_changed:
+            def fits():
+                return self._queued + len(data) <= self.buffer_size \
+                    or self._queued == 0 or not self._running
+            if not fits():
+                if frame:
+                    self.overflows += 1
+                    return False
+                self._buffer_changed.wait_for(fits)
+            self._queue.append((data, frame))
+            self._queued += len(data)
+            self._buffer_changed.notify_all()
+        return True
+
+    def send(self, line):
+        self.queue((line + '\r\n').encode())
+
+    def flush_output(self):
+        """Wait until the transmit buffer is empty"""
+        with self._buffer_changed:
+            self._buffer_changed.wait_for(
+                lambda: self._queued == 0 or not self._running)
+
+    def transmit(self):
+        """Empty the transmit buffer at the baud rate"""
+        chunk = 256
+        while self._running:
+            with self._buffer_changed:
+                self._buffer_changed.wait_for(
+                    lambda: len(self._queue) > 0 or not self._running)
+                if not self._running:
+                    break
+                data, _ = self._queue.popleft()
+            for i in range(0, len(data), chunk):
+                self.write(data[i:i + chunk])
+            with self._buffer_changed:
+                self._queued -= len(data)
+                self._buffer_changed.notify_all()
+
+    def write(self, data):
+        if self.baudrate > self.max_baudrate and self.error_rate > 0:
+            data = bytearray(data)
+            hits = np.flatnonzero(self.line_generator.random(len(data))
+                                  < self.error_rate)
+            for i in hits:
+                data[i] ^= 1 << int(self.line_generator.integers(8))
+            data = bytes(data)
+        # start, 8 data and stop bit per byte on the emulated line
+        duration = 10. * len(data) / self.baudrate
+        start = perf_counter()
+        while len(data) > 0 and self._running:
+            # wait for the host to read rather than block when it does not
+            _, ready, _ = select.select([], [self._master], [], 0.05)
+            if ready:
+                data = data[os.write(self._master, data):]
+        remaining = duration - (perf_counter() - start)
+        if remaining > 0:
+            sleep(remaining)
+
+    def check_confirmation(self):
+        if self._confirm_deadline is not None \
+           and perf_counter() > self._confirm_deadline:
+            self.baudrate = self._previous_baudrate
+            self._confirm_deadline = None
+
+    def ping(self):
+        self.send('pong')
+
+    def baud(self, rate):
+        self.send('ok')
+        # the answer leaves at the old rate
+        self.flush_output()
+        self._previous_baudrate = self.baudrate
+        self.baudrate = int(rate)
+        self._confirm_deadline = perf_counter() + self.confirm_timeout
+
+    def confirm(self):
+        self._confirm_deadline = None
+        self.send('ok')
+
+    def linktest(self, n_frames, size):
+        for index in range(int(n_frames)):
+            payload = self.random_generator.bytes(int(size))
+            self.send('%d %s %08x' % (index, payload.hex(),
+                                      zlib.crc32(payload)))
+
+    def property(self, name, value=None):
+        if value is None:
+            self.send('%.10g' % getattr(self.model, '_%s' % name))
+        elif not self.acquiring:
+            value = type(getattr(self.model, '_%s' % name))(float(value))
+            self.model.set_property(name, value)
+
+    def acquire(self, frame, n_frames):
+        """Queue a frame every refresh period, dropping those not fitting"""
+        next_time = perf_counter()
+        n = 0
+        while n_frames <= 0 or n < n_frames:
+            next_time += self.model._refresh
+            if self._stop_acquisition.wait(max(next_time - perf_counter(), 0)):
+                break
+            if self.queue(frame(), frame=True):
+                self.frames_sent += 1
+            n += 1
+
+    def start_acquisition(self, frame, n_frames):
+        if self.acquiring:
+            return
+        self._stop_acquisition.clear()
+        self._acquisition = threading.Thread(target=self.acquire,
+                                             args=(frame, int(n_frames)),
+                                             daemon=True)
+        self._acquisition.start()
+
+    def histogram_frame(self):
+        counts = self.model.simulated_histogram()
+        return ''.join('%d\r\n' % c for c in counts).encode()
+
+    def rate_frame(self):
+        return ('%.10g\r\n' % self.model.simulated_rates(1)[0]).encode()
+
+    def tag_frame(self):
+        tags = self.model.simulated_tags()
+        return ('%d %d\r\n' % (len(tags), self.model.tag_clock)
+                + ''.join('%d\r\n' % t for t in tags['time'])).encode()
+
+    def record(self, n_frames=0):
+        self.start_acquisition(self.histogram_frame, n_frames)
+
+    def rate(self, n_frames=0):
+        self.start_acquisition(self.rate_frame, n_frames)
+
+    def tag(self, n_frames=0):
+        self.model.tag_clock = 0
+        self.model.photon_simulator.reset()
+        self.start_acquisition(self.tag_frame, n_frames)
+
+    def stop_acquisition(self):
+        self._stop_acquisition.set()
+        if self._acquisition is not None:
+            self._acquisition.join()
+            self._acquisition = None
+        # frames waiting in the buffer are dropped, not the one being sent
+        with self._buffer_changed:
+            frames = [item for item in self._queue if item[1]]
+            for item in frames:
+                self._queue.remove(item)
+            self._queued -= sum(len(data) for data, _ in frames)
+            self._buffer_changed.notify_all()
+
+    def sweep(self, start, stop, step, dwell):
+        if self.acquiring:
+            return
+        dwell = float(dwell)
+        thresholds = TcspcArduinoController.sweep_thresholds(
+            float(start), float(stop), float(step))
+        sleep(len(thresholds) * dwell)
+        counts = self.random_generator.poisson(
+            dwell * self.model.simulated_discriminator_rates(thresholds))
+        self.queue(b'sweep %d\r\n' % len(thresholds)
+                   + counts.astype('<u4').tobytes())
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import select
+from time import perf_counter
+
+
+class SerialTransport:
+    """ Line based, non-blocking access to an open serial port.
+
+    Received bytes are collected in a buffer by non-blocking reads of the
+    port's file descriptor, waited for with select in the blocking methods
+    and with a reader callback of the running event loop in the async ones.
+    Both can therefore be mixed on the same port, and several ports can be
+    read concurrently on one event loop. Ports without file descriptor
+    (Windows) are read in an executor thread instead.
+
+    Parameters
+    ----------
+    serial: serial.Serial
+        Open port, its timeout is the default timeout of the reads.
+    """
+
+    def __init__(self, serial):
+        self.serial = serial
+        self._buffer = bytearray()
+        try:
+            self.fd = serial.fileno()
+        except AttributeError:
+            self.fd = None
+
+    @property
+    def timeout(self):
+        return self.serial.timeout
+
+    def write(self, data):
+        self.serial.write(data)
+        self.serial.flush()
+
+    def reset_input_buffer(self):
+        self._buffer.clear()
+        self.serial.reset_input_buffer()
+
+    def _read_available(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        self._buffer += data
+
+    def _pop_lines(self, n_lines):
+        lines = []
+        start = 0
+        while len(lines) < n_lines:
+            end = self._buffer.find(b'\n', start)
+            if end < 0:
+                break
+            lines.append(bytes(self._buffer[start:end + 1]))
+            start = end + 1
+        del self._buffer[:start]
+        return lines
+
+    def _pop_bytes(self, n_bytes):
+        data = bytes(self._buffer[:n_bytes])
+        del self._buffer[:n_bytes]
+        return data
+
+    def _pop_rest(self):
+        rest = bytes(self._buffer)
+        self._buffer.clear()
+        return rest
+
+    def readlines(self, n_lines, timeout=None):
+        """Read n_lines lines, fewer if the timeout (s) expires
+
+        As with pyserial, an incomplete last line is returned on timeout.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if self.fd is None:
+            lines = self._pop_lines(n_lines)
+            while len(lines) < n_lines:
+                line = self.serial.readline()
+                lines.append(line)
+                if not line.endswith(b'\n'):
+                    break
+            return lines
+
+        end_time = None if timeout is None else perf_counter() + timeout
+        lines = self._pop_lines(n_lines)
+        while len(lines) < n_lines:
+            remaining = None if end_time is None \
+                else max(end_time - perf_counter(), 0.)
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if len(ready) == 0:
+                lines.append(self._pop_rest())
+                break
+            self._read_available()
+            lines += self._pop_lines(n_lines - len(lines))
+        return lines
+
+    def readline(self, timeout=None):
+        return self.readlines(1, timeout)[0]
+
+    def read_bytes(self, n_bytes, timeout=None):
+        """Read n_bytes bytes of binary data, fewer if the timeout expires"""
+        if timeout is None:
+            timeout = self.timeout
+        if self.fd is None:
+            data = self._pop_bytes(n_bytes)
+            return data + self.serial.read(n_bytes - len(data))
+
+        end_time = None if timeout is None else perf_counter() + timeout
+        while len(self._buffer) < n_bytes:
+            remaining = None if end_time is None \
+                else max(end_time - perf_counter(), 0.)
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if len(ready) == 0:
+                break
+            self._read_available()
+        return self._pop_bytes(n_bytes)
+
+    def pending_lines(self):
+        """Complete lines received so far, without waiting"""
+        if self.fd is None:
+            if self.serial.in_waiting > 0:
+                self._buffer += self.serial.read(self.serial.in_waiting)
+        else:
+            ready, _, _ = select.select([self.fd], [], [], 0)
+            if len(ready) > 0:
+                self._read_available()
+        return self._pop_lines(self._buffer.count(b'\n'))
+
+    async def _wait_readable(self, timeout):
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+
+        def on_readable():
+            if not readable.done():
+                readable.set_result(None)
+
+        loop.add_reader(self.fd, on_readable)
+        try:
+            await asyncio.wait_for(readable, timeout)
+        finally:
+            loop.remove_reader(self.fd)
+
+    async def readlines_async(self, n_lines, timeout=None):
+        """Await n_lines lines, fewer if the timeout (s) expires"""
+        if timeout is None:
+            timeout = self.timeout
+        if self.fd is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.readlines, n_lines, timeout)
+
+        end_time = None if timeout is None else perf_counter() + timeout
+        lines = self._pop_lines(n_lines)
+        while len(lines) < n_lines:
+            remaining = None if end_time is None \
+                else max(end_time - perf_counter(), 0.)
+            try:
+                await self._wait_readable(remaining)
+            except asyncio.TimeoutError:
+                lines.append(self._pop_rest())
+                break
+            self._read_available()
+            lines += self._pop_lines(n_lines - len(lines))
+        return lines
+
+    async def readline_async(self, timeout=None):
+        return (await self.readlines_async(1, timeout))[0]
+
+    async def read_bytes_async(self, n_bytes, timeout=None):
+        """Await n_bytes bytes of binary data, fewer if the timeout expires"""
+        if timeout is None:
+            timeout = self.timeout
+        if self.fd is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.read_bytes, n_bytes, timeout)
+
+        end_time = None if timeout is None else perf_counter() + timeout
+        while len(self._buffer) < n_bytes:
+            remaining = None if end_time is None \
+                else max(end_time - perf_counter(), 0.)
+            try:
+                await self._wait_readable(remaining)
+            except asyncio.TimeoutError:
+                break
+            self._read_available()
+        return self._pop_bytes(n_bytes)
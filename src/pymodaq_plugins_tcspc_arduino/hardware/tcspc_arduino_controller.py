@@ -1,24 +1,40 @@
+import asyncio
+import math
 import numpy as np
-import io
+import queue
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
 from serial import Serial
-from time import sleep
-from PyQt5.QtSerialPort import QSerialPortInfo
-from pymodaq.utils.data import DataToExport
+from serial.tools.list_ports import comports
+from time import sleep, perf_counter
+from pymodaq_plugins_tcspc_arduino.hardware.photon_simulator import \
+    PhotonSimulator
+from pymodaq_plugins_tcspc_arduino.hardware.serial_transport import \
+    SerialTransport
 
 
 class TcspcArduinoController:
 
-    available_ports = { port.portName(): port \
-                        for port in QSerialPortInfo.availablePorts() }
-    baudrates = QSerialPortInfo.standardBaudRates()
+    # enumerated with pyserial, so that the controller does not need Qt
+    available_ports = { port.name: port for port in comports() }
+    baudrates = list(Serial.BAUDRATES)
     default_baudrate = 115200
+    baud_confirm_timeout = 1.
 
     TAGGER = 0
     SPC    = 1
     TCSPC  = 2
+    FLIM   = 3
+
+    tag_dtype = np.dtype([('time', np.int64), ('delay', np.int32)])
 
     def __init__(self):
         self.serial = None
+        self.transport = None
+        self._loops = threading.local()
+        # one query or setting on the line at a time, across threads
+        self._property_lock = threading.Lock()
         self.simulating = False
         self.port = '/dev/ttyACM0'
         self.baudrate = 115200
@@ -39,6 +55,28 @@ class TcspcArduinoController:
         self._dark_rate = 30000
         self.random_generator = np.random.default_rng()
         self.acquisition_counter = 0
+        self.tag_resolution = 0.0625 # µs per tick of the tagger clock
+        self.tag_clock = 0
+        self.frame_stats = {}
+        self.pixel_time = 0.001 # s, pixel clock period of the simulation
+        self._flim_shape = (1, 1)
+        self._flim_position = -1
+        self._next_point = 0
+        self._triggers = queue.Queue()
+        self._rate_time = 0.
+        # discriminator of the simulation: photon pulse heights and
+        # electronic noise (mV), and the noise crossing rate at 0 mV (Hz)
+        self.pulse_height = 2.
+        self.pulse_spread = 0.7
+        self.noise_level = 0.3
+        self.noise_rate = 1e6
+        # photon by photon simulation with dead times and pile-up instead
+        # of Poisson counts of the expected decay
+        self.photon_simulation = False
+        self.photon_simulator = PhotonSimulator()
+        # called with the delays, the histogram and the duration (s) of
+        # every TCSPC frame read, whichever module runs the acquisition
+        self.frame_callbacks = []
 
     def connect(self):
         if len(self.port) > 0:
@@ -47,8 +85,7 @@ class TcspcArduinoController:
             try:
                 self.serial = Serial("/dev/%s" % self.port, self.baudrate,
                                      timeout=self.timeout)
-                self.sio = io.TextIOWrapper(io.BufferedRWPair(self.serial,
-                                                              self.serial))
+                self.transport = SerialTransport(self.serial)
                 self.simulating = False
             except:
                 self.simulating = True
@@ -57,80 +94,463 @@ class TcspcArduinoController:
 
     def disconnect(self):
         self.serial.close()
-        self.sio = None
+        self.transport = None
         self.serial = None
 
+    def _run(self, coroutine):
+        """Run a coroutine of the async API from synchronous code.
+
+        Every thread uses its own event loop, so the synchronous methods
+        must not be called from a running event loop.
+        """
+        loop = getattr(self._loops, 'loop', None)
+        if loop is None:
+            loop = self._loops.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(coroutine)
+
+    def ping(self):
+        """Round trip time (s) of a ping command, None without answer"""
+        if self.simulating == True:
+            return 0.
+        start = perf_counter()
+        self.transport.write(b'ping\r')
+        if self.transport.readline().strip() != b'pong':
+            return None
+        return perf_counter() - start
+
+    def set_baudrate(self, baudrate):
+        """Switch board and serial port to another baud rate.
+
+        The board answers at the old rate, switches and keeps the new rate
+        only if it receives a confirmation within baud_confirm_timeout. Returns False
+        and falls back to the old rate if the link does not work.
+        """
+        if self.simulating == True or self.serial is None:
+            self.baudrate = baudrate
+            return True
+        if self.is_acquiring == True:
+            raise RuntimeError("Must not change baud rate during acquisition")
+        if baudrate == self.serial.baudrate:
+            self.baudrate = baudrate
+            return True
+        self.transport.write(b'baud %d\r' % baudrate)
+        if self.transport.readline().strip() != b'ok':
+            return False
+        old_baudrate = self.serial.baudrate
+        self.serial.baudrate = baudrate
+        if self.ping() is not None:
+            self.transport.write(b'confirm\r')
+            if self.transport.readline().strip() == b'ok':
+                self.baudrate = baudrate
+                return True
+        sleep(1.5 * self.baud_confirm_timeout)
+        self.serial.baudrate = old_baudrate
+        self.transport.reset_input_buffer()
+        return False
+
     def start_tcspc(self):
         self.is_acquiring = True
         self.total_hist = np.zeros(self._n_bins)
         if self.simulating == False:
-            self.sio.write(r'record\r')
+            # frames of a previous acquisition still in the input buffer
+            self.transport.reset_input_buffer()
+            self.transport.write(b'record\r')
         self.start_time = datetime.now() if self.max_time > 0 else None
         self.acquisition_counter = 0
 
     def start_spc(self):
         self.is_acquiring = True
         if self.simulating == False:
-            self.sio.write(r'rate\r')
+            self.transport.reset_input_buffer()
+            self.transport.write(b'rate\r')
+        self.acquisition_counter = 0
+        self._rate_time = perf_counter()
+
+    def start_tagger(self):
+        self.is_acquiring = True
+        if self.simulating == False:
+            self.transport.reset_input_buffer()
+            self.transport.write(b'tag\r')
+        self.acquisition_counter = 0
+        self.tag_clock = 0
+        self.photon_simulator.reset()
+
+    def start_flim(self, n_x, n_y):
+        self.is_acquiring = True
+        self._flim_shape = (n_y, n_x)
+        self._flim_position = -1
+        if self.simulating == False:
+            self.transport.reset_input_buffer()
+            self.transport.write(b'flim\r')
+        self.acquisition_counter = 0
+
+    def arm(self, external=True):
+        """Acquire one frame of the refresh time per trigger until stopped.
+
+        The board double buffers the frames: a trigger arriving while the
+        previous frame is still being sent starts the next one immediately.
+        Every frame is sent as a line 'point <index>' followed by the n_bins
+        lines of its histogram. With external=False the board waits for
+        trigger commands instead of its trigger input.
+        """
+        self.is_acquiring = True
+        self._next_point = 0
+        if self.simulating == True:
+            self._triggers = queue.Queue()
+        else:
+            self.transport.write(b'arm %s\r' % (b'external' if external
+                                                else b'software'))
         self.acquisition_counter = 0
 
+    def trigger(self):
+        """Software trigger of an armed acquisition"""
+        if self.simulating == True:
+            self._triggers.put(perf_counter())
+        else:
+            self.transport.write(b'trigger\r')
+
+    def read_point(self):
+        """Read the next triggered frame of an armed acquisition.
+
+        Returns
+        -------
+        (int, ndarray) point index and histogram, None if no frame arrived
+        within the timeout
+        """
+        if self.simulating == True:
+            try:
+                self._triggers.get(timeout=self.timeout)
+            except queue.Empty:
+                return None
+            sleep(self._refresh)
+            index = self._next_point
+            self._next_point += 1
+            self.acquisition_counter += 1
+            hist = self.simulated_histogram()
+            self._publish_frame(hist)
+            return index, hist
+
+        header = self.transport.readline().split()
+        if len(header) != 2 or header[0] != b'point':
+            return None
+        hist = self._parse_lines(self.transport.readlines(
+            self._n_bins, self.histogram_timeout()), self._n_bins)
+        self.acquisition_counter += 1
+        self._publish_frame(hist)
+        return int(header[1]), hist
+
+    def retune_refresh(self, refresh):
+        """Change the refresh time of a running TCSPC acquisition.
+
+        The board only accepts settings while idle, so the acquisition is
+        stopped and restarted between two frames.
+        """
+        if self.simulating == True:
+            self._refresh = refresh
+            return
+        self.stop()
+        self.set_property('refresh', refresh)
+        self.start_tcspc()
+
     def stop(self):
         self.is_acquiring = False
         if self.simulating == False:
-            self.sio.write(r'stop\r')
+            self.transport.write(b'stop\r')
 
     def get_x_axis(self):
         return np.linspace(self._offset,
                            self._offset + self._n_bins * self._bin_size,
                            self._n_bins)
 
-    def read_histogram(self):
+    def histogram_timeout(self):
+        """Time (s) to wait for the bins of a histogram after the first one
+
+        The read timeout plus the transfer time at the baud rate of n_bins
+        lines of at most 10 digits, as a histogram may take longer than the
+        timeout to cross a slow line.
+        """
+        return self.transfer_timeout(self._n_bins)
+
+    def transfer_timeout(self, n_lines):
+        """Read timeout plus the transfer time of n_lines of 10 digits"""
+        return self.transport.timeout \
+            + 10 * 12 * n_lines / self.serial.baudrate
+
+    @staticmethod
+    def _parse_lines(lines, n_values, dtype=float):
+        """Values of a frame of n_values lines, one value per line"""
+        values = np.array(b''.join(lines).split(), dtype=dtype)
+        if len(lines) != n_values or len(values) != n_values:
+            raise TimeoutError("Incomplete frame")
+        return values
+
+    def _publish_frame(self, hist):
+        for callback in list(self.frame_callbacks):
+            callback(self.get_x_axis(), hist, self._refresh)
+
+    async def read_histogram_async(self):
+        """Read one frame, recording its timing and size in frame_stats"""
         self.acquisition_counter += 1
         if self.simulating == True:
-            sleep(self._refresh)
-            counts = self.random_generator.poisson(self.simulation_data)
-            return np.array(counts, dtype=float)
-
-        hist = numpy.empty(self._n_bins)
-        for i in range(self._n_bins):
-            hist[i] = float(self.sio.readline())
+            start = perf_counter()
+            await asyncio.sleep(self._refresh)
+            stats = self.photon_simulator.stats
+            started = stats['pulses'] - stats['ignored']
+            hist = self.simulated_histogram()
+            # decimal digits plus line end of every bin
+            n_bytes = int(np.sum(np.floor(np.log10(hist + 1)) + 3))
+            self.frame_stats = { 'refresh': self._refresh, 'bytes': n_bytes,
+                                 'wait': perf_counter() - start, 'read': 0.,
+                                 'counts': hist.sum() }
+            if self.photon_simulation:
+                # pulses starting the converter, to correct pile-up with
+                self.frame_stats['cycles'] = \
+                    stats['pulses'] - stats['ignored'] - started
+            self._publish_frame(hist)
+            return hist
+
+        start = perf_counter()
+        # wait for the frame with a timeout of a whole refresh period
+        lines = await self.transport.readlines_async(
+            1, self._refresh + self.transport.timeout)
+        first_line = perf_counter()
+        lines += await self.transport.readlines_async(
+            self._n_bins - 1, self.histogram_timeout())
+        hist = self._parse_lines(lines, self._n_bins)
+        self.frame_stats = { 'refresh': self._refresh,
+                             'bytes': sum(len(line) for line in lines),
+                             'wait': first_line - start,
+                             'read': perf_counter() - first_line,
+                             'counts': hist.sum() }
+        self._publish_frame(hist)
         return hist
 
+    def read_histogram(self):
+        return self._run(self.read_histogram_async())
+
     def get_histogram(self):
+        """Record a single histogram"""
         if self.simulating == False:
-            self.serial.write('record 1\r')
+            self.transport.write(b'record 1\r')
         return self.read_histogram()
 
+    async def read_rate_async(self):
+        if self.simulating == True:
+            await asyncio.sleep(self._refresh)
+            return float(self.simulated_rates(1)[0])
+        line = await self.transport.readline_async(
+            self._refresh + self.transport.timeout)
+        return float(self._parse_lines([line], 1)[0])
+
     def read_rate(self):
+        return self._run(self.read_rate_async())
+
+    async def read_rates_async(self):
+        """All count rates received since the last read, at least one.
+
+        Reading every pending rate instead of the oldest one keeps a slow
+        reader from lagging behind the board.
+        """
         if self.simulating == True:
-            sleep(self._refresh)
-            return float(self.random_generator.poisson(self.count_rate))
-        return float(self.sio.readline())
+            now = perf_counter()
+            n_rates = int((now - self._rate_time) / self._refresh)
+            if n_rates == 0:
+                await asyncio.sleep(self._rate_time + self._refresh - now)
+                n_rates = 1
+            self._rate_time += n_rates * self._refresh
+            self.acquisition_counter += n_rates
+            return self.simulated_rates(n_rates)
+        lines = [await self.transport.readline_async(
+            self._refresh + self.transport.timeout)]
+        lines += self.transport.pending_lines()
+        self.acquisition_counter += len(lines)
+        return self._parse_lines(lines, len(lines))
+
+    def read_rates(self):
+        return self._run(self.read_rates_async())
 
     def get_rate(self):
+        """Measure a single count rate"""
         if self.simulating == False:
-            self.serial.write('rate 1\r')
+            self.transport.write(b'rate 1\r')
         return self.read_rate()
 
+    async def read_tags_async(self):
+        """Read the tags of one refresh period.
+
+        The board announces every frame with a line holding the number of
+        tags and the clock value at the end of the frame, followed by one
+        line per tag with its time stamp in clock ticks.
+        """
+        self.acquisition_counter += 1
+        if self.simulating == True:
+            await asyncio.sleep(self._refresh)
+            return self.simulated_tags()
+
+        line = await self.transport.readline_async(
+            self._refresh + self.transport.timeout)
+        fields = line.split()
+        if len(fields) != 2:
+            raise TimeoutError("Incomplete frame")
+        n_tags, self.tag_clock = int(fields[0]), int(fields[1])
+        tags = np.empty(n_tags, dtype=self.tag_dtype)
+        if n_tags > 0:
+            # many tags take longer than the timeout to arrive at high rates
+            lines = await self.transport.readlines_async(
+                n_tags, self.transfer_timeout(n_tags))
+            tags['time'] = self._parse_lines(lines, n_tags, np.int64)
+        tags['delay'] = -1
+        return tags
+
+    def read_tags(self):
+        return self._run(self.read_tags_async())
+
+    @staticmethod
+    def sweep_thresholds(start, stop, step):
+        """Thresholds (mV) of a sweep from start to stop included"""
+        n_steps = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return start + step * np.arange(max(n_steps, 0))
+
+    async def threshold_sweep_async(self, start, stop, step, dwell):
+        """Counts versus discriminator threshold in a single command.
+
+        The board counts during dwell (s) at every threshold from start to
+        stop (mV) and answers once the sweep is done with a line
+        'sweep <n>' followed by the n counts as little endian uint32, then
+        restores its threshold.
+
+        Returns
+        -------
+        thresholds, counts: ndarray
+        """
+        if self.is_acquiring == True:
+            raise RuntimeError("Must not sweep during acquisition")
+        thresholds = self.sweep_thresholds(start, stop, step)
+        if self.simulating == True:
+            await asyncio.sleep(len(thresholds) * dwell)
+            counts = self.random_generator.poisson(
+                dwell * self.simulated_discriminator_rates(thresholds))
+            return thresholds, counts.astype(np.uint32)
+
+        async with self._property_transaction():
+            self.transport.reset_input_buffer()
+            self.transport.write(b'sweep %g %g %g %g\r'
+                                 % (start, stop, step, dwell))
+            header = (await self.transport.readline_async(
+                len(thresholds) * dwell + self.transport.timeout)).split()
+            if len(header) != 2 or header[0] != b'sweep' \
+               or int(header[1]) != len(thresholds):
+                raise TimeoutError("No answer to the threshold sweep")
+            data = await self.transport.read_bytes_async(4 * len(thresholds))
+        if len(data) < 4 * len(thresholds):
+            raise TimeoutError("Incomplete threshold sweep")
+        return thresholds, np.frombuffer(data, dtype='<u4')
+
+    def threshold_sweep(self, start, stop, step, dwell):
+        return self._run(self.threshold_sweep_async(start, stop, step, dwell))
+
+    async def frames(self, mode=None, n_frames=0):
+        """Asynchronous iterator over the frames of an acquisition
+
+        Histograms in TCSPC mode, count rates in SPC mode and tag arrays in
+        TAGGER mode. The board is stopped when the iteration ends, is left
+        or its task is cancelled.
+
+        Parameters
+        ----------
+        mode: int or None
+            TCSPC, SPC or TAGGER, by default the mode of the controller.
+        n_frames: int
+            Number of frames, 0 for no limit.
+        """
+        modes = { self.TCSPC: (self.start_tcspc, self.read_histogram_async),
+                  self.SPC: (self.start_spc, self.read_rate_async),
+                  self.TAGGER: (self.start_tagger, self.read_tags_async) }
+        start, read = modes[self.mode if mode is None else mode]
+        start()
+        try:
+            n = 0
+            while n_frames <= 0 or n < n_frames:
+                yield await read()
+                n += 1
+        finally:
+            self.stop()
+
+    def read_pixels(self, n_pixels):
+        """Read the histograms of the next n_pixels pixel clock periods.
+
+        In FLIM mode the board sends for every pixel clock a marker line, 'F'
+        for the first pixel of a frame, 'L' for the first pixel of a line and
+        'P' otherwise, followed by the n_bins lines of the pixel histogram.
+
+        Returns
+        -------
+        markers: str
+            One marker per pixel.
+        hists: ndarray
+            Histograms of shape (n_pixels, n_bins).
+        """
+        self.acquisition_counter += 1
+        if self.simulating == True:
+            sleep(n_pixels * self.pixel_time)
+            n_y, n_x = self._flim_shape
+            positions = (self._flim_position + 1 + np.arange(n_pixels)) \
+                % (n_x * n_y)
+            self._flim_position = positions[-1]
+            markers = np.where(positions == 0, 'F',
+                               np.where(positions % n_x == 0, 'L', 'P'))
+            counts = self.random_generator.poisson(
+                self.simulated_pixels(positions))
+            return ''.join(markers), np.array(counts, dtype=float)
+
+        markers = []
+        hists = np.empty((n_pixels, self._n_bins))
+        for p in range(n_pixels):
+            markers.append(self.transport.readline().strip().decode())
+            hists[p] = self._parse_lines(
+                self.transport.readlines(self._n_bins,
+                                         self.histogram_timeout()),
+                self._n_bins)
+        return ''.join(markers), hists
+
     def tcspc_loop(self):
         current_hist = self.read_histogram()
         self.total_hist += current_hist
 
-    def spc_loop(self):
-        current_rate = self.read_rate()
-        dfp = DataFromPlugins(name='tcspc', data=current_rate, dim='Data0D',
-                              labels=['counts'])
-        self.dte_signal.emit(DataToExport('tcspc', data=[dfp]))
-
-    def get_property(self, name):
+    @asynccontextmanager
+    async def _property_transaction(self):
+        """Hold the line for one query or setting.
+
+        The lock is shared by the threads and polled, so waiting does not
+        block the event loop of a concurrent transaction.
+        """
+        while not self._property_lock.acquire(blocking=False):
+            await asyncio.sleep(0.001)
+        try:
+            yield
+        finally:
+            self._property_lock.release()
+
+    async def get_property_async(self, name):
         if self.is_acquiring == True:
             raise RuntimeError("Must not query property during acquisition")
         if self.simulating == True:
             return getattr(self, "_%s" % name)
-        self.sio.write(r"%s\r", name)
-        return self.sio.readline()
+        async with self._property_transaction():
+            # drop a late answer to an earlier, cancelled query
+            self.transport.reset_input_buffer()
+            self.transport.write(b'%s\r' % name.encode())
+            line = (await self.transport.readline_async()).strip()
+        if len(line) == 0:
+            raise TimeoutError("No answer to the query of %s" % name)
+        value = type(getattr(self, "_%s" % name))(float(line))
+        setattr(self, "_%s" % name, value)
+        return value
 
-    def set_property(self, name, value):
+    def get_property(self, name):
+        return self._run(self.get_property_async(name))
+
+    async def set_property_async(self, name, value):
         if self.is_acquiring == True:
             raise RuntimeError("Must not set property during acquisition")
         if self.simulating == True:
@@ -139,7 +559,14 @@ class TcspcArduinoController:
                         'count_rate', 'dark_rate']:
                 self.update_simulation_data()
         else:
-            self.sio.write(r"%s %s\r" % (name, str(value)))
+            async with self._property_transaction():
+                self.transport.write(b'%s %s\r' % (name.encode(),
+                                                   str(value).encode()))
+            # keep a local copy for the axis and frame bookkeeping
+            setattr(self, "_%s" % name, value)
+
+    def set_property(self, name, value):
+        return self._run(self.set_property_async(name, value))
 
     @property
     def threshold(self):
@@ -228,16 +655,78 @@ class TcspcArduinoController:
         self.set_property('dark_rate', r)
 
     def update_simulation_data(self):
+        self.simulation_data = self.simulated_decay(self._lifetime)
+        simulator = self.photon_simulator
+        for name in ['lifetime', 'time_zero', 'count_rate', 'dark_rate',
+                     'bin_size', 'offset', 'n_bins']:
+            setattr(simulator, name, getattr(self, '_%s' % name))
+        simulator.tag_resolution = self.tag_resolution
+
+    def simulated_histogram(self):
+        """Histogram of a simulated frame of the refresh time"""
+        if self.photon_simulation:
+            return self.photon_simulator.histogram(self._refresh)
+        return self.random_generator.poisson(self.simulation_data) \
+            .astype(float)
+
+    def simulated_rates(self, n_rates):
+        """Simulated count rates (Hz) of n_rates refresh periods"""
+        if self.photon_simulation:
+            return self.photon_simulator.rates(self._refresh, n_rates)
+        return self.random_generator.poisson(
+            self._count_rate * self._refresh, n_rates) / self._refresh
+
+    def simulated_tags(self):
+        """Simulated tags of a refresh period, advancing tag_clock"""
+        frame_ticks = int(round(self._refresh * 1e6 / self.tag_resolution))
+        if self.photon_simulation:
+            tags = self.photon_simulator.tags(frame_ticks
+                                              * self.tag_resolution * 1e-6)
+            self.tag_clock += frame_ticks
+            return tags
+        n_tags = self.random_generator.poisson(self._count_rate
+                                               * self._refresh)
+        tags = np.empty(n_tags, dtype=self.tag_dtype)
+        tags['time'] = np.sort(self.random_generator.integers(
+            self.tag_clock, self.tag_clock + frame_ticks, n_tags))
+        tags['delay'] = -1
+        self.tag_clock += frame_ticks
+        return tags
+
+    def simulated_decay(self, lifetime, amplitude=1.):
+        """Expected counts per bin, one row per lifetime if an array"""
         bin_size = self._bin_size * 1e-6
         offset = self._offset * 1e-6
         time_scale = np.linspace(offset + 0.5 * bin_size,
                                  offset + bin_size * (self._n_bins - 0.5),
                                  self._n_bins)
-        lifetime = self.lifetime * 1e-6
-        time_zero = self.time_zero * 1e-6
-        dark = self.dark_rate * bin_size
-        self.simulation_data = \
-            np.where(time_scale >= time_zero,
-                     dark + self.count_rate * np.exp(-time_scale / lifetime),
-                     dark)
-
+        lifetime = np.asarray(lifetime, dtype=float)[..., np.newaxis] * 1e-6
+        amplitude = np.asarray(amplitude, dtype=float)[..., np.newaxis]
+        time_zero = self._time_zero * 1e-6
+        dark = self._dark_rate * bin_size
+        return np.where(time_scale >= time_zero,
+                        dark + amplitude * self._count_rate
+                        * np.exp(-time_scale / lifetime),
+                        dark)
+
+    def simulated_discriminator_rates(self, thresholds):
+        """Count rates (Hz) above the thresholds (mV), Gaussian photon
+        pulse heights on top of the crossings of Gaussian noise"""
+        thresholds = np.asarray(thresholds, dtype=float)
+        erfc = np.vectorize(math.erfc)
+        photons = 0.5 * self._count_rate * erfc(
+            (thresholds - self.pulse_height) / (np.sqrt(2) * self.pulse_spread))
+        noise = self.noise_rate * np.exp(
+            -0.5 * (thresholds / self.noise_level) ** 2)
+        return photons + noise
+
+    def simulated_pixels(self, positions):
+        """Expected counts of pixels of a test sample, a disk of short
+        lifetime and higher brightness in a longer lived surrounding"""
+        n_y, n_x = self._flim_shape
+        y, x = np.divmod(positions, n_x)
+        radius = np.hypot(y - (n_y - 1) / 2, x - (n_x - 1) / 2)
+        inside = radius < 0.3 * min(n_x, n_y)
+        lifetime = np.where(inside, 0.3 * self._lifetime, self._lifetime)
+        amplitude = np.where(inside, 2., 1.)
+        return self.simulated_decay(lifetime, amplitude)
@@ -0,0 +1,148 @@
+from time import perf_counter
+from typing import List
+
+import numpy as np
+from pymodaq.extensions.pid.utils import PIDModelGeneric, main
+from pymodaq.utils.data import DataActuator, DataCalculated, DataToActuators, \
+    DataToExport
+
+from pymodaq_plugins_tcspc_arduino.processing.stabilisation import \
+    RateEstimator, LoopTimer
+
+
+class PIDModelCountRate(PIDModelGeneric):
+    """ Holds the count rate of the TCSPC Arduino constant.
+
+    The rates come from the tcspc_rate detector, which returns every rate
+    measured since the previous grab; they are filtered by a RateEstimator
+    and its estimate is fed to the PID, whose output drives an actuator
+    such as an attenuator or a focus stage in absolute positions. The PID
+    sample time is set to zero, so the loop runs as fast as the rates
+    arrive, and its measured period and jitter are shown in the model
+    settings.
+    """
+    limits = dict(max=dict(state=True, value=1),
+                  min=dict(state=True, value=0),)
+    konstants = dict(kp=1e-5, ki=1e-5, kd=0.)
+
+    Nsetpoints = 1
+    setpoint_ini = [10000.]
+    setpoints_names = ['Count rate (Hz)']
+
+    actuators_name = ['Attenuator']
+    detectors_name = ['Count rate']
+
+    params = [
+        { 'title': 'Time constant (s)', 'name': 'time_constant',
+          'type': 'float', 'min': 0.001, 'value': 0.05 },
+        { 'title': 'Step threshold (σ)', 'name': 'threshold', 'type': 'float',
+          'min': 0., 'value': 5.,
+          'tip': 'Deviation taken as a step of the rate, 0 to never reset' },
+        { 'title': 'Estimate (Hz)', 'name': 'estimate', 'type': 'float',
+          'value': 0., 'readonly': True },
+        { 'title': 'Loop period (ms)', 'name': 'period', 'type': 'float',
+          'value': 0., 'readonly': True },
+        { 'title': 'Loop jitter (ms)', 'name': 'jitter', 'type': 'float',
+          'value': 0., 'readonly': True },
+        { 'title': 'Rates per loop', 'name': 'rates_per_loop', 'type': 'float',
+          'value': 0., 'readonly': True },
+    ]
+
+    report_interval = 0.5 # s between updates of the loop statistics
+
+    def __init__(self, pid_controller):
+        super().__init__(pid_controller)
+        self.estimator = RateEstimator(self.settings['time_constant'],
+                                       self.settings['threshold'])
+        self.loop_timer = LoopTimer()
+        self._last_time = None
+        self._n_rates = 0
+        self._n_loops = 0
+        self._last_report = 0.
+
+    def update_settings(self, param):
+        """
+        Get a parameter instance whose value has been modified by a user on the UI
+        Parameters
+        ----------
+        param: (Parameter) instance of Parameter object
+        """
+        if param.name() == 'time_constant':
+            self.estimator.time_constant = param.value()
+        elif param.name() == 'threshold':
+            self.estimator.threshold = param.value()
+
+    def ini_model(self):
+        super().ini_model()
+        # the grab of the rates paces the loop, do not sleep in addition
+        self.pid_controller.settings.child('main_settings', 'pid_controls',
+                                           'sample_time').setValue(0)
+        self.estimator.reset()
+        self.loop_timer.reset()
+        self._last_time = None
+
+    def convert_input(self, measurements: DataToExport):
+        """
+        Convert the measurements in the units to be fed to the PID (same dimensionality as the setpoint)
+        Parameters
+        ----------
+        measurements: DataToExport
+            Data from the declared detectors from which the model extract a value of the same units as the setpoint
+
+        Returns
+        -------
+        DataToExport: the rate estimate as 0D DataCalculated
+
+        """
+        self.loop_timer.tick()
+        dwa = measurements.get_data_from_name('rates')
+        rates = dwa[0]
+        times = dwa.axes[0].get_data()
+        # the times count from the start of the acquisition
+        previous = 0. if self._last_time is None \
+            or times[0] <= self._last_time else self._last_time
+        durations = np.diff(np.concatenate(([previous], times)))
+        self._last_time = times[-1]
+        estimate = self.estimator.update(rates, durations)
+        self._n_rates += len(rates)
+        self._n_loops += 1
+        self.report(estimate)
+        return DataToExport('pid inputs', data=[
+            DataCalculated('count rate', data=[np.array([estimate])])])
+
+    def report(self, estimate):
+        now = perf_counter()
+        if now - self._last_report < self.report_interval:
+            return
+        self.settings.child('estimate').setValue(estimate)
+        self.settings.child('period').setValue(1e3 * self.loop_timer.period())
+        self.settings.child('jitter').setValue(1e3 * self.loop_timer.jitter())
+        self.settings.child('rates_per_loop').setValue(self._n_rates
+                                                       / self._n_loops)
+        self._n_rates = 0
+        self._n_loops = 0
+        self._last_report = now
+
+    def convert_output(self, outputs: List[float], dt: float, stab=True):
+        """
+        Convert the output of the PID in units to be fed into the actuator
+        Parameters
+        ----------
+        outputs: List of float
+            output value from the PID from which the model extract a value of the same units as the actuator
+        dt: float
+            Ellapsed time since the last call to this function
+        stab: bool
+
+        Returns
+        -------
+        DataToActuators: the absolute position of the actuator
+
+        """
+        self.curr_output = outputs
+        return DataToActuators('pid', mode='abs', data=[
+            DataActuator(self.actuators_name[0], data=outputs[0])])
+
+
+if __name__ == '__main__':
+    main("TcspcCountRate.xml")  # preset with the 'Count rate' detector and an 'Attenuator'
@@ -0,0 +1,267 @@
+import numpy as np
+
+
+burst_dtype = np.dtype([('start', np.float64), ('duration', np.float64),
+                        ('counts', np.int64), ('rate', np.float64)])
+
+
+class _SlidingBurstSearch:
+    """ Streaming burst search on windows of size consecutive elements.
+
+    An element, a photon or a time bin, belongs to a burst if any window of
+    size elements containing it passes the criterion of the subclass, and
+    a burst is a run of such elements. An element is decided once the
+    size - 1 windows ending after it are known, so the last size - 1
+    elements of a chunk are carried over to the next one together with
+    their window results, as is a burst still running at the end of the
+    decided elements. Bursts with less than min_counts counts are dropped.
+
+    Chunks are processed with cumulative sums only, every element is
+    handled a fixed number of times whatever the number of bursts.
+    """
+
+    def __init__(self, size, min_counts=0, n_bins=0):
+        if size < 1:
+            raise ValueError("A window holds at least one element")
+        self.size = size
+        self.min_counts = min_counts
+        self.n_bins = n_bins
+        self.reset()
+
+    def reset(self):
+        self._tail = None
+        self._tail_ok = np.zeros(0, dtype=bool)
+        self._open = None
+        self.decay = np.zeros(self.n_bins)
+        self.n_bursts = 0
+
+    def _windows(self, elements, first):
+        """Criterion of the windows ending at elements first to the last"""
+        raise NotImplementedError
+
+    def _decay(self, elements, mask):
+        """Decay histogram of the masked elements"""
+        raise NotImplementedError
+
+    def _add(self, elements):
+        """Search a chunk of elements, return the bursts it completes"""
+        if self._tail is not None:
+            elements = dict((key, np.concatenate((self._tail[key], value)))
+                            for key, value in elements.items())
+        n = len(elements['start'])
+        first = len(self._tail_ok)
+        ok = np.concatenate((self._tail_ok, self._windows(elements, first)))
+
+        # an element is in a burst if a window ending at it or at one of
+        # the size - 1 next elements passes
+        n_decided = max(n - self.size + 1, 0)
+        passed = np.concatenate(([0], np.cumsum(ok)))
+        member = passed[self.size:self.size + n_decided] \
+            > passed[:n_decided]
+        self._tail = dict((key, value[n_decided:])
+                          for key, value in elements.items())
+        self._tail_ok = ok[n_decided:]
+        return self._bursts(dict((key, value[:n_decided])
+                                 for key, value in elements.items()), member)
+
+    def _bursts(self, elements, member):
+        n = len(member)
+        edges = np.diff(np.concatenate(([self._open is not None], member,
+                                        [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        counts = np.concatenate(([0], np.cumsum(elements['counts'])))
+        if self._open is not None:
+            # the first stop ends the burst of the previous chunks
+            stop, stops = stops[0], stops[1:]
+            self._open['counts'] += counts[stop]
+            if stop > 0:
+                self._open['end'] = elements['end'][stop - 1]
+                self._open['decay'] += self._decay(elements,
+                                                   np.arange(n) < stop)
+            finished = [] if stop == n else [self._open]
+        else:
+            finished = []
+
+        # a burst reaching the last decided element is still running
+        running = len(stops) > 0 and stops[-1] == n
+        if running:
+            start, stop = starts[-1], stops[-1]
+            starts, stops = starts[:-1], stops[:-1]
+        run_counts = counts[stops] - counts[starts]
+        keep = run_counts >= self.min_counts
+        # elements of the complete bursts kept in this chunk
+        boundaries = np.bincount(starts[keep], minlength=n + 1) \
+            - np.bincount(stops[keep], minlength=n + 1)
+        kept = np.cumsum(boundaries[:n]) > 0
+
+        bursts = np.empty(len(finished) + np.count_nonzero(keep),
+                          dtype=burst_dtype)
+        if len(finished) > 0:
+            burst = finished[0]
+            if burst['counts'] >= self.min_counts:
+                self.decay += burst['decay']
+                bursts[0] = (burst['start'], burst['end'] - burst['start'],
+                             burst['counts'], 0.)
+            else:
+                bursts = bursts[1:]
+            self._open = None
+        offset = len(bursts) - np.count_nonzero(keep)
+        bursts['start'][offset:] = elements['start'][starts[keep]]
+        bursts['duration'][offset:] = elements['end'][stops[keep] - 1] \
+            - elements['start'][starts[keep]]
+        bursts['counts'][offset:] = run_counts[keep]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bursts['rate'] = np.where(bursts['duration'] > 0,
+                                      bursts['counts'] / bursts['duration'],
+                                      np.inf)
+        if np.any(kept):
+            self.decay += self._decay(elements, kept)
+
+        if running:
+            self._open = { 'start': elements['start'][start],
+                           'end': elements['end'][stop - 1],
+                           'counts': counts[stop] - counts[start],
+                           'decay': self._decay(elements,
+                                                np.arange(n) >= start) }
+        self.n_bursts += len(bursts)
+        return bursts
+
+
+class PhotonBurstSearch(_SlidingBurstSearch):
+    """ Bursts of photon time tags with a sliding window of n_photons.
+
+    A window of n_photons consecutive photons passes if they arrive within
+    window, in the units of the tags: photon rate above
+    (n_photons - 1) / window. If the tags carry delays, those of the burst
+    photons are histogrammed into the burst-selected decay.
+
+    Parameters
+    ----------
+    n_photons: int
+        Photons per window.
+    window: int or float
+        Longest time spanned by the photons of a passing window.
+    min_counts: int
+        Fewest photons of a reported burst.
+    n_bins: int
+        Number of delay bins of the burst-selected decay.
+    """
+
+    def __init__(self, n_photons=10, window=1000, min_counts=0, n_bins=0):
+        self.window = window
+        super().__init__(n_photons, min_counts, n_bins)
+
+    def _windows(self, elements, first):
+        times = elements['start']
+        m = self.size
+        ok = np.zeros(len(times) - first, dtype=bool)
+        # the first size - 1 elements end no window
+        start = max(first, m - 1)
+        if len(times) > start:
+            ok[start - first:] = \
+                times[start:] - times[start - m + 1:len(times) - m + 1] \
+                <= self.window
+        return ok
+
+    def _decay(self, elements, mask):
+        delays = elements['delay'][mask]
+        delays = delays[(delays >= 0) & (delays < self.n_bins)]
+        return np.bincount(delays, minlength=self.n_bins).astype(float)
+
+    def add_tags(self, times, delays=None):
+        """Search a chunk of sorted time tags
+
+        Parameters
+        ----------
+        times: ndarray
+            Arrival times of the photons.
+        delays: ndarray or None
+            Delay bin of every photon, negative if unknown.
+
+        Returns
+        -------
+        ndarray of burst_dtype: the bursts completed by the chunk, with
+            start and duration in the units of the tags
+        """
+        times = np.asarray(times)
+        if delays is None:
+            delays = np.full(len(times), -1, dtype=np.int64)
+        return self._add({ 'start': times, 'end': times,
+                           'counts': np.ones(len(times), dtype=np.int64),
+                           'delay': np.asarray(delays, dtype=np.int64) })
+
+
+class BinnedBurstSearch(_SlidingBurstSearch):
+    """ Bursts of photon counts in time bins with a sliding window.
+
+    A window of n_windows consecutive bins passes if it holds at least
+    threshold counts. For SPC count rates every bin is one refresh period;
+    if a histogram is given with the counts of every bin, those of the
+    burst bins add up to the burst-selected decay.
+
+    Parameters
+    ----------
+    n_windows: int
+        Bins per window.
+    threshold: int
+        Fewest counts of a passing window.
+    bin_time: float
+        Duration (s) of a bin.
+    min_counts: int
+        Fewest counts of a reported burst.
+    n_bins: int
+        Number of delay bins of the burst-selected decay.
+    """
+
+    def __init__(self, n_windows=3, threshold=10, bin_time=0.001,
+                 min_counts=0, n_bins=0):
+        self.threshold = threshold
+        self.bin_time = bin_time
+        self._time = 0.
+        super().__init__(n_windows, min_counts, n_bins)
+
+    def reset(self):
+        super().reset()
+        self._time = 0.
+
+    def _windows(self, elements, first):
+        counts = elements['counts']
+        w = self.size
+        ok = np.zeros(len(counts) - first, dtype=bool)
+        start = max(first, w - 1)
+        if len(counts) > start:
+            summed = np.concatenate(([0], np.cumsum(counts)))
+            ok[start - first:] = \
+                summed[start + 1:] - summed[start - w + 1:len(counts) - w + 1] \
+                >= self.threshold
+        return ok
+
+    def _decay(self, elements, mask):
+        if self.n_bins == 0:
+            return np.zeros(0)
+        return elements['hist'][mask].sum(axis=0)
+
+    def add_counts(self, counts, histograms=None):
+        """Search the counts of the next bins
+
+        Parameters
+        ----------
+        counts: ndarray
+            Counts of every bin.
+        histograms: ndarray or None
+            (bin, delay) histograms of the photons of every bin.
+
+        Returns
+        -------
+        ndarray of burst_dtype: the bursts completed by the chunk, with
+            start (s from the first bin) and duration (s)
+        """
+        counts = np.asarray(counts).astype(np.int64)
+        starts = self._time + self.bin_time * np.arange(len(counts))
+        self._time += self.bin_time * len(counts)
+        if histograms is None:
+            histograms = np.zeros((len(counts), self.n_bins))
+        return self._add({ 'start': starts, 'end': starts + self.bin_time,
+                           'counts': counts,
+                           'hist': np.asarray(histograms, dtype=float) })
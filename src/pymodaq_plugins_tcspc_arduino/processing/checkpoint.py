@@ -0,0 +1,203 @@
+import mmap
+import os
+import zlib
+from time import perf_counter, time
+
+import numpy as np
+
+
+file_dtype = np.dtype([('magic', 'S4'), ('version', np.uint32),
+                       ('max_bins', np.uint32), ('slot_size', np.uint32)])
+# the checksum covers everything after it in the slot
+slot_dtype = np.dtype([('crc', np.uint32), ('complete', np.uint32),
+                       ('sequence', np.uint64), ('n_bins', np.uint64),
+                       ('n_frames', np.uint64), ('elapsed', np.float64),
+                       ('timestamp', np.float64), ('threshold', np.float64),
+                       ('offset', np.float64), ('bin_size', np.float64),
+                       ('refresh', np.float64)])
+magic = b'TCCK'
+version = 1
+setting_names = ['threshold', 'offset', 'bin_size', 'refresh']
+# flushed ranges must start on this boundary
+page = mmap.ALLOCATIONGRANULARITY
+
+
+class AccumulationCheckpoint:
+    """ Crash-safe checkpoints of an accumulation in a memory-mapped file.
+
+    The file holds two page-aligned slots, each with a header (sequence
+    number, frame count, elapsed time and settings) followed by the total
+    histogram. A checkpoint is written to the slot not holding the latest
+    one, its CRC stored last and only this slot flushed to disk, so a crash
+    while writing leaves the previous checkpoint intact and the torn slot
+    is recognised by its checksum.
+
+    update() writes a checkpoint once interval seconds have passed, and
+    spaces checkpoints further if their measured cost would exceed
+    max_overhead of the time spent accumulating.
+
+    Parameters
+    ----------
+    path: str
+        File of the checkpoints, created if needed.
+    interval: float
+        Shortest time (s) between checkpoints.
+    max_bins: int
+        Largest number of bins that can be checkpointed.
+    max_overhead: float
+        Largest fraction of the accumulation time spent checkpointing.
+    """
+
+    def __init__(self, path, interval=10., max_bins=10000, max_overhead=0.01):
+        self.path = str(path)
+        self.interval = interval
+        self.max_overhead = max_overhead
+        slot_size = slot_dtype.itemsize + 8 * max_bins
+        slot_size = -(-slot_size // page) * page
+        size = page + 2 * slot_size
+
+        mode = 'r+b' if os.path.exists(self.path) else 'w+b'
+        with open(self.path, mode) as file:
+            header = file.read(file_dtype.itemsize)
+            compatible = len(header) == file_dtype.itemsize
+            if compatible:
+                header = np.frombuffer(header, dtype=file_dtype)[0]
+                compatible = header['magic'] == magic \
+                    and header['version'] == version \
+                    and header['max_bins'] == max_bins \
+                    and header['slot_size'] == slot_size
+            if not compatible:
+                # no checkpoint of this layout to keep
+                file.truncate(0)
+            file.truncate(size)
+            self._map = mmap.mmap(file.fileno(), size)
+
+        header = np.ndarray((), dtype=file_dtype, buffer=self._map)
+        self._slots = []
+        for i in range(2):
+            start = page + i * slot_size
+            self._slots.append((
+                start, np.ndarray((), dtype=slot_dtype, buffer=self._map,
+                                  offset=start),
+                np.ndarray(max_bins, dtype=np.float64, buffer=self._map,
+                           offset=start + slot_dtype.itemsize)))
+        if not compatible:
+            header['max_bins'] = max_bins
+            header['slot_size'] = slot_size
+            header['version'] = version
+            header['magic'] = magic
+            self._map.flush(0, page)
+        del header
+        self.max_bins = max_bins
+        self.slot_size = slot_size
+        self.begin()
+
+    def _valid(self, index):
+        start, header, _ = self._slots[index]
+        n_bins = int(header['n_bins'])
+        if header['sequence'] == 0 or n_bins > self.max_bins:
+            return False
+        stop = start + slot_dtype.itemsize + 8 * n_bins
+        return zlib.crc32(self._map[start + 4:stop]) == header['crc']
+
+    def _latest(self):
+        """Index of the slot with the latest valid checkpoint, else None"""
+        valid = [i for i in range(2) if self._valid(i)]
+        if len(valid) == 0:
+            return None
+        return max(valid, key=lambda i: int(self._slots[i][1]['sequence']))
+
+    def load(self, complete=False):
+        """Latest checkpoint, None if there is none
+
+        Checkpoints of completed accumulations are only returned if
+        complete is True.
+
+        Returns
+        -------
+        (dict, ndarray): state, with frame count, elapsed time, timestamp
+            and settings, and total histogram
+        """
+        index = self._latest()
+        if index is None:
+            return None
+        _, header, hist = self._slots[index]
+        if header['complete'] and not complete:
+            return None
+        state = {key: header[key].item() for key in
+                 ['n_frames', 'elapsed', 'timestamp', 'complete']
+                 + setting_names}
+        state['complete'] = bool(state['complete'])
+        return state, hist[:int(header['n_bins'])].copy()
+
+    def clear(self):
+        """Invalidate the checkpoints, before starting a new accumulation"""
+        for start, header, _ in self._slots:
+            header['sequence'] = 0
+            header['crc'] = 0
+            self._map.flush(start, page)
+
+    def save(self, total, n_frames, elapsed, settings, complete=False):
+        """Write a checkpoint of the total histogram and flush it"""
+        if len(total) > self.max_bins:
+            raise ValueError("%d bins do not fit in a checkpoint of %d"
+                             % (len(total), self.max_bins))
+        latest = self._latest()
+        sequence = 1 if latest is None \
+            else int(self._slots[latest][1]['sequence']) + 1
+        index = 1 - latest if latest is not None else 0
+        start, header, hist = self._slots[index]
+        n_bins = len(total)
+        # the slot is invalid until its new CRC is stored
+        header['crc'] = 0
+        hist[:n_bins] = total
+        header['n_bins'] = n_bins
+        header['n_frames'] = n_frames
+        header['elapsed'] = elapsed
+        header['timestamp'] = time()
+        header['complete'] = complete
+        for key in setting_names:
+            header[key] = settings.get(key, 0.)
+        header['sequence'] = sequence
+        stop = start + slot_dtype.itemsize + 8 * n_bins
+        header['crc'] = zlib.crc32(self._map[start + 4:stop])
+        self._map.flush(start, -(-(stop - start) // page) * page)
+
+    def begin(self):
+        """Start timing a new accumulation"""
+        self.cost = 0.
+        self.n_saves = 0
+        self._started = perf_counter()
+        self._last_save = self._started
+        self._period = self.interval
+
+    def update(self, total, n_frames, elapsed, settings):
+        """Save a checkpoint if one is due, return True if saved"""
+        if perf_counter() - self._last_save < self._period:
+            return False
+        start = perf_counter()
+        self.save(total, n_frames, elapsed, settings)
+        cost = perf_counter() - start
+        self.cost += cost
+        self.n_saves += 1
+        self._period = max(self.interval, cost / self.max_overhead)
+        self._last_save = perf_counter()
+        return True
+
+    @property
+    def overhead(self):
+        """Fraction of the time since begin() spent checkpointing"""
+        duration = perf_counter() - self._started
+        return self.cost / duration if duration > 0 else 0.
+
+    def close(self):
+        if self._map.closed:
+            return
+        self._slots = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
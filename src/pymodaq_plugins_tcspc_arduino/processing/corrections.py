@@ -0,0 +1,114 @@
+import numpy as np
+
+
+def coates(hist, n_cycles):
+    """ Pile-up correction of a histogram acquired over n_cycles excitations.
+
+    A TCSPC channel records at most one photon per excitation, so a photon
+    is only recorded in a bin if none was in an earlier one. Coates'
+    correction estimates the mean number of photons per bin from the
+    fraction of the cycles still open at the bin, -ln(1 - p) times n_cycles.
+    """
+    hist = np.asarray(hist, dtype=float)
+    open_cycles = n_cycles - np.concatenate(([0.], np.cumsum(hist)[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(open_cycles > 0, hist / open_cycles, 0.)
+    return -n_cycles * np.log1p(-np.clip(fraction, 0., 1. - 1e-12))
+
+
+class HistogramCorrector:
+    """ Online corrections of TCSPC histograms.
+
+    The corrections are applied to every frame in the reverse order of the
+    distortions: Coates' pile-up correction of the raw counts, the
+    differential nonlinearity (DNL) of the bin widths from a flat-field
+    measurement, and the subtraction of the background estimated from the
+    bins before the excitation. The vectors depending on the axis are
+    cached and only recomputed when offset, bin size or number of bins
+    change.
+
+    Parameters
+    ----------
+    pile_up: bool
+        Correct pile-up, if the excitation rate or cycle count is known.
+    dnl: bool
+        Correct the DNL, if a flat field of the current axis is known.
+    background: bool
+        Subtract the mean of the bins ending before background_end.
+    excitation_rate: float
+        Excitation (trigger) rate (Hz), 0 if unknown.
+    background_end: float
+        Delay (µs) of the excitation, end of the background bins.
+    """
+
+    def __init__(self, pile_up=True, dnl=True, background=True,
+                 excitation_rate=0., background_end=0.):
+        self.pile_up = pile_up
+        self.dnl = dnl
+        self.background = background
+        self.excitation_rate = excitation_rate
+        self._background_end = background_end
+        self._axis = (0., 1., 0)
+        self._flat_field = None
+        self._flat_field_axis = None
+        self._gain = None
+        self._n_background = 0
+
+    @property
+    def background_end(self):
+        return self._background_end
+
+    @background_end.setter
+    def background_end(self, delay):
+        self._background_end = delay
+        self._update()
+
+    @property
+    def dnl_available(self):
+        return self._gain is not None
+
+    def set_axis(self, offset, bin_size, n_bins):
+        axis = (offset, bin_size, n_bins)
+        if axis == self._axis:
+            return
+        self._axis = axis
+        self._update()
+
+    def set_flat_field(self, counts, offset, bin_size):
+        """Histogram of uncorrelated light, equal counts per bin if ideal"""
+        counts = np.asarray(counts, dtype=float)
+        self._flat_field = counts.copy()
+        self._flat_field_axis = (offset, bin_size, len(counts))
+        self._update()
+
+    def _update(self):
+        offset, bin_size, n_bins = self._axis
+        self._gain = None
+        if self._flat_field is not None and self._flat_field_axis == self._axis:
+            flat = self._flat_field
+            with np.errstate(divide='ignore'):
+                self._gain = np.where(flat > 0, flat[flat > 0].mean() / flat,
+                                      0.)
+        if bin_size > 0:
+            n = int(np.floor((self._background_end - offset) / bin_size))
+            self._n_background = min(max(n, 0), n_bins)
+        else:
+            self._n_background = 0
+
+    def correct(self, hist, duration, n_cycles=None):
+        """Corrected frame acquired during duration (s)
+
+        Pile-up is corrected with n_cycles converter starts if they were
+        counted, else with the excitations of the duration.
+        """
+        corrected = np.asarray(hist, dtype=float)
+        if n_cycles is None:
+            n_cycles = self.excitation_rate * duration
+        if self.pile_up and n_cycles > 0:
+            corrected = coates(corrected, n_cycles)
+        if self.dnl and self._gain is not None \
+           and len(self._gain) == len(corrected):
+            corrected = corrected * self._gain
+        if self.background and self._n_background > 0:
+            corrected = corrected - corrected[:self._n_background].mean()
+        return corrected
@@ -0,0 +1,165 @@
+import numpy as np
+
+
+class MultiTauCorrelator:
+    """ Incremental multi-tau correlator for photon time tags.
+
+    Tags are binned at the base resolution and fed through a cascade of
+    levels, each level halving the time resolution of the previous one.
+    Level 0 holds lags 1..n_channels, every further level the upper half of
+    its channels, so that lags are spaced logarithmically. Only the last
+    n_channels bins of every level are kept between batches.
+
+    Parameters
+    ----------
+    n_channels: int
+        Number of lag channels per level (even).
+    n_levels: int
+        Number of levels of the cascade.
+    resolution: int
+        Base bin width in tag ticks.
+    """
+
+    def __init__(self, n_channels=16, n_levels=20, resolution=1):
+        if n_channels < 2 or n_channels % 2 != 0:
+            raise ValueError("Number of channels must be even")
+        self.n_channels = n_channels
+        self.n_levels = n_levels
+        self.resolution = resolution
+        self.reset()
+
+    def reset(self):
+        m = self.n_channels
+        self._origin = None
+        self._next_bin = 0
+        self._pending_a = np.empty(0, dtype=np.int64)
+        self._pending_b = np.empty(0, dtype=np.int64)
+        self._history = np.zeros((self.n_levels, m))
+        self._carry_a = [None] * self.n_levels
+        self._carry_b = [None] * self.n_levels
+        self._n_seen = np.zeros(self.n_levels, dtype=np.int64)
+        self._products = np.zeros((self.n_levels, m + 1))
+        self._pairs = np.zeros((self.n_levels, m + 1))
+        self._sum_a = np.zeros((self.n_levels, m + 1))
+        self._sum_b = np.zeros((self.n_levels, m + 1))
+
+    @property
+    def lags(self):
+        """Lags of the correlation curve in tag ticks."""
+        m = self.n_channels
+        lags = [np.arange(1, m + 1)]
+        for level in range(1, self.n_levels):
+            lags.append(np.arange(m // 2 + 1, m + 1) << level)
+        return np.concatenate(lags) * self.resolution
+
+    def add_tags(self, times_a, times_b=None, end_time=None):
+        """Correlate a new chunk of time tags.
+
+        Parameters
+        ----------
+        times_a: ndarray
+            Sorted time tags in ticks.
+        times_b: ndarray or None
+            Sorted time tags of a second channel for cross-correlation,
+            autocorrelation of times_a if None.
+        end_time: int or None
+            Time up to which the chunk is complete. Defaults to the last tag;
+            tags of the last, possibly incomplete, bin are kept for the next
+            chunk.
+        """
+        times_a = np.concatenate((self._pending_a,
+                                  np.asarray(times_a, dtype=np.int64)))
+        cross = times_b is not None
+        if cross:
+            times_b = np.concatenate((self._pending_b,
+                                      np.asarray(times_b, dtype=np.int64)))
+        else:
+            times_b = times_a
+
+        if end_time is None:
+            if len(times_a) == 0 and len(times_b) == 0:
+                return
+            end_time = max(times_a[-1] if len(times_a) else 0,
+                           times_b[-1] if len(times_b) else 0)
+        if self._origin is None:
+            if len(times_a) == 0 and len(times_b) == 0:
+                return
+            self._origin = min(times_a[0] if len(times_a) else end_time,
+                               times_b[0] if len(times_b) else end_time)
+
+        end_bin = (end_time - self._origin) // self.resolution
+        n_new = end_bin - self._next_bin
+        if n_new <= 0:
+            self._pending_a = times_a
+            if cross:
+                self._pending_b = times_b
+            return
+
+        a, self._pending_a = self._bin(times_a, end_bin, n_new)
+        if cross:
+            b, self._pending_b = self._bin(times_b, end_bin, n_new)
+        else:
+            b = a
+        self._next_bin = end_bin
+        self._feed(0, a, b)
+
+    def _bin(self, times, end_bin, n_new):
+        bins = (times - self._origin) // self.resolution
+        complete = np.searchsorted(bins, end_bin)
+        counts = np.bincount(bins[:complete] - self._next_bin,
+                             minlength=n_new).astype(float)
+        return counts, times[complete:]
+
+    def _feed(self, level, a, b):
+        m = self.n_channels
+        auto = b is a
+        while level < self.n_levels and len(b) > 0:
+            n = len(b)
+            extended = np.concatenate((self._history[level], a))
+            # products[m - j] = sum_i b[i] * a[i - j] for lags j = 0..m
+            products = np.correlate(extended, b, mode='valid')[::-1]
+
+            # pairs whose delayed partner precedes the first bin are not valid
+            lags = np.arange(m + 1)
+            first = np.clip(lags - self._n_seen[level], 0, n)
+            cum_b = np.concatenate(([0.], np.cumsum(b)))
+            cum_a = np.concatenate(([0.], np.cumsum(extended)))
+            self._products[level] += products
+            self._pairs[level] += n - first
+            self._sum_b[level] += cum_b[n] - cum_b[first]
+            self._sum_a[level] += cum_a[m - lags + n] - cum_a[m - lags + first]
+
+            self._history[level] = extended[-m:]
+            self._n_seen[level] += n
+
+            a, self._carry_a[level] = self._coarsen(self._carry_a[level], a)
+            if auto:
+                b = a
+            else:
+                b, self._carry_b[level] = self._coarsen(self._carry_b[level], b)
+            level += 1
+
+    @staticmethod
+    def _coarsen(carry, x):
+        if carry is not None:
+            x = np.concatenate((carry, x))
+        if len(x) % 2 == 1:
+            carry = x[-1:]
+            x = x[:-1]
+        else:
+            carry = None
+        return x[0::2] + x[1::2], carry
+
+    def correlation(self):
+        """Normalised correlation G(tau) at the lags given by `lags`.
+
+        Lags without data yet are returned as NaN.
+        """
+        m = self.n_channels
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g = self._products * self._pairs / (self._sum_a * self._sum_b)
+        g[~np.isfinite(g)] = np.nan
+        curves = [g[0, 1:]]
+        for level in range(1, self.n_levels):
+            curves.append(g[level, m // 2 + 1:])
+        return np.concatenate(curves)
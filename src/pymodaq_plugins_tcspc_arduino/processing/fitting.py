@@ -0,0 +1,196 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+methods = ['lsq', 'mle']
+
+
+def exponential_model(delays, time_zero, params):
+    """Single exponential decay on a constant background.
+
+    Parameters
+    ----------
+    delays: ndarray
+        Bin delays of shape (n_bins,).
+    time_zero: float
+        Start of the decay.
+    params: ndarray
+        Amplitude, lifetime and background per decay, shape (N, 3).
+
+    Returns
+    -------
+    model: ndarray of shape (N, n_bins)
+    jacobian: ndarray of shape (N, n_bins, 3)
+    """
+    amplitude, lifetime, background = params[:, 0:1], params[:, 1:2], \
+        params[:, 2:3]
+    t = np.maximum(delays - time_zero, 0.)
+    after = delays >= time_zero
+    decay = np.where(after, np.exp(-t / lifetime), 0.)
+    model = amplitude * decay + background
+    jacobian = np.empty(model.shape + (3,))
+    jacobian[..., 0] = decay
+    jacobian[..., 1] = amplitude * decay * t / lifetime ** 2
+    jacobian[..., 2] = 1.
+    return model, jacobian
+
+
+def _check_time_zero(delays, time_zero):
+    if len(delays) == 0 or time_zero > delays[-1]:
+        raise ValueError("time_zero %g µs is after the last delay, no decay "
+                         "to fit" % time_zero)
+
+
+def initial_guess(stack, delays, time_zero):
+    _check_time_zero(delays, time_zero)
+    before = delays < time_zero
+    if np.count_nonzero(before) > 0:
+        background = stack[:, before].mean(axis=1)
+    else:
+        background = stack[:, -max(1, stack.shape[1] // 10):].mean(axis=1)
+    net = np.clip(stack[:, ~before] - background[:, np.newaxis], 0., None)
+    t = delays[~before] - time_zero
+    total = net.sum(axis=1)
+    lifetime = np.where(total > 0, net @ t / np.maximum(total, 1e-12),
+                        t[-1] / 2)
+    lifetime = np.clip(lifetime, t[1] if len(t) > 1 else 1e-3, None)
+    amplitude = np.maximum(net.max(axis=1), 1.)
+    return np.stack((amplitude, lifetime, np.maximum(background, 1e-3)),
+                    axis=1)
+
+
+def _objective(stack, model, method):
+    if method == 'mle':
+        # Poisson deviance
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_term = np.where(stack > 0, stack * np.log(stack / model), 0.)
+        return 2. * np.sum(model - stack + log_term, axis=1)
+    return np.sum((stack - model) ** 2 / np.maximum(stack, 1.), axis=1)
+
+
+def _fit_chunk(stack, delays, time_zero, method, max_iterations, tolerance,
+               convolve=None):
+    n, n_bins = stack.shape
+    params = initial_guess(stack, delays, time_zero)
+    damping = np.full(n, 1e-3)
+    converged = np.zeros(n, dtype=bool)
+
+    def evaluate(p):
+        model, jacobian = exponential_model(delays, time_zero, p)
+        if convolve is not None:
+            model = convolve(model)
+            jacobian = np.moveaxis(convolve(np.moveaxis(jacobian, 2, 1)), 1, 2)
+        return np.maximum(model, 1e-9), jacobian
+
+    model, jacobian = evaluate(params)
+    objective = _objective(stack, model, method)
+    for _ in range(max_iterations):
+        active = np.flatnonzero(~converged)
+        if len(active) == 0:
+            break
+        y = stack[active]
+        m = model[active]
+        J = jacobian[active]
+        weights = 1. / (m if method == 'mle' else np.maximum(y, 1.))
+        JW = J * weights[..., np.newaxis]
+        JWt = np.swapaxes(JW, 1, 2)
+        hessian = JWt @ J
+        gradient = (JWt @ (y - m)[..., np.newaxis])[..., 0]
+        diagonal = np.einsum('nii->ni', hessian)
+        system = hessian + damping[active, np.newaxis, np.newaxis] \
+            * (diagonal[:, :, np.newaxis] * np.eye(3))
+        system += 1e-12 * np.eye(3)
+        step = np.linalg.solve(system, gradient[..., np.newaxis])[..., 0]
+
+        trial = params[active] + step
+        trial[:, 0] = np.maximum(trial[:, 0], 0.)
+        trial[:, 1] = np.maximum(trial[:, 1], 1e-6)
+        trial[:, 2] = np.maximum(trial[:, 2], 1e-6)
+        trial_model, trial_jacobian = evaluate(trial)
+        trial_objective = _objective(y, trial_model, method)
+
+        better = trial_objective < objective[active]
+        improved = active[better]
+        change = np.abs(objective[active] - trial_objective) \
+            <= tolerance * np.maximum(objective[active], 1e-12)
+        params[improved] = trial[better]
+        model[improved] = trial_model[better]
+        jacobian[improved] = trial_jacobian[better]
+        objective[improved] = trial_objective[better]
+        damping[improved] /= 10.
+        damping[active[~better]] *= 10.
+        converged[active[change & better]] = True
+        converged[active[damping[active] > 1e10]] = True
+
+    chi2 = np.sum((stack - model) ** 2 / np.maximum(model, 1.), axis=1) \
+        / max(n_bins - 3, 1)
+    return params, chi2, converged
+
+
+def fit_batch(stack, delays, time_zero=None, method='mle', max_iterations=50,
+              tolerance=1e-6, n_workers=None, chunk_size=4096, convolve=None):
+    """Fit a single exponential decay to every histogram of a stack at once.
+
+    All decays are iterated together with a vectorized Levenberg-Marquardt
+    scheme, either minimising the Neyman chi-square ('lsq') or the Poisson
+    deviance ('mle', Fisher scoring). Stacks larger than chunk_size are split
+    over a process pool.
+
+    Parameters
+    ----------
+    stack: ndarray
+        Histograms of shape (..., n_bins), for instance (n_y, n_x, n_bins).
+    delays: ndarray
+        Bin delays of shape (n_bins,).
+    time_zero: float or None
+        Start of the decays, by default the peak of the summed decay.
+    method: str
+        'lsq' or 'mle'
+    n_workers: int or None
+        Number of processes, None for one per CPU, 1 to fit in this process.
+    convolve: callable or None
+        Applied along the last axis to model and Jacobian, for instance the
+        convolution with an instrument response of an IrfLibrary.
+
+    Returns
+    -------
+    dict of ndarray of shape stack.shape[:-1] with keys 'lifetime',
+    'amplitude', 'background', 'chi2' and 'converged'
+    """
+    if method not in methods:
+        raise ValueError("Unknown fit method '%s'" % method)
+    stack = np.asarray(stack, dtype=float)
+    delays = np.asarray(delays, dtype=float)
+    shape = stack.shape[:-1]
+    stack = stack.reshape(-1, stack.shape[-1])
+    if time_zero is None:
+        time_zero = delays[np.argmax(stack.sum(axis=0))]
+    _check_time_zero(delays, time_zero)
+
+    chunks = [stack[i:i + chunk_size]
+              for i in range(0, len(stack), chunk_size)]
+    arguments = (delays, time_zero, method, max_iterations, tolerance,
+                 convolve)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if len(chunks) > 1 and n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_fit_chunk, chunk, *arguments)
+                       for chunk in chunks]
+            results = [future.result() for future in futures]
+    else:
+        results = [_fit_chunk(chunk, *arguments) for chunk in chunks]
+
+    params = np.concatenate([r[0] for r in results]) if results \
+        else np.zeros((0, 3))
+    chi2 = np.concatenate([r[1] for r in results]) if results \
+        else np.zeros(0)
+    converged = np.concatenate([r[2] for r in results]) if results \
+        else np.zeros(0, dtype=bool)
+    return { 'amplitude': params[:, 0].reshape(shape),
+             'lifetime': params[:, 1].reshape(shape),
+             'background': params[:, 2].reshape(shape),
+             'chi2': chi2.reshape(shape),
+             'converged': converged.reshape(shape) }
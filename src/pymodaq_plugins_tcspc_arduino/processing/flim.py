@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class FlimAccumulator:
+    """ Assembles pixel histograms into a (y, x, delay) cube.
+
+    The pixel position follows the markers sent with every pixel: 'F' starts
+    a frame, 'L' a line and 'P' advances to the next pixel of the line.
+    Intensity and first moment of the delay are accumulated per pixel along
+    with the cube, so images are available at any time without reducing the
+    cube.
+
+    Parameters
+    ----------
+    n_y, n_x: int
+        Image size.
+    delays: ndarray
+        Delay of every histogram bin.
+    dtype: numpy dtype
+        Data type of the cube.
+    """
+
+    def __init__(self, n_y, n_x, delays, dtype=np.uint32):
+        self.n_y = n_y
+        self.n_x = n_x
+        self.delays = np.asarray(delays, dtype=float)
+        self.cube = np.zeros((n_y, n_x, len(self.delays)), dtype=dtype)
+        self.intensity = np.zeros((n_y, n_x))
+        self._moment = np.zeros((n_y, n_x))
+        self._decay = np.zeros(len(self.delays))
+        self.frames = 0
+        self.completed_frames = 0
+        self._position = -1
+
+    def positions(self, markers):
+        """Linear pixel positions for a sequence of markers"""
+        n_pixels = self.n_x * self.n_y
+        positions = np.empty(len(markers), dtype=int)
+        position = self._position
+        for i, marker in enumerate(markers):
+            if marker == 'F':
+                position = 0
+                self.frames += 1
+            elif marker == 'L':
+                position = (position // self.n_x + 1) * self.n_x
+            else:
+                position += 1
+            position %= n_pixels
+            positions[i] = position
+            if position == n_pixels - 1:
+                self.completed_frames += 1
+        self._position = position
+        return positions
+
+    def add_pixels(self, markers, hists):
+        """Add histograms of shape (n_pixels, n_bins) at the marked pixels
+
+        Returns
+        -------
+        int: index of the last line that was touched
+        """
+        if len(markers) == 0:
+            return None
+        hists = np.asarray(hists)
+        y, x = np.divmod(self.positions(markers), self.n_x)
+        np.add.at(self.cube, (y, x), hists.astype(self.cube.dtype))
+        np.add.at(self.intensity, (y, x), hists.sum(axis=1))
+        np.add.at(self._moment, (y, x), hists @ self.delays)
+        self._decay += hists.sum(axis=0)
+        return y[-1]
+
+    @property
+    def time_zero(self):
+        """Delay of the maximum of the decay summed over all pixels"""
+        return self.delays[np.argmax(self._decay)]
+
+    def lifetime(self):
+        """Mean arrival time after time zero per pixel, NaN without counts"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lifetime = self._moment / self.intensity - self.time_zero
+        lifetime[self.intensity == 0] = np.nan
+        return lifetime
+
+    def decay(self):
+        return self._decay.copy()
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+def parse_gates(text):
+    """Parse a gate specification such as '0.5:1.5, 1.5:2.5' (µs)."""
+    gates = []
+    for item in text.replace(';', ',').split(','):
+        if len(item.strip()) == 0:
+            continue
+        try:
+            start, stop = [float(x) for x in item.split(':')]
+        except ValueError:
+            raise ValueError("Invalid time gate '%s', expected start:stop"
+                             % item.strip())
+        if stop <= start:
+            raise ValueError("Time gate '%s' ends before it starts"
+                             % item.strip())
+        gates.append((start, stop))
+    return gates
+
+
+class TimeGates:
+    """ Integrated intensities of a histogram in a set of delay windows.
+
+    The cumulative sum of the histogram is computed once per update, after
+    which every gate is the difference of two of its entries, independently
+    of the gate width.
+
+    Parameters
+    ----------
+    gates: list of (float, float)
+        Start and stop of every gate in µs.
+    """
+
+    def __init__(self, gates=()):
+        self._gates = list(gates)
+        self._offset = 0.
+        self._bin_size = 1.
+        self._n_bins = 0
+        self._indices = (np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+        self._cumsum = np.zeros(1)
+
+    @property
+    def n_gates(self):
+        return len(self._gates)
+
+    @property
+    def labels(self):
+        labels = ['gate %d' % i for i in range(self.n_gates)]
+        labels += ['gate %d / gate 0' % i for i in range(1, self.n_gates)]
+        if self.rld_available():
+            labels.append('RLD lifetime')
+        return labels
+
+    def set_gates(self, gates):
+        self._gates = list(gates)
+        self._update_indices()
+
+    def set_axis(self, offset, bin_size, n_bins):
+        self._offset = offset
+        self._bin_size = bin_size
+        self._n_bins = n_bins
+        self._update_indices()
+
+    def _update_indices(self):
+        if self.n_gates == 0 or self._bin_size <= 0:
+            self._indices = (np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+            return
+        edges = (np.array(self._gates, dtype=float) - self._offset) \
+            / self._bin_size
+        edges = np.clip(np.rint(edges).astype(int), 0, self._n_bins)
+        self._indices = (edges[:, 0], edges[:, 1])
+
+    def update(self, hist):
+        self._cumsum = np.concatenate(([0.], np.cumsum(hist)))
+
+    def intensities(self):
+        start, stop = self._indices
+        if len(start) != self.n_gates or len(self._cumsum) <= self._n_bins:
+            return np.zeros(self.n_gates)
+        return self._cumsum[stop] - self._cumsum[start]
+
+    def ratios(self):
+        intensities = self.intensities()
+        if len(intensities) < 2:
+            return np.zeros(0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return intensities[1:] / intensities[0]
+
+    def rld_available(self):
+        """Rapid lifetime determination needs two equally wide gates."""
+        start, stop = self._indices
+        if len(start) < 2:
+            return False
+        return stop[0] - start[0] == stop[1] - start[1] > 0 \
+            and start[1] > start[0]
+
+    def rld_lifetime(self):
+        """Lifetime (µs) of a single exponential from the first two gates."""
+        start, stop = self._indices
+        early, late = self.intensities()[:2]
+        if early <= late or late <= 0:
+            return np.nan
+        return (start[1] - start[0]) * self._bin_size / np.log(early / late)
+
+    def values(self):
+        """Intensities, ratios and, if available, the RLD lifetime."""
+        values = np.concatenate((self.intensities(), self.ratios()))
+        if self.rld_available():
+            values = np.append(values, self.rld_lifetime())
+        return values
@@ -0,0 +1,211 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _fft_length(n):
+    """Smallest 2^a 3^b 5^c length of at least n, fast for numpy's FFT"""
+    best = 1 << int(np.ceil(np.log2(max(n, 1))))
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            length = power35
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+class IrfConvolution:
+    """ Convolution of decays with a cached instrument response kernel.
+
+    Called on an array of decays of shape (..., n_bins), as the convolve
+    hook of fit_batch, it costs one forward and one inverse real FFT, the
+    kernel being transformed once. The decays are extended with their
+    first and last values beyond the histogram, so a constant background
+    stays constant and the response does not wrap around.
+
+    Parameters
+    ----------
+    kernel: ndarray
+        Response at lags -before to after bins, summing to one.
+    before: int
+        Number of negative lags of the kernel.
+    n_bins: int
+        Number of bins of the decays.
+    """
+
+    def __init__(self, kernel, before, n_bins):
+        self.n_bins = n_bins
+        self.before = before
+        self.after = len(kernel) - 1 - before
+        self.n_fft = _fft_length(n_bins + 2 * (len(kernel) - 1))
+        self.kernel = np.fft.rfft(kernel, self.n_fft)
+
+    def __call__(self, decays):
+        decays = np.asarray(decays, dtype=float)
+        shape = decays.shape[:-1]
+        extended = np.concatenate(
+            (np.broadcast_to(decays[..., :1], shape + (self.after,)), decays,
+             np.broadcast_to(decays[..., -1:], shape + (self.before,))),
+            axis=-1)
+        convolved = np.fft.irfft(np.fft.rfft(extended, self.n_fft)
+                                 * self.kernel, self.n_fft)
+        start = self.before + self.after
+        return convolved[..., start:start + self.n_bins]
+
+
+class IrfLibrary:
+    """ Measured instrument responses and their cached convolution kernels.
+
+    Responses are stored per histogram configuration (bin_size, offset,
+    n_bins). The kernel for the axis of a fit is taken from the response
+    of the same configuration, else from the one of closest bin size,
+    rebinned to the bin size of the axis by interpolating its cumulative
+    sum, which keeps its area and allows shifts by fractions of a bin.
+
+    Lags are counted from the centroid of the response, so a decay
+    starting at time_zero convolved with it rises around time_zero, or
+    time_zero + shift to account for a delay between the response and the
+    sample (colour shift, cables). The FFTs of the last max_kernels
+    kernels are kept, the least recently used one being evicted first.
+
+    Parameters
+    ----------
+    max_kernels: int
+        Number of convolution kernels kept.
+    """
+
+    def __init__(self, max_kernels=32):
+        if max_kernels < 1:
+            raise ValueError("At least one kernel must be kept")
+        self.max_kernels = max_kernels
+        self.irfs = {}
+        self._kernels = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def configuration(bin_size, offset, n_bins):
+        # rounded so settings read back from the board match
+        return (round(float(bin_size), 9), round(float(offset), 9),
+                int(n_bins))
+
+    def add(self, irf, bin_size, offset):
+        """Store a measured response, replacing one of the same configuration
+
+        Parameters
+        ----------
+        irf: ndarray
+            Counts of the response in bins of bin_size (µs) from offset (µs).
+        """
+        irf = np.clip(np.asarray(irf, dtype=float), 0., None)
+        if irf.ndim != 1 or irf.sum() <= 0:
+            raise ValueError("The response must be a histogram with counts")
+        key = self.configuration(bin_size, offset, len(irf))
+        self.irfs[key] = irf / irf.sum()
+        # kernels of a replaced response are stale
+        for cached in [cached for cached in self._kernels
+                       if cached[0] == key]:
+            del self._kernels[cached]
+        return key
+
+    def remove(self, bin_size, offset, n_bins):
+        key = self.configuration(bin_size, offset, n_bins)
+        del self.irfs[key]
+        for cached in [cached for cached in self._kernels
+                       if cached[0] == key]:
+            del self._kernels[cached]
+
+    def clear_cache(self):
+        self._kernels.clear()
+
+    def source(self, bin_size, offset, n_bins):
+        """Configuration of the response used for a histogram axis"""
+        if len(self.irfs) == 0:
+            raise ValueError("No instrument response in the library")
+        key = self.configuration(bin_size, offset, n_bins)
+        if key in self.irfs:
+            return key
+        # closest bin size, the finer response on a tie
+        return min(self.irfs, key=lambda k: (abs(np.log(k[0] / bin_size)),
+                                             k[0]))
+
+    def resample(self, key, bin_size, shift=0.):
+        """Response of configuration key at lags in bins of bin_size
+
+        Returns
+        -------
+        kernel: ndarray
+            Fraction of the response at every lag, summing to one.
+        before: int
+            Number of negative lags.
+        """
+        irf = self.irfs[key]
+        source_bin, source_offset, n = key
+        edges = source_offset + source_bin * np.arange(n + 1)
+        centres = (edges[:-1] + edges[1:]) / 2
+        centroid = irf @ centres
+        cumulative = np.concatenate(([0.], np.cumsum(irf)))
+        # lag bins centred on multiples of bin_size around the centroid
+        before = int(np.ceil((centroid - shift - edges[0]) / bin_size + 0.5))
+        after = int(np.ceil((edges[-1] - centroid + shift) / bin_size + 0.5))
+        before, after = max(before, 0), max(after, 0)
+        lag_edges = bin_size * (np.arange(-before, after + 2) - 0.5)
+        kernel = np.diff(np.interp(centroid + lag_edges - shift, edges,
+                                   cumulative))
+        nonzero = np.flatnonzero(kernel > 0)
+        if len(nonzero) == 0:
+            # narrower than a bin and shifted off the lag range
+            return np.ones(1), 0
+        kernel = kernel[nonzero[0]:nonzero[-1] + 1]
+        return kernel / kernel.sum(), before - nonzero[0]
+
+    def convolution(self, bin_size, offset, n_bins, shift=0.):
+        """Cached convolution with the response for a histogram axis
+
+        Parameters
+        ----------
+        bin_size, offset: float
+            Bin size and offset (µs) of the histograms to convolve.
+        n_bins: int
+            Number of bins of the histograms.
+        shift: float
+            Delay (µs) added to the response.
+
+        Returns
+        -------
+        IrfConvolution: callable on decays of shape (..., n_bins)
+        """
+        key = self.source(bin_size, offset, n_bins)
+        # the lags do not depend on the offset of the axis
+        cached = (key, round(float(bin_size), 9), int(n_bins),
+                  round(float(shift), 9))
+        convolution = self._kernels.get(cached)
+        if convolution is not None:
+            self.hits += 1
+            self._kernels.move_to_end(cached)
+            return convolution
+        self.misses += 1
+        kernel, before = self.resample(key, bin_size, shift)
+        convolution = IrfConvolution(kernel, before, int(n_bins))
+        self._kernels[cached] = convolution
+        if len(self._kernels) > self.max_kernels:
+            self._kernels.popitem(last=False)
+        return convolution
+
+    def save(self, path):
+        """Write the responses to a .npz file"""
+        arrays = dict(('irf_%d' % i, irf)
+                      for i, irf in enumerate(self.irfs.values()))
+        keys = np.array([key[:2] for key in self.irfs]).reshape(-1, 2)
+        np.savez(path, keys=keys, **arrays)
+
+    def load(self, path):
+        """Add the responses of a file written by save()"""
+        with np.load(path) as file:
+            for i, (bin_size, offset) in enumerate(file['keys']):
+                self.add(file['irf_%d' % i], bin_size, offset)
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+class KineticSeries:
+    """ Histograms of successive time slices, a growing (slice, delay) array.
+
+    Frames are added with their duration and summed into the slice in
+    progress, which is closed once it reaches the slice time, so slices
+    consist of whole frames and last the sum of their frame durations, at
+    least the slice time. Slices are stored in chunks of chunk_size rows.
+    When max_slices slices are stored, neighbouring slices are merged in
+    pairs and the slice time doubles, which bounds the memory to max_slices
+    rows while keeping all counts.
+
+    Parameters
+    ----------
+    n_bins: int
+        Number of histogram bins.
+    slice_time: float
+        Duration of a slice (s).
+    chunk_size: int
+        Number of slices per storage chunk.
+    max_slices: int
+        Maximum number of stored slices, rounded up to an even number.
+    dtype: numpy dtype
+        Data type of the stored histograms.
+    """
+
+    def __init__(self, n_bins, slice_time, chunk_size=256, max_slices=4096,
+                 dtype=np.uint32):
+        self.n_bins = n_bins
+        self.slice_time = slice_time
+        self.chunk_size = chunk_size
+        self.max_slices = max_slices + max_slices % 2
+        self.dtype = dtype
+        self.coarsenings = 0
+        self.reset()
+
+    def reset(self):
+        self._chunks = []
+        self._n_slices = 0
+        self._durations = np.zeros(self.max_slices)
+        self._current = np.zeros(self.n_bins)
+        self._current_time = 0.
+        self.slice_time /= 2 ** self.coarsenings
+        self.coarsenings = 0
+
+    @property
+    def n_slices(self):
+        """Number of completed slices"""
+        return self._n_slices
+
+    @property
+    def durations(self):
+        """Measured duration of every completed slice (s)"""
+        return self._durations[:self._n_slices].copy()
+
+    @property
+    def times(self):
+        """Start time of every completed slice (s)"""
+        durations = self.durations
+        return np.cumsum(durations) - durations
+
+    def add(self, hist, duration):
+        """Add a frame of the given duration (s)
+
+        Returns
+        -------
+        int: number of slices completed by this frame
+        """
+        self._current += hist
+        self._current_time += duration
+        # tolerate rounding of the frame durations
+        if self._current_time < self.slice_time * (1. - 1e-6):
+            return 0
+        self._append(self._current, self._current_time)
+        self._current = np.zeros(self.n_bins)
+        self._current_time = 0.
+        return 1
+
+    def _append(self, row, duration):
+        if self._n_slices == len(self._chunks) * self.chunk_size:
+            self._chunks.append(np.zeros((self.chunk_size, self.n_bins),
+                                         dtype=self.dtype))
+        chunk, row_index = divmod(self._n_slices, self.chunk_size)
+        self._chunks[chunk][row_index] = row
+        self._durations[self._n_slices] = duration
+        self._n_slices += 1
+        if self._n_slices >= self.max_slices:
+            self._coarsen()
+
+    def _coarsen(self):
+        merged = self.array().reshape(-1, 2, self.n_bins).sum(axis=1)
+        durations = self.durations.reshape(-1, 2).sum(axis=1)
+        self._chunks = []
+        self._n_slices = 0
+        self.slice_time *= 2
+        self.coarsenings += 1
+        for row, duration in zip(merged, durations):
+            self._append(row, duration)
+
+    def newest(self, n_rows):
+        """The last n_rows completed slices, fewer at the start"""
+        n_rows = min(n_rows, self._n_slices)
+        rows = np.empty((n_rows, self.n_bins), dtype=self.dtype)
+        for i, index in enumerate(range(self._n_slices - n_rows,
+                                        self._n_slices)):
+            chunk, row_index = divmod(index, self.chunk_size)
+            rows[i] = self._chunks[chunk][row_index]
+        return rows
+
+    def array(self):
+        """All completed slices as a (n_slices, n_bins) array"""
+        if self._n_slices == 0:
+            return np.zeros((0, self.n_bins), dtype=self.dtype)
+        return np.concatenate(self._chunks)[:self._n_slices]
+
+    def reslice(self, factor):
+        """Sum groups of factor slices without measuring again
+
+        A trailing group of less than factor slices is kept as a shorter
+        last slice.
+
+        Returns
+        -------
+        (ndarray, ndarray): slices of shape (n, n_bins) and their start times
+        """
+        factor = max(int(factor), 1)
+        array = self.array()
+        starts = np.arange(0, len(array), factor)
+        if len(starts) == 0:
+            return array, self.times
+        return np.add.reduceat(array, starts, axis=0), self.times[starts]
@@ -0,0 +1,122 @@
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.processing.gates import TimeGates
+from pymodaq_plugins_tcspc_arduino.processing.pyramid import HistogramPyramid
+
+
+class TcspcPipeline:
+    """ Shared processing of a stream of TCSPC frames.
+
+    Every frame is accumulated and its count rate appended to a trace; the
+    derived quantities, decays, gate values and lifetime estimate, are only
+    computed when asked for, so that views refreshing at different rates
+    share one accumulation. Current and total decays are also kept as
+    min/max/sum pyramids, from which views of a delay range are read at a
+    resolution matching the display.
+
+    Parameters
+    ----------
+    trace_length: int
+        Number of count rates kept in the trace.
+    """
+
+    def __init__(self, trace_length=1000):
+        self.gates = TimeGates()
+        self.delays = np.zeros(0)
+        self.trace_length = trace_length
+        self.reset()
+
+    def reset(self):
+        self.current = np.zeros(len(self.delays))
+        self.total = np.zeros(len(self.delays))
+        self.current_pyramid = HistogramPyramid(len(self.delays))
+        self.total_pyramid = HistogramPyramid(len(self.delays))
+        self.n_frames = 0
+        self.elapsed = 0.
+        self._trace = deque(maxlen=self.trace_length)
+        self._start = perf_counter()
+
+    def set_axis(self, delays):
+        """Start over if the delays of the frames changed"""
+        delays = np.asarray(delays, dtype=float)
+        if np.array_equal(delays, self.delays):
+            return
+        self.delays = delays
+        if len(delays) > 1:
+            self.gates.set_axis(delays[0], delays[1] - delays[0], len(delays))
+        self.reset()
+
+    def set_gates(self, gates):
+        self.gates.set_gates(gates)
+        if len(self.delays) > 1:
+            self.gates.set_axis(self.delays[0], self.delays[1] - self.delays[0],
+                                len(self.delays))
+
+    def add_frame(self, hist, duration):
+        """Accumulate a frame acquired during duration (s)"""
+        self.current = np.asarray(hist, dtype=float)
+        self.total += self.current
+        self.current_pyramid.set(self.current)
+        self.total_pyramid.add(self.current)
+        self.n_frames += 1
+        self.elapsed += duration
+        rate = self.current.sum() / duration if duration > 0 else np.nan
+        self._trace.append((perf_counter() - self._start, rate))
+
+    def decay_view(self, start=None, stop=None, max_points=1000):
+        """Current and total decays between the delays start and stop.
+
+        Every point merges 2 ** level bins, its value is their mean.
+
+        Returns
+        -------
+        delays: ndarray
+            Mean delay of the bins of every point.
+        current, total, total_min, total_max: ndarray
+            Mean of the current and total decays, and minimum and maximum
+            of the total.
+        """
+        n_bins = len(self.delays)
+        if n_bins < 2:
+            return (self.delays,) + (self.current,) + (self.total,) * 3
+        spacing = self.delays[1] - self.delays[0]
+        first = 0 if start is None \
+            else int(np.floor((start - self.delays[0]) / spacing))
+        last = n_bins if stop is None \
+            else int(np.ceil((stop - self.delays[0]) / spacing)) + 1
+        level, first, _, _, current = self.current_pyramid.view(
+            first, last, max_points)
+        _, _, total_min, total_max, total = self.total_pyramid.view(
+            first, last, max_points)
+        starts = first + (np.arange(len(total)) << level)
+        widths = np.minimum(starts + 2 ** level, n_bins) - starts
+        delays = self.delays[0] + spacing * (starts + (widths - 1) / 2)
+        return delays, current / widths, total / widths, total_min, total_max
+
+    def rate_trace(self):
+        """Times (s) and count rates (Hz) of the last frames"""
+        if len(self._trace) == 0:
+            return np.zeros(0), np.zeros(0)
+        times, rates = np.array(self._trace).T
+        return times, rates
+
+    def gate_values(self):
+        """Gate intensities and ratios of the accumulated decay"""
+        if self.gates.n_gates == 0:
+            return []
+        self.gates.update(self.total)
+        return self.gates.values()
+
+    def lifetime(self):
+        """Background corrected mean delay after the maximum of the decay"""
+        if self.total.sum() == 0:
+            return np.nan
+        peak = np.argmax(self.total)
+        background = np.median(self.total[:peak]) if peak > 0 else 0.
+        net = np.clip(self.total[peak:] - background, 0., None)
+        if net.sum() == 0:
+            return np.nan
+        return float(net @ (self.delays[peak:] - self.delays[peak]) / net.sum())
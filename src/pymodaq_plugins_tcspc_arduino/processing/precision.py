@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class PrecisionEstimator:
+    """ Online relative precision of intensity or lifetime of a histogram.
+
+    The background per bin is the mean of the bins well before the peak of
+    the decay. The intensity is the background corrected number of counts
+    from the peak on, the lifetime the first moment of the corrected decay
+    relative to the peak. Their relative standard deviations follow from
+    Poisson statistics of the counts by linear error propagation.
+
+    Parameters
+    ----------
+    quantity: str
+        'intensity' or 'lifetime'
+    target: float
+        Relative standard deviation at which a measurement is precise enough.
+    guard: int
+        Number of bins before the peak excluded from the background.
+    """
+
+    quantities = ['intensity', 'lifetime']
+
+    def __init__(self, quantity='intensity', target=0.01, guard=3):
+        if quantity not in self.quantities:
+            raise ValueError("Unknown quantity '%s'" % quantity)
+        self.quantity = quantity
+        self.target = target
+        self.guard = guard
+        self._delays = None
+
+    def set_axis(self, x_axis):
+        self._delays = np.asarray(x_axis, dtype=float)
+
+    def relative_precision(self, hist):
+        hist = np.asarray(hist, dtype=float)
+        peak = int(np.argmax(hist))
+        pre_trigger = hist[:max(0, peak - self.guard)]
+        background = pre_trigger.mean() if len(pre_trigger) > 0 else 0.
+        decay = hist[peak:]
+        net = decay - background
+        signal = net.sum()
+        if signal <= 0:
+            return np.inf
+
+        if self.quantity == 'intensity':
+            return np.sqrt(decay.sum()) / signal
+
+        if self._delays is None or len(self._delays) != len(hist):
+            delays = np.arange(len(decay), dtype=float)
+        else:
+            delays = self._delays[peak:] - self._delays[peak]
+        lifetime = np.dot(delays, net) / signal
+        if lifetime <= 0:
+            return np.inf
+        variance = np.dot((delays - lifetime) ** 2, decay) / signal ** 2
+        return np.sqrt(variance) / lifetime
+
+    def is_precise(self, hist):
+        return self.relative_precision(hist) <= self.target
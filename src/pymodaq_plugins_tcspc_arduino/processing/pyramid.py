@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class HistogramPyramid:
+    """ Min, max and sum of a histogram at successive factor 2 resolutions.
+
+    Level 0 is the histogram, every bin of level k + 1 merges two bins of
+    level k. Adding a frame only updates the bins of every level covering
+    the range where the frame has counts, and a view of any delay range is
+    read from the coarsest level still resolving it with the requested
+    number of points, so its cost does not depend on the histogram size.
+
+    Parameters
+    ----------
+    n_bins: int
+        Number of bins of the histogram.
+    """
+
+    def __init__(self, n_bins):
+        self.n_bins = n_bins
+        self.levels = []
+        n = n_bins
+        while True:
+            self.levels.append({ 'min': np.zeros(n), 'max': np.zeros(n),
+                                 'sum': np.zeros(n) })
+            if n <= 1:
+                break
+            n = (n + 1) // 2
+
+    @property
+    def n_levels(self):
+        return len(self.levels)
+
+    def reset(self):
+        for level in self.levels:
+            for array in level.values():
+                array[:] = 0.
+
+    def set(self, hist):
+        """Replace the histogram"""
+        base = self.levels[0]
+        hist = np.asarray(hist, dtype=float)
+        base['sum'][:] = hist
+        base['min'][:] = hist
+        base['max'][:] = hist
+        self._propagate(0, self.n_bins)
+
+    def add(self, frame):
+        """Add a frame, updating only the range where it has counts"""
+        frame = np.asarray(frame, dtype=float)
+        nonzero = np.flatnonzero(frame)
+        if len(nonzero) == 0:
+            return
+        start, stop = nonzero[0], nonzero[-1] + 1
+        base = self.levels[0]
+        base['sum'][start:stop] += frame[start:stop]
+        base['min'][start:stop] = base['sum'][start:stop]
+        base['max'][start:stop] = base['sum'][start:stop]
+        self._propagate(start, stop)
+
+    def _propagate(self, start, stop):
+        for below, level in zip(self.levels[:-1], self.levels[1:]):
+            start, stop = start // 2, (stop + 1) // 2
+            n_below = len(below['sum'])
+            # pairs of the level below, the last one possibly single
+            first = 2 * start
+            last = min(2 * stop, n_below)
+            pairs = np.arange(first, last, 2)
+            partners = np.minimum(pairs + 1, n_below - 1)
+            single = partners == pairs
+            level['sum'][start:stop] = below['sum'][pairs] \
+                + np.where(single, 0., below['sum'][partners])
+            level['min'][start:stop] = np.minimum(below['min'][pairs],
+                                                  below['min'][partners])
+            level['max'][start:stop] = np.maximum(below['max'][pairs],
+                                                  below['max'][partners])
+
+    def level_for(self, start, stop, max_points):
+        """Coarsest level showing bins start to stop with max_points"""
+        width = max(stop - start, 1)
+        level = 0
+        while level + 1 < self.n_levels and width > max_points * 2 ** level:
+            level += 1
+        return level
+
+    def view(self, start, stop, max_points):
+        """Bins start to stop of the histogram in at most about max_points
+
+        Returns
+        -------
+        level: int
+            Every point merges 2 ** level bins.
+        first: int
+            First bin of the histogram in the first point.
+        mins, maxs, sums: ndarray
+            Minimum, maximum and sum of the bins of every point.
+        """
+        start = min(max(int(start), 0), self.n_bins)
+        stop = min(max(int(stop), start), self.n_bins)
+        level = self.level_for(start, stop, max_points)
+        arrays = self.levels[level]
+        first, last = start >> level, -(-stop >> level)
+        return level, first << level, arrays['min'][first:last], \
+            arrays['max'][first:last], arrays['sum'][first:last]
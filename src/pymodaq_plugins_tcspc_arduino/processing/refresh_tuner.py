@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class RefreshTuner:
+    """ Chooses the frame duration from the observed count rate and link load.
+
+    A frame of n_bins costs a transfer time given by its size and the baud
+    rate, and a parse time measured on the host. Its counts grow with the
+    frame duration while its size only grows with the number of digits per
+    bin, so counts per transferred byte increase with the frame duration.
+    The tuner therefore picks the longest frame whose display latency,
+    frame duration plus transfer and parse time, stays within the target,
+    but never a frame shorter than its own transfer time, which would make
+    the link the bottleneck.
+
+    Parameters
+    ----------
+    min_refresh, max_refresh: float
+        Limits of the frame duration in s.
+    target_latency: float
+        Aimed display latency in s.
+    smoothing: float
+        Weight of a new frame in the running averages.
+    hysteresis: float
+        Minimum relative change of the frame duration before retuning.
+    """
+
+    def __init__(self, min_refresh=0.1, max_refresh=2., target_latency=0.5,
+                 smoothing=0.3, hysteresis=0.2):
+        self.min_refresh = min_refresh
+        self.max_refresh = max_refresh
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+        self.operating_point = {}
+        self._count_rate = None
+        self._parse_per_byte = None
+
+    def _average(self, old, new):
+        if old is None:
+            return new
+        return old + self.smoothing * (new - old)
+
+    def predicted_bytes(self, refresh, n_bins, count_rate):
+        """Frame size for a duration, from the expected digits per bin"""
+        mean_counts = count_rate * refresh / max(n_bins, 1)
+        return n_bins * (np.floor(np.log10(mean_counts + 1)) + 3)
+
+    def update(self, stats, n_bins, baudrate):
+        """Account for one frame and return a new refresh time if due.
+
+        Parameters
+        ----------
+        stats: dict
+            frame_stats of the controller after read_histogram.
+        n_bins: int
+        baudrate: int
+
+        Returns
+        -------
+        float or None
+        """
+        refresh = stats['refresh']
+        n_bytes = max(stats['bytes'], 1)
+        transfer = 10. * n_bytes / baudrate  # start, 8 data and stop bit
+        parse = max(stats['read'] - transfer, 0.)
+        self._count_rate = self._average(self._count_rate,
+                                         stats['counts'] / refresh)
+        self._parse_per_byte = self._average(self._parse_per_byte,
+                                             parse / n_bytes)
+
+        # fixed point of refresh = latency - transfer(refresh) - parse(refresh)
+        best = self.max_refresh
+        for _ in range(3):
+            size = self.predicted_bytes(best, n_bins, self._count_rate)
+            link = size * (10. / baudrate + self._parse_per_byte)
+            best = self.target_latency - link
+            best = max(best, 10. * size / baudrate)
+            best = min(max(best, self.min_refresh), self.max_refresh)
+
+        size = self.predicted_bytes(best, n_bins, self._count_rate)
+        self.operating_point = {
+            'refresh': best,
+            'count_rate': self._count_rate,
+            'transfer_time': 10. * size / baudrate,
+            'parse_time': size * self._parse_per_byte,
+            'latency': best + size * (10. / baudrate + self._parse_per_byte),
+            'counts_per_byte': self._count_rate * best / size,
+        }
+
+        if abs(best - refresh) > self.hysteresis * refresh:
+            return best
+        return None
+
+    def report(self):
+        point = self.operating_point
+        return "Refresh %.3g s at %.3g counts/s: transfer %.3g s, parse " \
+            "%.3g s, latency %.3g s, %.3g counts/byte" % \
+            (point['refresh'], point['count_rate'], point['transfer_time'],
+             point['parse_time'], point['latency'], point['counts_per_byte'])
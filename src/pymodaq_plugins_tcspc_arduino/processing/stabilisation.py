@@ -0,0 +1,101 @@
+from time import perf_counter
+
+import numpy as np
+
+
+class RateEstimator:
+    """ Low latency estimate of a count rate from a stream of noisy rates.
+
+    The rates are averaged exponentially with a time constant, every batch
+    at once: the weight of a rate is the fraction of the time constant it
+    was measured over, decayed by the durations of the later ones. A rate
+    deviating from the estimate by more than threshold times its Poisson
+    standard deviation is taken as a step of the true rate, and the
+    average starts over from it, so that steps are followed within one
+    sample while a constant rate is averaged over the time constant.
+
+    Parameters
+    ----------
+    time_constant: float
+        Averaging time (s).
+    threshold: float
+        Deviation of a step, in standard deviations, 0 to never start over.
+    """
+
+    def __init__(self, time_constant=0.1, threshold=5.):
+        self.time_constant = time_constant
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self.estimate = None
+        self.n_steps = 0
+
+    def update(self, rates, durations):
+        """Estimate after rates (Hz) measured during durations (s)"""
+        rates = np.atleast_1d(np.asarray(rates, dtype=float))
+        durations = np.broadcast_to(np.asarray(durations, dtype=float),
+                                    rates.shape)
+        if len(rates) == 0:
+            return self.estimate
+        if self.estimate is None:
+            self.estimate, rates, durations = rates[0], rates[1:], \
+                durations[1:]
+
+        if self.threshold > 0 and len(rates) > 0:
+            sigma = np.sqrt(np.maximum(np.maximum(rates, self.estimate), 1.)
+                            / durations)
+            steps = np.flatnonzero(np.abs(rates - self.estimate)
+                                   > self.threshold * sigma)
+            if len(steps) > 0:
+                self.n_steps += 1
+                self.estimate = rates[steps[-1]]
+                rates = rates[steps[-1] + 1:]
+                durations = durations[steps[-1] + 1:]
+
+        if len(rates) > 0:
+            keep = np.exp(-durations / self.time_constant)
+            # decay of every rate by the later ones
+            later = np.append(np.cumprod(keep[::-1])[::-1][1:], 1.)
+            self.estimate = self.estimate * later[0] * keep[0] \
+                + np.sum((1. - keep) * later * rates)
+        return self.estimate
+
+
+class LoopTimer:
+    """ Period and jitter of a control loop over its last iterations.
+
+    Parameters
+    ----------
+    n_periods: int
+        Number of periods kept.
+    """
+
+    def __init__(self, n_periods=256):
+        self.periods = np.zeros(n_periods)
+        self.reset()
+
+    def reset(self):
+        self.n_periods = 0
+        self._last = None
+
+    def tick(self):
+        """Record the start of an iteration"""
+        now = perf_counter()
+        if self._last is not None:
+            self.periods[self.n_periods % len(self.periods)] = now - self._last
+            self.n_periods += 1
+        self._last = now
+
+    def _recent(self):
+        return self.periods[:min(self.n_periods, len(self.periods))]
+
+    def period(self):
+        """Mean period (s)"""
+        recent = self._recent()
+        return recent.mean() if len(recent) > 0 else np.nan
+
+    def jitter(self):
+        """Standard deviation of the period (s)"""
+        recent = self._recent()
+        return recent.std() if len(recent) > 1 else np.nan
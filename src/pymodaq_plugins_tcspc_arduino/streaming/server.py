@@ -0,0 +1,256 @@
+import os
+import queue
+import socket
+import struct
+import threading
+from time import time
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+# magic, kind, dtype code, number of arrays, elements per array, frame,
+# timestamp, offset and bin size of the histograms
+header = struct.Struct('<4sBcHIQddd')
+magic = b'TCSF'
+HISTOGRAMS = 0
+TAGS = 1
+RATES = 2
+dtypes = { b'd': np.dtype('<f8'), b'l': np.dtype('<i8'),
+           b'T': TcspcArduinoController.tag_dtype.newbyteorder('<') }
+default_address = '127.0.0.1:5757'
+
+
+def parse_address(address):
+    """(family, address) of 'host:port' or of a Unix socket path"""
+    if ':' in address and not address.startswith(os.sep):
+        host, port = address.rsplit(':', 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def encode_frame(kind, arrays, frame=0, offset=0., bin_size=0.):
+    """Frame of arrays of equal length and dtype as bytes"""
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    code = [c for c, dtype in dtypes.items() if dtype == arrays[0].dtype]
+    if len(code) == 0:
+        raise ValueError("Unsupported dtype %s" % arrays[0].dtype)
+    return b''.join([header.pack(magic, kind, code[0], len(arrays),
+                                 len(arrays[0]), frame, time(), offset,
+                                 bin_size)]
+                    + [a.tobytes() for a in arrays])
+
+
+def decode_frame(receive):
+    """Decode the next frame
+
+    Parameters
+    ----------
+    receive: callable
+        Returns the given number of bytes.
+
+    Returns
+    -------
+    (dict, list of ndarray): header fields and arrays
+    """
+    fields = header.unpack(receive(header.size))
+    if fields[0] != magic:
+        raise ValueError("Not a TCSPC stream frame")
+    _, kind, code, n_arrays, length, frame, timestamp, offset, bin_size \
+        = fields
+    dtype = dtypes[code]
+    data = receive(n_arrays * length * dtype.itemsize)
+    arrays = list(np.frombuffer(data, dtype=dtype).reshape(n_arrays, length))
+    return { 'kind': kind, 'frame': frame, 'timestamp': timestamp,
+             'offset': offset, 'bin_size': bin_size }, arrays
+
+
+def read_frames(file):
+    """Iterate over the frames of a binary file written by the stream"""
+
+    def receive(n_bytes):
+        data = file.read(n_bytes)
+        if len(data) < n_bytes:
+            raise EOFError
+        return data
+
+    while True:
+        try:
+            yield decode_frame(receive)
+        except EOFError:
+            return
+
+
+class _Client:
+
+    def __init__(self, connection, queue_size):
+        self.connection = connection
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, frame):
+        """Queue a frame, dropping the oldest one if the client lags"""
+        while True:
+            try:
+                self.queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        try:
+            while True:
+                frame = self.queue.get()
+                if frame is None:
+                    break
+                self.connection.sendall(frame)
+        except OSError:
+            pass
+        self.connection.close()
+
+    def close(self):
+        self.put(None)
+
+
+class StreamServer:
+    """ Broadcasts histogram and tag frames to local clients.
+
+    Every frame is a fixed header followed by the raw arrays. Each client
+    has its own queue of queue_size frames served by its own thread; when a
+    client lags behind, its oldest frames are dropped so neither the
+    acquisition nor the other clients wait for it.
+
+    Parameters
+    ----------
+    address: str
+        'host:port' for TCP, otherwise the path of a Unix socket.
+    queue_size: int
+        Frames queued per client.
+    """
+
+    def __init__(self, address=default_address, queue_size=16):
+        self.family, self.address = parse_address(address)
+        self.queue_size = queue_size
+        self.clients = []
+        self.frame = 0
+        self._lock = threading.Lock()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.socket = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(self.address)
+        self.socket.listen()
+        self.address = self.socket.getsockname()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                break
+            if self.family == socket.AF_INET:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                      1)
+            with self._lock:
+                self.clients.append(_Client(connection, self.queue_size))
+
+    @property
+    def dropped(self):
+        """Frames dropped per connected client"""
+        return [client.dropped for client in self.clients]
+
+    def broadcast(self, kind, arrays, offset=0., bin_size=0.):
+        self.frame += 1
+        frame = encode_frame(kind, arrays, self.frame, offset, bin_size)
+        with self._lock:
+            self.clients = [c for c in self.clients if c.thread.is_alive()]
+            for client in self.clients:
+                client.put(frame)
+
+    def send_histograms(self, current, total, offset=0., bin_size=0.):
+        self.broadcast(HISTOGRAMS, [np.asarray(current, dtype=float),
+                                    np.asarray(total, dtype=float)],
+                       offset, bin_size)
+
+    def send_tags(self, tags):
+        self.broadcast(TAGS, [tags.astype(dtypes[b'T'], copy=False)])
+
+    def close(self):
+        self.socket.close()
+        with self._lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class StreamClient:
+    """ Receives the frames of a StreamServer.
+
+    Parameters
+    ----------
+    address: str
+        'host:port' for TCP, otherwise the path of a Unix socket.
+    timeout: float or None
+        Socket timeout (s).
+    """
+
+    def __init__(self, address=default_address, timeout=None):
+        family, address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(address)
+
+    def _receive(self, n_bytes):
+        buffer = bytearray(n_bytes)
+        view = memoryview(buffer)
+        received = 0
+        while received < n_bytes:
+            n = self.socket.recv_into(view[received:])
+            if n == 0:
+                raise ConnectionError("Stream closed by the server")
+            received += n
+        return buffer
+
+    def read_frame(self):
+        """Next frame
+
+        Returns
+        -------
+        (dict, list of ndarray): header fields and arrays
+        """
+        return decode_frame(self._receive)
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.read_frame()
+            except ConnectionError:
+                return
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,164 @@
+from multiprocessing import shared_memory, resource_tracker
+from time import time
+
+import numpy as np
+
+
+header_dtype = np.dtype([('magic', 'S4'), ('version', np.uint32),
+                         ('sequence', np.uint64), ('frame', np.uint64),
+                         ('n_bins', np.uint32), ('max_bins', np.uint32),
+                         ('timestamp', np.float64), ('offset', np.float64),
+                         ('bin_size', np.float64), ('refresh', np.float64),
+                         ('threshold', np.float64)])
+magic = b'TCSP'
+version = 1
+default_name = 'tcspc_arduino'
+one = np.uint64(1)
+
+
+def _layout(buffer, max_bins):
+    header = np.ndarray((), dtype=header_dtype, buffer=buffer)
+    hists = np.ndarray((2, max_bins), dtype=np.float64, buffer=buffer,
+                       offset=header_dtype.itemsize)
+    return header, hists
+
+
+class HistogramPublisher:
+    """ Publishes the current and total histograms in shared memory.
+
+    The block starts with a header holding a sequence counter, the frame
+    number and the acquisition settings, followed by the current and total
+    histograms with room for max_bins bins each. The sequence counter is odd
+    while a frame is being written (seqlock), so readers detect and retry
+    torn reads without ever blocking the writer.
+
+    Parameters
+    ----------
+    name: str
+        Name of the shared memory block.
+    max_bins: int
+        Largest number of bins that can be published.
+    """
+
+    def __init__(self, name=default_name, max_bins=10000):
+        self.name = name
+        self.max_bins = max_bins
+        size = header_dtype.itemsize + 2 * max_bins * 8
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # left over by a publisher that did not close
+            self.shm = shared_memory.SharedMemory(name)
+            if self.shm.size < size:
+                self.shm.close()
+                raise
+        self._header, self._hists = _layout(self.shm.buf, max_bins)
+        self._header['sequence'] = 0
+        self._header['frame'] = 0
+        self._header['max_bins'] = max_bins
+        self._header['version'] = version
+        self._header['magic'] = magic
+
+    def publish(self, current, total, offset=0., bin_size=0., refresh=0.,
+                threshold=0.):
+        n_bins = min(len(current), self.max_bins)
+        header = self._header
+        header['sequence'] += one
+        header['n_bins'] = n_bins
+        header['frame'] += one
+        header['timestamp'] = time()
+        header['offset'] = offset
+        header['bin_size'] = bin_size
+        header['refresh'] = refresh
+        header['threshold'] = threshold
+        self._hists[0, :n_bins] = current[:n_bins]
+        self._hists[1, :n_bins] = total[:n_bins]
+        header['sequence'] += one
+
+    def close(self):
+        del self._header, self._hists
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HistogramReader:
+    """ Maps histograms published by a HistogramPublisher.
+
+    read() returns a consistent copy. For zero-copy access, views() gives
+    the histograms in place along with the sequence number, which is still
+    valid after use if valid(sequence) returns True.
+
+    Parameters
+    ----------
+    name: str
+        Name of the shared memory block.
+    """
+
+    def __init__(self, name=default_name):
+        self.shm = shared_memory.SharedMemory(name)
+        # the publisher owns the block, do not unlink it when exiting
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        header = np.ndarray((), dtype=header_dtype, buffer=self.shm.buf)
+        if header['magic'] != magic or header['version'] != version:
+            self.shm.close()
+            raise ValueError("'%s' holds no TCSPC histograms" % name)
+        self._header, self._hists = _layout(self.shm.buf,
+                                            int(header['max_bins']))
+        self._last_frame = 0
+
+    @property
+    def sequence(self):
+        return int(self._header['sequence'])
+
+    def valid(self, sequence):
+        """True if no frame was written since sequence was read"""
+        return sequence % 2 == 0 and self.sequence == sequence
+
+    def views(self):
+        """Settings, current and total histograms in place, and sequence"""
+        while True:
+            sequence = self.sequence
+            if sequence % 2 == 0:
+                break
+        header = self._header
+        n_bins = int(header['n_bins'])
+        settings = {key: header[key].item() for key in
+                    ('frame', 'n_bins', 'timestamp', 'offset', 'bin_size',
+                     'refresh', 'threshold')}
+        return settings, self._hists[0, :n_bins], self._hists[1, :n_bins], \
+            sequence
+
+    def read(self):
+        """Consistent copy of the last frame
+
+        Returns
+        -------
+        (dict, ndarray, ndarray): settings, current and total histograms
+        """
+        while True:
+            settings, current, total, sequence = self.views()
+            current = current.copy()
+            total = total.copy()
+            if self.valid(sequence):
+                self._last_frame = settings['frame']
+                return settings, current, total
+
+    def new_frame(self):
+        """True if a frame was published since the last read"""
+        return int(self._header['frame']) != self._last_frame
+
+    def close(self):
+        del self._header, self._hists
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
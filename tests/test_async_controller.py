@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+def simulator(refresh=0.05):
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.update_simulation_data()
+    controller.refresh = refresh
+    return controller
+
+
+def test_boards_run_concurrently():
+    boards = [simulator() for _ in range(3)]
+
+    async def acquire(board):
+        return [hist async for hist in board.frames(board.TCSPC, 4)]
+
+    async def main():
+        return await asyncio.gather(*[acquire(board) for board in boards])
+
+    start = perf_counter()
+    results = asyncio.run(main())
+    # four refresh periods for all boards together
+    assert perf_counter() - start < 3 * 4 * 0.05
+    assert [len(frames) for frames in results] == [4, 4, 4]
+    assert not any(board.is_acquiring for board in boards)
+
+
+def test_cancellation_stops_board():
+    board = simulator(refresh=10.)
+
+    async def main():
+        async def acquire():
+            async for _ in board.frames(board.SPC):
+                pass
+        task = asyncio.create_task(acquire())
+        await asyncio.sleep(0.05)
+        assert board.is_acquiring
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert not board.is_acquiring
+
+
+def test_sync_wrappers():
+    board = simulator(refresh=0.01)
+    board.n_bins = 50
+    assert board.n_bins == 50
+    board.start_tcspc()
+    assert len(board.read_histogram()) == 50
+    board.stop()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='pseudo terminals')
+def test_transport_lines_and_timeout():
+    import tty
+    from serial import Serial
+    from pymodaq_plugins_tcspc_arduino.hardware.serial_transport import \
+        SerialTransport
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    serial = Serial(os.ttyname(slave), timeout=0.2)
+    transport = SerialTransport(serial)
+    try:
+        os.write(master, b'1\r\n2\r\n3\r\n4')
+
+        async def main():
+            lines = await transport.readlines_async(3)
+            partial = await transport.readline_async(0.05)
+            # a cancelled read leaves no reader behind
+            task = asyncio.create_task(transport.readline_async(None))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert not asyncio.get_running_loop().remove_reader(transport.fd)
+            return lines, partial
+
+        lines, partial = asyncio.run(main())
+        assert np.array(b''.join(lines).split(), dtype=int).tolist() \
+            == [1, 2, 3]
+        assert partial == b'4'
+        os.write(master, b'5\r\n')
+        assert transport.readline() == b'5\r\n'
+    finally:
+        serial.close()
+        os.close(master)
+        os.close(slave)
+
+
+def test_incomplete_frame():
+    parse = TcspcArduinoController._parse_lines
+    assert parse([b'1\r\n', b'2\r\n'], 2).tolist() == [1, 2]
+    # a missing line, or a line split by a corrupted byte
+    with pytest.raises(TimeoutError):
+        parse([b'1\r\n', b'2\r\n'], 3)
+    with pytest.raises(TimeoutError):
+        parse([b'1\r\n', b'2 3\r\n'], 2)
@@ -0,0 +1,89 @@
+from time import perf_counter
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.bursts import \
+    PhotonBurstSearch, BinnedBurstSearch
+
+
+def photon_stream(rng):
+    background = rng.integers(0, 10**8, 20000)
+    bursts = [centre + rng.integers(0, 20 * n, n) for centre, n in
+              zip(rng.integers(0, 10**8, 50), rng.integers(20, 200, 50))]
+    times = np.sort(np.concatenate([background] + bursts))
+    return times, rng.integers(0, 64, len(times))
+
+
+def reference_bursts(times, delays, m, window, min_counts):
+    """Sliding-window search one window at a time"""
+    n = len(times)
+    member = np.zeros(n, dtype=bool)
+    for j in range(m - 1, n):
+        if times[j] - times[j - m + 1] <= window:
+            member[j - m + 1:j + 1] = True
+    bursts, decay, i = [], np.zeros(64), 0
+    while i < n:
+        if not member[i]:
+            i += 1
+            continue
+        j = i
+        while j < n and member[j]:
+            j += 1
+        if j == n: # not complete
+            break
+        if j - i >= min_counts:
+            bursts.append((times[i], times[j - 1] - times[i], j - i))
+            decay += np.bincount(delays[i:j], minlength=64)
+        i = j
+    return bursts, decay
+
+
+@pytest.mark.parametrize('n_chunks', [1, 7, 200])
+def test_photon_bursts_do_not_depend_on_chunks(n_chunks):
+    rng = np.random.default_rng(3)
+    times, delays = photon_stream(rng)
+    expected, decay = reference_bursts(times, delays, 10, 2000, 30)
+    assert len(expected) > 10
+
+    search = PhotonBurstSearch(10, 2000, min_counts=30, n_bins=64)
+    cuts = np.concatenate(([0], np.sort(rng.integers(0, len(times),
+                                                     n_chunks - 1)),
+                           [len(times)]))
+    bursts = np.concatenate([search.add_tags(times[a:b], delays[a:b])
+                             for a, b in zip(cuts[:-1], cuts[1:])])
+    assert len(bursts) == len(expected) == search.n_bursts
+    assert np.allclose(bursts['start'], [b[0] for b in expected])
+    assert np.allclose(bursts['duration'], [b[1] for b in expected])
+    assert np.all(bursts['counts'] == [b[2] for b in expected])
+    assert np.allclose(search.decay, decay)
+
+
+def test_binned_bursts():
+    counts = np.zeros(1000, dtype=int)
+    counts[100:104] = 20
+    counts[500] = 15 # below the window threshold
+    counts[700:702] = 40
+    search = BinnedBurstSearch(n_windows=2, threshold=30, bin_time=0.01,
+                               n_bins=3)
+    histograms = np.repeat(counts[:, None], 3, axis=1) * [1, 2, 3]
+    bursts = np.concatenate([search.add_counts(counts[a:a + 33],
+                                               histograms[a:a + 33])
+                             for a in range(0, 1000, 33)])
+    # windows with a single bright bin pass, and take their empty bin in
+    assert np.allclose(bursts['start'], [1., 6.99])
+    assert np.allclose(bursts['duration'], [0.04, 0.04])
+    assert np.all(bursts['counts'] == [80, 80])
+    assert np.allclose(bursts['rate'], [2000., 2000.])
+    assert np.allclose(search.decay, [160, 320, 480])
+
+
+def test_burst_search_rate():
+    rng = np.random.default_rng(4)
+    times = np.cumsum(rng.exponential(1., 10**6)).astype(np.int64)
+    search = PhotonBurstSearch(10, 5, min_counts=20, n_bins=256)
+    delays = rng.integers(0, 256, len(times))
+    start = perf_counter()
+    for i in range(0, len(times), 10**5):
+        search.add_tags(times[i:i + 10**5], delays[i:i + 10**5])
+    assert perf_counter() - start < 1.
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+from time import get_clock_info, perf_counter
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.checkpoint import \
+    AccumulationCheckpoint
+
+
+settings = dict(threshold=0.5, offset=0.1, bin_size=0.05, refresh=0.5)
+
+
+def _accumulate_and_crash(path, n_frames):
+    checkpoint = AccumulationCheckpoint(path, max_bins=100)
+    total = np.zeros(50)
+    for i in range(1, n_frames + 1):
+        total += 1.
+        checkpoint.save(total, i, 0.5 * i, settings)
+    os._exit(1) # no close, no cleanup
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / 'checkpoint.bin'
+    with AccumulationCheckpoint(path, max_bins=100) as checkpoint:
+        assert checkpoint.load() is None
+        checkpoint.save(np.arange(50.), 3, 1.5, settings)
+        checkpoint.save(np.arange(50.) * 2, 4, 2., settings)
+    with AccumulationCheckpoint(path, max_bins=100) as checkpoint:
+        state, total = checkpoint.load()
+        assert np.allclose(total, np.arange(50.) * 2)
+        assert state['n_frames'] == 4 and state['elapsed'] == 2.
+        assert state['bin_size'] == 0.05 and not state['complete']
+        checkpoint.save(total, 5, 2.5, settings, complete=True)
+        assert checkpoint.load() is None
+        assert checkpoint.load(complete=True)[0]['n_frames'] == 5
+        checkpoint.clear()
+        assert checkpoint.load(complete=True) is None
+
+
+def test_torn_checkpoint_falls_back(tmp_path):
+    with AccumulationCheckpoint(tmp_path / 'checkpoint.bin',
+                                max_bins=100) as checkpoint:
+        checkpoint.save(np.ones(50), 1, 1., settings)
+        checkpoint.save(np.full(50, 2.), 2, 2., settings)
+        # a crash while writing the first bins of the latest checkpoint
+        checkpoint._slots[1][2][:10] = 3.
+        state, total = checkpoint.load()
+        assert state['n_frames'] == 1 and np.allclose(total, 1.)
+
+
+def test_survives_a_crash(tmp_path):
+    path = str(tmp_path / 'checkpoint.bin')
+    process = multiprocessing.Process(target=_accumulate_and_crash,
+                                      args=(path, 20))
+    process.start()
+    process.join()
+    assert process.exitcode == 1
+    with AccumulationCheckpoint(path, max_bins=100) as checkpoint:
+        state, total = checkpoint.load()
+        assert state['n_frames'] == 20 and np.allclose(total, 20.)
+
+
+def test_other_layout_starts_over(tmp_path):
+    path = tmp_path / 'checkpoint.bin'
+    with AccumulationCheckpoint(path, max_bins=100) as checkpoint:
+        checkpoint.save(np.ones(50), 1, 1., settings)
+    with AccumulationCheckpoint(path, max_bins=200) as checkpoint:
+        assert checkpoint.load() is None
+
+
+def test_too_many_bins(tmp_path):
+    with AccumulationCheckpoint(tmp_path / 'checkpoint.bin',
+                                max_bins=100) as checkpoint:
+        checkpoint.save(np.ones(50), 1, 1., settings)
+        with pytest.raises(ValueError):
+            checkpoint.save(np.ones(101), 2, 2., settings)
+        assert checkpoint.load()[0]['n_frames'] == 1
+
+
+def test_update_keeps_overhead_low(tmp_path):
+    with AccumulationCheckpoint(tmp_path / 'checkpoint.bin', interval=0.,
+                                max_overhead=0.01) as checkpoint:
+        total = np.ones(10000)
+        costs = []
+        start = perf_counter()
+        while len(costs) < 4:
+            cost = checkpoint.cost
+            attempt = perf_counter()
+            if checkpoint.update(total, 1, 0., settings):
+                costs.append(checkpoint.cost - cost)
+        # every save before the last one is followed by its wait, so they
+        # cost at most max_overhead of the time up to the last one; each
+        # cost and the duration are read off the timer to its resolution
+        resolution = get_clock_info('perf_counter').resolution
+        tolerance = (len(costs) - 1 + checkpoint.max_overhead) * resolution
+        assert sum(costs[:-1]) \
+            <= checkpoint.max_overhead * (attempt - start) + tolerance
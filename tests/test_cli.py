@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+from pymodaq_plugins_tcspc_arduino.cli import main
+from pymodaq_plugins_tcspc_arduino.streaming.server import read_frames, \
+    HISTOGRAMS
+
+
+def test_binary_histograms(tmp_path):
+    path = tmp_path / 'run.bin'
+    assert main(['--port', '', '--refresh', '0.01', '--n-bins', '50',
+                 '--frames', '3', '--output', str(path)]) == 0
+    with open(path, 'rb') as file:
+        frames = list(read_frames(file))
+    assert len(frames) == 3
+    info, (hist,) = frames[-1]
+    assert info['kind'] == HISTOGRAMS and info['frame'] == 3
+    assert len(hist) == 50
+
+
+def test_text_tags(capsys):
+    main(['--port', '', '--mode', 'tagger', '--refresh', '0.01',
+          '--frames', '2'])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert all(int(t) >= 0 for t in lines[0].split())
+
+
+def test_no_qt():
+    code = "import sys, pymodaq_plugins_tcspc_arduino.cli; " \
+           "print(any(m.startswith(('PyQt', 'qtpy', 'pymodaq.')) " \
+           "for m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == 'False'
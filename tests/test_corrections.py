@@ -0,0 +1,80 @@
+import numpy as np
+
+from pymodaq.utils.data import Axis
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.corrections import coates, \
+    HistogramCorrector
+
+
+def test_coates_recovers_piled_up_decay():
+    rng = np.random.default_rng(2)
+    n_cycles, n_bins = 200000, 50
+    expected = 0.04 * np.exp(-np.arange(n_bins) / 10.)
+    # first photon of every cycle, Poisson photon numbers per bin
+    photons = rng.poisson(expected, (n_cycles, n_bins)) > 0
+    first = np.argmax(photons, axis=1)[photons.any(axis=1)]
+    recorded = np.bincount(first, minlength=n_bins)
+    assert recorded[-1] < 0.8 * n_cycles * expected[-1]
+    corrected = coates(recorded, n_cycles) / n_cycles
+    assert np.allclose(corrected[:25], expected[:25], rtol=0.06)
+    assert abs(corrected[25:].sum() / expected[25:].sum() - 1) < 0.03
+
+
+def test_dnl_and_background():
+    widths = np.tile([0.8, 1.2], 10)
+    corrector = HistogramCorrector(pile_up=False, background_end=0.5)
+    corrector.set_axis(0., 0.1, 20)
+    corrector.set_flat_field(1000 * widths, 0., 0.1)
+    assert corrector.dnl_available
+    signal = np.where(np.arange(20) >= 5, 50., 0.)
+    corrected = corrector.correct((signal + 10.) * widths, 1.)
+    assert np.allclose(corrected, signal)
+
+
+def test_flat_field_needs_matching_axis():
+    corrector = HistogramCorrector(pile_up=False, background=False)
+    corrector.set_axis(0., 0.1, 20)
+    corrector.set_flat_field(np.ones(20), 0., 0.1)
+    corrector.set_axis(0., 0.2, 20)
+    assert not corrector.dnl_available
+    assert np.array_equal(corrector.correct(np.arange(20.), 1.),
+                          np.arange(20.))
+    corrector.set_axis(0., 0.1, 20)
+    assert corrector.dnl_available
+
+
+def test_pile_up_corrected_with_simulated_cycles():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.n_bins = 20
+    controller.refresh = 0.01
+    controller.count_rate = 1e5
+    controller.update_simulation_data()
+    controller.photon_simulation = True
+    # conversions longer than the pulse period ignore pulses
+    controller.photon_simulator.tdc_dead_time = 20.
+    worker = TcspcWorker(controller)
+    worker.corrector = HistogramCorrector(dnl=False, background=False)
+    frames, results = [], []
+
+    def record(delays, hist, duration):
+        frames.append((hist, controller.frame_stats['cycles']))
+        if len(frames) == 5:
+            worker.stop()
+
+    controller.frame_callbacks.append(record)
+    worker.dte_signal_temp.connect(results.append)
+    worker.start(20, 0, 0, Axis('Time', units='µs',
+                                data=controller.get_x_axis(), index=0))
+    stats = controller.photon_simulator.stats
+    assert stats['ignored'] > 0
+    assert sum(cycles for _, cycles in frames) \
+        == stats['pulses'] - stats['ignored']
+    corrected = results[-1].get_data_from_name('tcspc corrected')
+    assert np.allclose(corrected[1], sum(coates(hist, cycles)
+                                         for hist, cycles in frames))
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.correlation import \
+    MultiTauCorrelator
+
+
+def poisson_tags(rng, n, mean_interval):
+    return np.cumsum(rng.exponential(mean_interval, n)).astype(np.int64)
+
+
+def antibunched_tags(rng, n, dead_time, mean_interval):
+    intervals = dead_time + rng.exponential(mean_interval, n)
+    return np.cumsum(intervals).astype(np.int64)
+
+
+def test_lags_are_log_spaced():
+    correlator = MultiTauCorrelator(n_channels=8, n_levels=3, resolution=2)
+    lags = correlator.lags
+    assert len(lags) == 8 + 2 * 4
+    assert np.all(np.diff(lags) > 0)
+    assert lags[0] == 2
+    assert lags[-1] == 8 * 4 * 2
+
+
+def test_poisson_is_uncorrelated():
+    rng = np.random.default_rng(0)
+    tags = poisson_tags(rng, 200000, 10.)
+    correlator = MultiTauCorrelator(n_channels=16, n_levels=10)
+    for chunk in np.array_split(tags, 20):
+        correlator.add_tags(chunk)
+    g = correlator.correlation()
+    assert np.all(np.isfinite(g))
+    assert np.allclose(g, 1., atol=0.05)
+
+
+def test_antibunching_dip():
+    rng = np.random.default_rng(1)
+    tags = antibunched_tags(rng, 200000, 40, 10.)
+    correlator = MultiTauCorrelator(n_channels=16, n_levels=10)
+    for chunk in np.array_split(tags, 20):
+        correlator.add_tags(chunk)
+    g = correlator.correlation()
+    lags = correlator.lags
+    assert np.all(g[lags < 40] == 0)
+    assert g[-1] == pytest.approx(1., abs=0.05)
+
+
+def test_chunking_does_not_change_result():
+    rng = np.random.default_rng(2)
+    tags = poisson_tags(rng, 50000, 7.)
+    whole = MultiTauCorrelator(n_channels=8, n_levels=12)
+    whole.add_tags(tags, end_time=tags[-1] + 1)
+    chunked = MultiTauCorrelator(n_channels=8, n_levels=12)
+    for chunk in np.array_split(tags, 37):
+        chunked.add_tags(chunk)
+    chunked.add_tags([], end_time=tags[-1] + 1)
+    assert np.allclose(whole.correlation(), chunked.correlation(),
+                       equal_nan=True)
+
+
+def test_cross_correlation_of_independent_streams():
+    rng = np.random.default_rng(3)
+    tags_a = poisson_tags(rng, 100000, 10.)
+    tags_b = poisson_tags(rng, 100000, 10.)
+    end = min(tags_a[-1], tags_b[-1])
+    correlator = MultiTauCorrelator(n_channels=16, n_levels=8)
+    correlator.add_tags(tags_a[tags_a < end], tags_b[tags_b < end],
+                        end_time=end)
+    assert np.allclose(correlator.correlation(), 1., atol=0.05)
@@ -0,0 +1,101 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from qtpy import QtWidgets
+
+from pymodaq.utils.data import Axis
+from pymodaq.utils.gui_utils import DockArea
+from pymodaq.utils.managers.modules_manager import ModulesManager
+from pymodaq.utils.parameter import Parameter
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker
+from pymodaq_plugins_tcspc_arduino.extensions.tcspc_dashboard import \
+    DashboardWorker, TcspcDashboard
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+@pytest.fixture
+def controller():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.n_bins = 20
+    controller.refresh = 0.01
+    controller.update_simulation_data()
+    return controller
+
+
+@pytest.fixture
+def dashboard(controller):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    detectors = [SimpleNamespace(title='tcspc', controller=controller),
+                 SimpleNamespace(title='camera', controller=None)]
+    modules_manager = ModulesManager(detectors, selected_detectors=detectors)
+    dashboard = TcspcDashboard(DockArea(),
+                               SimpleNamespace(modules_manager=modules_manager))
+    yield dashboard
+    dashboard.subscribe(False)
+    dashboard.thread.quit()
+    dashboard.thread.wait()
+
+
+def dispatched(path):
+    settings = Parameter.create(name='settings', type='group',
+                                children=TcspcDashboard.params)
+    calls = []
+    dashboard = SimpleNamespace(
+        settings=settings,
+        update_periods=lambda: calls.append('periods'),
+        update_gates=lambda: calls.append('gates'))
+    TcspcDashboard.value_changed(dashboard, settings.child(*path))
+    return calls
+
+
+def test_gate_refresh_rate_updates_periods():
+    assert dispatched(('rates', 'gates')) == ['periods']
+
+
+def test_gates_update_gates():
+    assert dispatched(('gates',)) == ['gates']
+
+
+def test_live_acquisition_feeds_pipeline(controller):
+    processing = DashboardWorker()
+    worker = TcspcWorker(controller)
+    frames = []
+
+    def stop_after_five(delays, hist, duration):
+        frames.append(duration)
+        if len(frames) == 5:
+            worker.stop()
+
+    controller.frame_callbacks += [processing.process, stop_after_five]
+    worker.start(20, 0, 0, Axis('Time', units='µs',
+                                data=controller.get_x_axis(), index=0))
+    pipeline = processing.pipeline
+    assert pipeline.n_frames == 5
+    assert np.allclose(pipeline.delays, controller.get_x_axis())
+    assert np.allclose(pipeline.total, worker.last_total)
+    assert pipeline.elapsed == pytest.approx(5 * controller.refresh)
+    # the zoomed out decay view is read from the live pyramids
+    _, _, total, _, _ = pipeline.decay_view(max_points=5)
+    assert np.allclose(total, worker.last_total.reshape(5, 4).mean(axis=1))
+
+
+def test_subscribe_registers_with_tcspc_controllers(dashboard, controller):
+    frames = []
+    dashboard.frame_signal.connect(lambda *frame: frames.append(frame))
+    dashboard.settings.child('subscribe').setValue(True)
+    assert controller.frame_callbacks == [dashboard.new_frame]
+    hist = controller.get_histogram()
+    assert len(frames) == 1 and np.array_equal(frames[0][1], hist)
+
+    dashboard.settings.child('subscribe').setValue(False)
+    assert controller.frame_callbacks == []
+    controller.get_histogram()
+    assert len(frames) == 1
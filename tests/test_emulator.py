@@ -0,0 +1,127 @@
+import sys
+from time import sleep
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32',
+                                reason='pseudo terminals need POSIX')
+
+
+def connect(emulator):
+    controller = TcspcArduinoController()
+    controller.port = emulator.port
+    controller.baudrate = emulator.baudrate
+    controller.connect()
+    assert not controller.simulating
+    return controller
+
+
+@pytest.fixture
+def emulator():
+    from pymodaq_plugins_tcspc_arduino.hardware.pty_emulator import \
+        PtyEmulator
+    with PtyEmulator(baudrate=460800, latency=0.001) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def controller(emulator):
+    controller = connect(emulator)
+    yield controller
+    if controller.is_acquiring:
+        controller.stop()
+    controller.disconnect()
+
+
+def test_properties(emulator, controller):
+    controller.set_property('threshold', 0.75)
+    controller.n_bins = 50
+    # settings are not answered, the queries follow them on the line
+    controller._threshold = 0.
+    assert controller.threshold == 0.75
+    assert controller.n_bins == 50 and isinstance(controller._n_bins, int)
+    assert emulator.model._n_bins == 50
+
+
+def test_single_histogram_and_rate(emulator, controller):
+    controller.n_bins = 64
+    controller.refresh = 0.05
+    controller.count_rate = 5000
+    hist = controller.get_histogram()
+    assert len(hist) == 64 and hist.sum() > 0
+    assert not emulator.acquiring
+    rate = controller.get_rate()
+    assert 2000 < rate < 10000
+
+
+def test_acquisition_and_stop(emulator, controller):
+    controller.n_bins = 100
+    controller.refresh = 0.02
+    controller.start_tcspc()
+    hists = [controller.read_histogram() for i in range(5)]
+    assert all(len(hist) == 100 for hist in hists)
+    assert controller.frame_stats['bytes'] > 100
+    controller.stop()
+    sleep(0.05)
+    # frames sent before the stop must not be taken as the answer
+    assert controller.get_property('n_bins') == 100
+
+
+def test_rates_and_tags(controller):
+    controller.refresh = 0.01
+    controller.count_rate = 100000
+    controller.start_spc()
+    sleep(0.1)
+    rates = controller.read_rates()
+    assert len(rates) >= 5
+    assert 50000 < rates.mean() < 200000
+    controller.stop()
+    sleep(0.05)
+
+    controller.start_tagger()
+    tags = controller.read_tags()
+    controller.stop()
+    assert 500 < len(tags) < 1500
+    assert np.all(np.diff(tags['time']) >= 0)
+    assert tags['time'][-1] < controller.tag_clock
+
+
+def test_slow_line_drops_whole_frames():
+    from pymodaq_plugins_tcspc_arduino.hardware.pty_emulator import \
+        PtyEmulator
+    with PtyEmulator(baudrate=19200, buffer_size=2048) as emulator:
+        controller = connect(emulator)
+        controller.n_bins = 200
+        controller.refresh = 0.05
+        controller.start_tcspc()
+        # a frame takes about 0.5 s at this rate
+        hists = [controller.read_histogram() for i in range(2)]
+        controller.stop()
+        controller.disconnect()
+    assert all(len(hist) == 200 for hist in hists)
+    assert emulator.overflows > 5
+
+
+def test_concurrent_queries(controller):
+    import asyncio
+    import threading
+    controller.n_bins = 50
+    controller.refresh = 0.2
+
+    async def query():
+        return await asyncio.gather(
+            *[controller.get_property_async(name)
+              for name in ['n_bins', 'refresh'] * 5])
+
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(
+        controller._run(query()))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert answers == [[50, 0.2] * 5] * 3
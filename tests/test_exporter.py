@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import tables
+
+from pymodaq.utils.h5modules.backends import H5Backend
+from pymodaq_plugins_tcspc_arduino.exporters.tcspc import H5TcspcExporter
+
+
+@pytest.fixture
+def scan_file(tmp_path):
+    """Scan of 6 x 5 decays saved the way PyMoDAQ does"""
+    path = tmp_path / 'scan.h5'
+    h5 = H5Backend()
+    h5.open_file(str(path), 'w')
+    raw = h5.get_set_group(h5.root(), 'RawData')
+    detector = h5.get_set_group(raw, 'Detector000')
+    h5.set_attr(detector, 'settings', '<settings>bin_size 0.05</settings>')
+    counts = np.random.default_rng(0).poisson(300., (6, 5, 100))
+    data = h5.create_carray(detector, 'Data00', counts.astype(float))
+    for key, value in [('data_type', 'data'), ('shape', counts.shape),
+                       ('label', 'counts'), ('nav_indexes', (0, 1))]:
+        data.attrs[key] = value
+    delays = np.linspace(0.1, 5., 100)
+    for index, axis in enumerate([np.arange(6.), np.arange(5.), delays]):
+        node = h5.create_carray(detector, 'Axis%02d' % index, axis)
+        node.attrs['data_type'] = 'axis'
+        node.attrs['index'] = index
+        node.attrs['shape'] = axis.shape
+    h5.close_file()
+    return path, counts, delays
+
+
+def test_export(scan_file, tmp_path):
+    path, counts, delays = scan_file
+    h5 = H5Backend()
+    h5.open_file(str(path), 'r')
+    exporter = H5TcspcExporter()
+    exporter.block_size = 5 * 100 * 8  # one row of the scan per block
+    exporter.export_data(h5.get_node('/RawData/Detector000'),
+                         str(tmp_path / 'out.h5'))
+    h5.close_file()
+
+    with tables.open_file(str(tmp_path / 'out.h5')) as out:
+        dataset = out.get_node('/Detector000/Data00')
+        assert dataset.dtype == np.uint16
+        assert dataset.chunkshape[-1] == 100
+        assert dataset.filters.complevel > 0
+        assert np.array_equal(dataset[:], counts)
+        assert 'bin_size' in out.root._v_attrs['settings']
+        edges = out.get_node(dataset._v_attrs['bin_edges'])[:]
+        assert len(edges) == 101
+        assert np.allclose((edges[1:] + edges[:-1]) / 2, delays)
+
+
+def test_nothing_to_export(tmp_path):
+    path = tmp_path / 'empty.h5'
+    h5 = H5Backend()
+    h5.open_file(str(path), 'w')
+    h5.get_set_group(h5.root(), 'RawData')
+    with pytest.raises(ValueError):
+        H5TcspcExporter().export_data(h5.get_node('/RawData'),
+                                      str(tmp_path / 'out.h5'))
+    h5.close_file()
+    assert not (tmp_path / 'out.h5').exists()
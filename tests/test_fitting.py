@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.fitting import fit_batch
+
+
+@pytest.fixture
+def synthetic_stack():
+    """Decays of the simulation model with lifetimes between 1 and 5 µs"""
+    controller = TcspcArduinoController()
+    controller._bin_size = 0.05
+    controller._offset = 0.1
+    controller._n_bins = 400
+    controller._time_zero = 0.5
+    controller._count_rate = 200
+    controller._dark_rate = 20000
+    rng = np.random.default_rng(0)
+    lifetimes = rng.uniform(1., 5., (8, 25))
+    stack = rng.poisson(controller.simulated_decay(lifetimes))
+    delays = controller._offset + controller._bin_size \
+        * (np.arange(controller._n_bins) + 0.5)
+    return stack, delays, lifetimes
+
+
+@pytest.mark.parametrize('method', ('lsq', 'mle'))
+def test_fit_batch_recovers_lifetimes(synthetic_stack, method):
+    stack, delays, lifetimes = synthetic_stack
+    result = fit_batch(stack, delays, time_zero=0.5, method=method,
+                       n_workers=1)
+    assert result['lifetime'].shape == lifetimes.shape
+    error = result['lifetime'] / lifetimes - 1
+    assert abs(np.median(error)) < 0.06
+    assert np.median(result['chi2']) == pytest.approx(1., abs=0.3)
+
+
+def test_fit_batch_chunks_agree(synthetic_stack):
+    stack, delays, _ = synthetic_stack
+    whole = fit_batch(stack, delays, time_zero=0.5, n_workers=1)
+    chunked = fit_batch(stack, delays, time_zero=0.5, n_workers=2,
+                        chunk_size=64)
+    assert np.allclose(whole['lifetime'], chunked['lifetime'])
+
+
+def test_time_zero_after_the_delays(synthetic_stack):
+    stack, delays, _ = synthetic_stack
+    with pytest.raises(ValueError):
+        fit_batch(stack, delays, time_zero=delays[-1] + 1., n_workers=1)
+    # a single bin from time zero on is enough to start from
+    result = fit_batch(stack[:1], delays, time_zero=delays[-1],
+                       n_workers=1)
+    assert np.all(np.isfinite(result['lifetime']))
@@ -0,0 +1,106 @@
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.flim import FlimAccumulator
+
+
+def hists(n_pixels, n_bins=3):
+    # every pixel histogram holds its index in its first bin
+    hists = np.zeros((n_pixels, n_bins))
+    hists[:, 0] = np.arange(1, n_pixels + 1)
+    return hists
+
+
+def test_markers():
+    accumulator = FlimAccumulator(3, 4, np.arange(3.))
+    # a line cut short by 'L', then a complete one
+    positions = accumulator.positions('FPPLPPPLP')
+    assert positions.tolist() == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert accumulator.frames == 1
+    # 'L' on the last line starts the frame over
+    assert accumulator.positions('LL').tolist() == [0, 4]
+    assert accumulator.frames == 1
+
+
+def test_assembly_wraps_around():
+    accumulator = FlimAccumulator(2, 3, np.arange(3.))
+    # markers of two frames, split across reads in the middle of lines
+    markers = 'FPPLPP' * 2
+    assert accumulator.add_pixels(markers[:4], hists(4)[:4]) == 1
+    assert accumulator.add_pixels(markers[4:], hists(12)[4:]) == 1
+    assert accumulator.frames == 2 and accumulator.completed_frames == 2
+    assert accumulator.intensity.tolist() == [[8, 10, 12], [14, 16, 18]]
+    assert accumulator.cube[..., 0].tolist() == [[8, 10, 12], [14, 16, 18]]
+    # without a frame marker, the pixel after the last one is the first
+    accumulator.add_pixels('PP', hists(2))
+    assert accumulator.intensity[0, :2].tolist() == [9, 12]
+    assert accumulator.completed_frames == 2
+    assert accumulator.add_pixels('', np.zeros((0, 3))) is None
+
+
+def simulator():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.pixel_time = 0.
+    return controller
+
+
+def test_lifetime_image():
+    controller = simulator()
+    controller.bin_size = 0.05
+    controller.offset = 0.
+    controller.n_bins = 400
+    controller.lifetime = 2.
+    controller.time_zero = 0.5
+    controller.count_rate = 100000
+    controller.dark_rate = 0
+    n_y, n_x = 6, 7
+    accumulator = FlimAccumulator(n_y, n_x, controller.get_x_axis())
+    controller.start_flim(n_x, n_y)
+    # reads of 4 pixels, not aligned to the lines, over two frames
+    for _ in range(2 * n_y * n_x // 4):
+        accumulator.add_pixels(*controller.read_pixels(4))
+    controller.stop()
+    assert accumulator.completed_frames == 2
+
+    positions = np.arange(n_y * n_x)
+    expected = 2 * controller.simulated_pixels(positions)
+    assert np.allclose(accumulator.intensity.ravel(), expected.sum(axis=1),
+                       rtol=0.01)
+    assert abs(accumulator.time_zero - 0.5) < 0.05
+    # a disk of shorter lifetime in the middle of the image
+    y, x = np.divmod(positions, n_x)
+    radius = np.hypot(y - (n_y - 1) / 2, x - (n_x - 1) / 2)
+    inside = radius < 0.3 * min(n_x, n_y)
+    lifetime = accumulator.lifetime().ravel()
+    assert np.allclose(lifetime[inside], 0.3 * 2., rtol=0.1)
+    assert np.allclose(lifetime[~inside], 2., rtol=0.05)
+    assert 0 < inside.sum() < n_y * n_x
+
+
+def test_worker_emits_cube():
+    from pymodaq.utils.data import Axis
+    from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_2D.\
+        daq_2Dviewer_tcspc_flim import FlimWorker
+
+    controller = simulator()
+    controller.n_bins = 20
+    controller.update_simulation_data()
+    worker = FlimWorker(controller)
+    dtes = []
+    temporary = []
+    worker.dte_signal.connect(dtes.append)
+    worker.dte_signal_temp.connect(temporary.append)
+    n_y, n_x = 3, 5
+    worker.start(2, Axis(data=np.arange(n_x, dtype=float), index=1),
+                 Axis(data=np.arange(n_y, dtype=float), index=0),
+                 Axis(data=controller.get_x_axis(), index=2))
+    # one update per line, the cube at the end of the second frame
+    assert len(temporary) == 2 * n_y - 1 and len(dtes) == 1
+    assert not controller.is_acquiring and not worker.worker_running
+    images, cube = dtes[0].get_data_from_name('flim'), \
+        dtes[0].get_data_from_name('cube')
+    assert cube.data[0].shape == (n_y, n_x, 20)
+    assert np.allclose(images.data[0], cube.data[0].sum(axis=-1))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.gates import TimeGates, \
+    parse_gates
+
+
+def test_parse_gates():
+    assert parse_gates('0.5:1.5, 1.5:2.5') == [(0.5, 1.5), (1.5, 2.5)]
+    assert parse_gates('') == []
+    with pytest.raises(ValueError):
+        parse_gates('1.5:0.5')
+    with pytest.raises(ValueError):
+        parse_gates('1.5')
+
+
+def test_gates_match_slicing():
+    rng = np.random.default_rng(0)
+    hist = rng.poisson(100., 400).astype(float)
+    gates = TimeGates([(0.1, 1.1), (1.1, 2.1), (5., 30.)])
+    gates.set_axis(offset=0.1, bin_size=0.05, n_bins=400)
+    gates.update(hist)
+    assert np.allclose(gates.intensities(),
+                       [hist[0:20].sum(), hist[20:40].sum(), hist[98:400].sum()])
+    assert len(gates.values()) == len(gates.labels)
+
+
+def test_rld_lifetime():
+    t = np.arange(1000) * 0.01
+    hist = 1e6 * np.exp(-t / 2.)
+    gates = TimeGates([(0., 2.), (2., 4.)])
+    gates.set_axis(offset=0., bin_size=0.01, n_bins=1000)
+    gates.update(hist)
+    assert gates.rld_available()
+    assert gates.rld_lifetime() == pytest.approx(2., rel=1e-3)
@@ -0,0 +1,101 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.fitting import fit_batch
+from pymodaq_plugins_tcspc_arduino.processing.irf import IrfLibrary
+
+
+def gaussian(bin_size, offset, n_bins, centre, width):
+    centres = offset + bin_size * (np.arange(n_bins) + 0.5)
+    return np.exp(-0.5 * ((centres - centre) / width) ** 2)
+
+
+@pytest.fixture
+def library():
+    library = IrfLibrary(max_kernels=2)
+    library.add(1000 * gaussian(0.01, 0., 200, 0.6, 0.1), 0.01, 0.)
+    return library
+
+
+def test_resample_keeps_area_and_shifts(library):
+    key = library.source(0.05, 0.1, 400)
+    for shift in (0., 0.13):
+        kernel, before = library.resample(key, 0.05, shift)
+        assert kernel.sum() == pytest.approx(1.)
+        lags = 0.05 * (np.arange(len(kernel)) - before)
+        assert kernel @ lags == pytest.approx(shift, abs=1e-3)
+        assert np.sqrt(kernel @ (lags - shift) ** 2) \
+            == pytest.approx(np.hypot(0.1, 0.05 / np.sqrt(12)), rel=0.02)
+
+
+def test_convolution_keeps_background(library):
+    convolve = library.convolution(0.05, 0.1, 400)
+    decays = np.zeros((3, 400))
+    decays[0] = 5.
+    decays[1, 100:] = 1.
+    decays[2, 200] = 1.
+    convolved = convolve(decays)
+    assert np.allclose(convolved[0], 5.)
+    assert convolved[2].sum() == pytest.approx(1.)
+    assert np.argmax(convolved[2]) == 200
+    # a step is smoothed around where it was
+    assert convolved[1, 100] == pytest.approx(0.5, abs=0.1)
+    assert np.allclose(convolved[1, :80], 0., atol=1e-9)
+    assert np.allclose(convolved[1, 120:], 1.)
+
+
+def test_kernel_cache(library):
+    first = library.convolution(0.05, 0.1, 400)
+    assert library.convolution(0.05, 0.3, 400) is first
+    assert (library.hits, library.misses) == (1, 1)
+    library.convolution(0.05, 0.1, 200)
+    library.convolution(0.05, 0.1, 400, shift=0.1)
+    # least recently used evicted beyond max_kernels
+    assert library.convolution(0.05, 0.1, 400) is not first
+    assert library.misses == 4
+    library.add(gaussian(0.05, 0.1, 400, 0.6, 0.1), 0.05, 0.1)
+    assert library.source(0.05, 0.1, 400) == (0.05, 0.1, 400)
+    restored = pickle.loads(pickle.dumps(first))
+    assert np.allclose(restored(np.eye(400)[:2]), first(np.eye(400)[:2]))
+
+
+def test_save_and_load(library, tmp_path):
+    library.save(tmp_path / 'irfs.npz')
+    loaded = IrfLibrary()
+    loaded.load(tmp_path / 'irfs.npz')
+    assert list(loaded.irfs) == list(library.irfs)
+    assert np.allclose(loaded.irfs[(0.01, 0., 200)],
+                       library.irfs[(0.01, 0., 200)])
+
+
+def test_reconvolution_fit(library):
+    """Lifetimes comparable to the response width are recovered"""
+    bin_size, offset, n_bins = 0.05, 0.1, 200
+    time_zero = 0.6
+    # decays convolved with the response on a fine grid, then binned
+    fine = 0.001
+    t = np.arange(0., 12., fine) - 3.
+    response = np.exp(-0.5 * (t / 0.1) ** 2)
+    response /= response.sum()
+    delays = offset + fine * (np.arange(int(n_bins * bin_size / fine)) + 0.5)
+    lifetimes = np.linspace(0.2, 1., 20)
+    rng = np.random.default_rng(1)
+    decays = np.where(delays >= time_zero,
+                      np.exp(-np.maximum(delays - time_zero, 0.)
+                             / lifetimes[:, np.newaxis]), 0.)
+    convolved = np.array([np.convolve(decay, response)[3000:3000
+                                                       + len(delays)]
+                          for decay in decays])
+    binned = convolved.reshape(len(lifetimes), n_bins, -1).sum(axis=2)
+    stack = rng.poisson(2000 * binned / binned.max(axis=1, keepdims=True)
+                        + 10)
+    axis = offset + bin_size * (np.arange(n_bins) + 0.5)
+
+    result = fit_batch(stack, axis, time_zero=time_zero, n_workers=1,
+                       convolve=library.convolution(bin_size, offset, n_bins))
+    assert np.all(np.abs(result['lifetime'] / lifetimes - 1) < 0.05)
+    plain = fit_batch(stack, axis, time_zero=time_zero, n_workers=1)
+    # without the response the shortest lifetimes are overestimated
+    assert np.all(plain['lifetime'][:3] / lifetimes[:3] - 1 > 0.1)
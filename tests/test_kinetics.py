@@ -0,0 +1,74 @@
+import numpy as np
+
+from pymodaq.utils.data import Axis
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.kinetics import KineticSeries
+
+
+def test_slices_of_whole_frames():
+    series = KineticSeries(4, 1., chunk_size=3)
+    for i in range(20):
+        series.add(np.full(4, i), 0.5)
+    assert series.n_slices == 10
+    assert np.allclose(series.array()[:, 0], 4 * np.arange(10) + 1)
+    assert np.allclose(series.times, np.arange(10))
+    assert np.allclose(series.newest(2)[:, 0], [33, 37])
+
+
+def test_memory_bounded_by_merging():
+    series = KineticSeries(4, 1., chunk_size=4, max_slices=8)
+    for i in range(20):
+        series.add(np.ones(4), 1.)
+    assert series.n_slices <= 8
+    assert series.slice_time == 4.
+    assert series.array().sum() + series._current.sum() == 80
+
+
+def test_reslice_keeps_counts():
+    series = KineticSeries(3, 1.)
+    for i in range(7):
+        series.add(np.full(3, i), 1.)
+    slices, times = series.reslice(3)
+    assert slices.shape == (3, 3)
+    assert np.allclose(slices[:, 0], [3, 12, 6])
+    assert np.allclose(times, [0, 3, 6])
+
+
+def test_times_follow_whole_frames():
+    # slices of 1 s made of 0.3 s frames last 1.2 s
+    series = KineticSeries(2, 1., max_slices=4)
+    for i in range(12):
+        series.add(np.ones(2), 0.3)
+    assert np.allclose(series.durations, [1.2, 1.2, 1.2])
+    assert np.allclose(series.times, [0., 1.2, 2.4])
+    assert np.allclose(series.reslice(2)[1], [0., 2.4])
+    for i in range(4):
+        series.add(np.ones(2), 0.3)
+    # merged slices keep the sum of their durations
+    assert series.coarsenings == 1
+    assert np.allclose(series.durations, [2.4, 2.4])
+    assert np.allclose(series.times, [0., 2.4])
+
+
+def test_kinetic_worker_stops_after_n_slices():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.n_bins = 4
+    controller.refresh = 0.03
+    controller.update_simulation_data()
+    worker = TcspcWorker(controller)
+    results = []
+    worker.dte_signal.connect(results.append)
+    x_axis = Axis('Time', units='µs', data=controller.get_x_axis(), index=0)
+    worker.start_kinetic(0.1, 4, 10, 4, x_axis)
+    assert len(results) == 1
+    # four slices of four frames, merged in pairs to bound the memory
+    assert worker.series.coarsenings == 1
+    assert np.allclose(worker.series.durations, [0.24, 0.24])
+    times = results[0].get_data_from_dim('Data2D')[0].get_axis_from_index(0)[0]
+    assert np.allclose(times.get_data(), [0., 0.24])
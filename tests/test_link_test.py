@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.link_test import LinkSelfTest
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32',
+                                reason='pseudo terminals need POSIX')
+
+
+@pytest.fixture
+def emulator():
+    from pymodaq_plugins_tcspc_arduino.hardware.pty_emulator import \
+        PtyEmulator
+    # seeded, so that the same bytes are corrupted on every run
+    with PtyEmulator(max_baudrate=230400, error_rate=5e-3,
+                     seed=0) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def controller(emulator):
+    controller = TcspcArduinoController()
+    controller.port = emulator.port
+    controller.connect()
+    assert not controller.simulating
+    yield controller
+    controller.disconnect()
+
+
+def test_simulation_has_no_link():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    with pytest.raises(RuntimeError):
+        LinkSelfTest(controller).run()
+
+
+def test_ping(controller):
+    assert controller.ping() is not None
+
+
+def test_selects_fastest_reliable_rate(emulator, controller):
+    link_test = LinkSelfTest(controller, [115200, 230400, 460800],
+                             n_frames=20, frame_size=128)
+    assert link_test.run(store=False) == 230400
+    assert link_test.results[460800]['errors'] > 0
+    assert link_test.results[115200]['throughput'] \
+        < link_test.results[230400]['throughput']
+    assert controller.serial.baudrate == emulator.baudrate == 230400
+
+
+def test_unconfirmed_rate_falls_back(emulator, controller):
+    emulator.error_rate = 1.
+    assert not controller.set_baudrate(460800)
+    assert controller.serial.baudrate == emulator.baudrate == 115200
@@ -0,0 +1,43 @@
+import pytest
+
+from pymodaq.utils.data import DataActuator
+
+from pymodaq_plugins_tcspc_arduino.daq_move_plugins.daq_move_tcspc_arduino \
+    import DAQ_Move_tcspc_arduino
+
+
+@pytest.fixture
+def actuator():
+    actuator = DAQ_Move_tcspc_arduino()
+    actuator.settings['device_id'] = ''
+    actuator.ini_stage()
+    sent = []
+    actuator.controller.set_property = lambda name, value: \
+        sent.append((name, value))
+    actuator.sent = sent
+    return actuator
+
+
+def test_cached_value_sends_nothing(actuator):
+    actuator.move_abs(DataActuator(data=0.5, units='mV'))
+    # within the epsilon of the threshold
+    actuator.move_abs(DataActuator(data=0.5004, units='mV'))
+    assert actuator.sent == []
+    actuator.move_abs(DataActuator(data=0.75, units='mV'))
+    assert actuator.sent == [('threshold', 0.75)]
+
+
+def test_epsilon_per_axis(actuator):
+    actuator.axis_name = 'offset'
+    assert actuator.epsilon == 0.0001
+    actuator.move_abs(DataActuator(data=0.1004, units='µs'))
+    assert actuator.sent == [('offset', 0.1004)]
+
+
+def test_relative_move_sends_scaled_target(actuator):
+    # board value of a user value, as set by the scaling settings
+    actuator.set_position_with_scaling = lambda position: position * 2.
+    actuator.current_value = DataActuator(data=0.25, units='mV')
+    actuator.move_rel(DataActuator(data=0.125, units='mV'))
+    assert actuator.target_value.value() == pytest.approx(0.375)
+    assert actuator.sent == [('threshold', pytest.approx(0.75))]
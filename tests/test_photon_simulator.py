@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.photon_simulator import \
+    PhotonSimulator, dead_time_filter
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.corrections import coates
+
+
+def test_dead_time_filter_matches_loop():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0., 1000., 5000))
+    expected = []
+    last = -np.inf
+    for t in times:
+        expected.append(t > last + 0.5)
+        if expected[-1]:
+            last = t
+    assert np.array_equal(dead_time_filter(times, 0.5), expected)
+    assert np.all(dead_time_filter(times, 0.))
+
+
+def test_detector_dead_time_rate():
+    """Non-paralysable dead time: detected rate R / (1 + R dead_time)"""
+    simulator = PhotonSimulator(count_rate=0., dark_rate=5e6,
+                                detector_dead_time=0.05, batch_size=200000,
+                                seed=1)
+    rates = simulator.rates(0.01, 20)
+    assert len(rates) == 20
+    assert rates.mean() == pytest.approx(5e6 / (1 + 5e6 * 0.05e-6),
+                                         rel=0.01)
+    assert simulator.time == pytest.approx(0.2e6)
+
+
+def test_late_photons_carried_over():
+    simulator = PhotonSimulator(count_rate=1e5, dark_rate=0., lifetime=50.,
+                                excitation_rate=1e5, detector_dead_time=0.,
+                                batch_size=1000, seed=2)
+    rates = simulator.rates(0.01, 50)
+    # photons of the first pulses are missing until the decay is reached
+    assert rates[10:].mean() == pytest.approx(1e5, rel=0.02)
+
+
+@pytest.mark.parametrize('tdc_dead_time', (0., 2., 15.))
+def test_pile_up_corrected(tdc_dead_time):
+    simulator = PhotonSimulator(count_rate=1e5, dark_rate=0., lifetime=1.,
+                                time_zero=0.5, excitation_rate=1e5,
+                                detector_dead_time=0.02,
+                                tdc_dead_time=tdc_dead_time, bin_size=0.02,
+                                offset=0., n_bins=200, seed=3)
+    hist = simulator.histogram(1.)
+    stats = simulator.stats
+    assert hist.sum() <= stats['recorded'] <= stats['pulses']
+    delays = 0.02 * (np.arange(200) + 0.5)
+    fitted = (delays > 0.7) & (delays < 3.5)
+
+    def lifetime(counts):
+        return -1 / np.polyfit(delays[fitted], np.log(counts[fitted]), 1)[0]
+
+    # about one photon per pulse, the later ones are lost
+    assert lifetime(hist) < 0.85
+    started = stats['pulses'] - stats['ignored']
+    if tdc_dead_time > simulator.period:
+        assert stats['ignored'] > 0
+    assert lifetime(coates(hist, started)) == pytest.approx(1., rel=0.03)
+
+
+def test_tags_dead_time():
+    simulator = PhotonSimulator(count_rate=1e6, dark_rate=0.,
+                                excitation_rate=1e6, lifetime=0.2,
+                                time_zero=0.1, offset=0., bin_size=0.01,
+                                n_bins=100, tdc_dead_time=2., seed=4)
+    first = simulator.tags(0.05)
+    second = simulator.tags(0.05)
+    tags = np.concatenate((first, second))
+    times = tags['time'] * simulator.tag_resolution
+    assert np.all(np.diff(times) >= 2. - simulator.tag_resolution)
+    assert len(tags) == pytest.approx(0.1 * 1e6 / (1 + 1e6 * 2e-6), rel=0.02)
+    assert np.all(second['time'] >= 0.05e6 / simulator.tag_resolution)
+    assert np.all((tags['delay'] >= -1) & (tags['delay'] < 100))
+
+
+def test_controller_photon_simulation():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.photon_simulation = True
+    controller.refresh = 0.1
+    controller.n_bins = 50
+    controller.lifetime = 1.
+    controller.count_rate = 20000
+    controller.dark_rate = 1000
+    hist = controller.simulated_histogram()
+    assert len(hist) == 50
+    # 2000 photons, 88 % of them within the bins, less pile-up losses
+    assert 1400 < hist.sum() < 1900
+    assert controller.simulated_rates(3).shape == (3,)
+
+    controller.start_tagger()
+    tags = controller.simulated_tags()
+    controller.stop()
+    assert tags['time'][-1] < controller.tag_clock
+    assert controller.photon_simulator.time \
+        == pytest.approx(controller.tag_clock * controller.tag_resolution)
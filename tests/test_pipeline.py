@@ -0,0 +1,63 @@
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.processing.pipeline import TcspcPipeline
+
+
+def decay(delays, lifetime, start=1.):
+    return np.where(delays >= start,
+                    1e4 * np.exp(-(delays - start) / lifetime), 0.) + 10.
+
+
+def test_accumulation_and_rate_trace():
+    pipeline = TcspcPipeline(trace_length=3)
+    pipeline.set_axis(np.arange(4.))
+    for i in range(5):
+        pipeline.add_frame(np.full(4, i), 0.5)
+    assert np.allclose(pipeline.total, 10)
+    assert np.allclose(pipeline.current, 4)
+    times, rates = pipeline.rate_trace()
+    assert np.allclose(rates, [16, 24, 32])
+    assert np.all(np.diff(times) >= 0)
+
+
+def test_new_axis_starts_over():
+    pipeline = TcspcPipeline()
+    pipeline.set_axis(np.arange(4.))
+    pipeline.add_frame(np.ones(4), 1.)
+    pipeline.set_axis(np.arange(4.))
+    assert pipeline.n_frames == 1
+    pipeline.set_axis(np.arange(5.))
+    assert pipeline.n_frames == 0 and len(pipeline.total) == 5
+
+
+def test_gates_and_lifetime():
+    delays = np.linspace(0., 20., 2001)
+    pipeline = TcspcPipeline()
+    pipeline.set_axis(delays)
+    assert np.isnan(pipeline.lifetime())
+    assert len(pipeline.gate_values()) == 0
+    pipeline.set_gates([(1., 2.), (2., 3.)])
+    pipeline.add_frame(decay(delays, 2.), 1.)
+    assert abs(pipeline.lifetime() - 2.) < 0.05
+    # intensities, ratio and RLD lifetime
+    values = pipeline.gate_values()
+    assert len(values) == 4
+    assert abs(values[-1] - 2.) < 0.1
+
+
+def test_decay_view():
+    delays = np.linspace(0., 100., 10001)
+    pipeline = TcspcPipeline()
+    pipeline.set_axis(delays)
+    pipeline.add_frame(decay(delays, 20.), 1.)
+    pipeline.add_frame(decay(delays, 20.), 1.)
+    view_delays, current, total, total_min, total_max = \
+        pipeline.decay_view(max_points=1000)
+    assert len(view_delays) <= 1000
+    assert np.all(total_min <= total) and np.all(total <= total_max)
+    assert np.allclose(total, 2 * current)
+    assert np.isclose((total * np.diff(view_delays, append=100.)).sum()
+                      / (pipeline.total.sum() * 0.01), 1., rtol=0.05)
+    view_delays, current, total, _, _ = pipeline.decay_view(10., 12.)
+    assert np.isclose(view_delays[0], 10.) and np.isclose(view_delays[-1], 12.)
+    assert np.allclose(total, pipeline.total[1000:1201])
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from pymodaq.utils.data import Axis
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker, DAQ_1DViewer_tcspc_arduino
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+class ScriptedBoard:
+    """Answers read_point with a list of frames, then an error or a stop"""
+
+    def __init__(self, indices, error=None):
+        self.frames = [(index, np.full(4, float(index))) for index in indices]
+        self.error = error
+        self.worker = None
+        self.stopped = False
+
+    def read_point(self):
+        if len(self.frames) > 0:
+            return self.frames.pop(0)
+        if self.error is not None:
+            raise self.error
+        self.worker.stop()
+        return None
+
+    def stop(self):
+        self.stopped = True
+
+
+def run(board):
+    worker = TcspcWorker(board)
+    board.worker = worker
+    points, messages, ended = [], [], []
+    worker.dte_signal.connect(lambda dte: points.append(
+        int(dte.get_data_from_name('point')[0][0])))
+    worker.status_signal.connect(messages.append)
+    worker.pipeline_ended.connect(lambda: ended.append(True))
+    worker.start_pipeline(Axis('Time', units='µs', data=np.arange(4.),
+                               index=0))
+    assert board.stopped and not worker.worker_running and ended == [True]
+    return points, messages
+
+
+def test_frames_in_point_order():
+    points, messages = run(ScriptedBoard([1, 0, 3, 2, 4]))
+    assert points == [0, 1, 2, 3, 4]
+    assert messages == ["Waiting for point 0, received 1",
+                        "Waiting for point 2, received 3"]
+
+
+def test_late_frames_are_discarded():
+    points, messages = run(ScriptedBoard([0, 1, 0, 2]))
+    assert points == [0, 1, 2]
+    assert messages == ["Discarded late frame of point 0"]
+
+
+def test_link_error_ends_scan():
+    points, messages = run(ScriptedBoard([0, 1],
+                                         TimeoutError("Incomplete frame")))
+    assert points == [0, 1]
+    assert messages == ["Pipelined scan ended at point 2: Incomplete frame"]
+    # the viewer arms the board again at the next point
+    viewer = SimpleNamespace(armed=True)
+    DAQ_1DViewer_tcspc_arduino.disarm(viewer)
+    assert not viewer.armed
+
+
+def test_software_triggers():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.update_simulation_data()
+    controller.refresh = 0.01
+    controller.arm(external=False)
+    for _ in range(3):
+        controller.trigger()
+    worker = TcspcWorker(controller)
+    points = []
+
+    def received(dte):
+        points.append(int(dte.get_data_from_name('point')[0][0]))
+        if len(points) == 3:
+            worker.stop()
+
+    worker.dte_signal.connect(received)
+    worker.start_pipeline(Axis('Time', units='µs',
+                               data=controller.get_x_axis(), index=0))
+    assert points == [0, 1, 2]
+    assert not controller.is_acquiring
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from pymodaq.utils.data import Axis
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.precision import \
+    PrecisionEstimator
+
+
+def decay(n_counts, background=0., n_before=0, lifetime=1., bin_size=0.01,
+          n_bins=2000):
+    """Expected counts of an exponential decay starting at bin n_before"""
+    t = bin_size * np.arange(n_bins - n_before)
+    counts = n_counts * (1 - np.exp(-bin_size / lifetime)) \
+        * np.exp(-t / lifetime)
+    return np.concatenate((np.zeros(n_before), counts)) + background
+
+
+def test_intensity_precision():
+    hist = decay(10000., background=2., n_before=100)
+    estimator = PrecisionEstimator('intensity', guard=3)
+    signal = hist[100:].sum() - 2. * 1900
+    assert estimator.relative_precision(hist) \
+        == pytest.approx(np.sqrt(hist[100:].sum()) / signal)
+    assert estimator.relative_precision(np.zeros(100)) == np.inf
+
+
+def test_lifetime_precision():
+    """The lifetime of N photons is known to 1 / sqrt(N)"""
+    estimator = PrecisionEstimator('lifetime')
+    estimator.set_axis(0.01 * np.arange(2000))
+    for n_counts in (1e4, 1e6):
+        assert estimator.relative_precision(decay(n_counts)) \
+            == pytest.approx(1 / np.sqrt(n_counts), rel=0.02)
+
+
+def test_stops_at_target():
+    estimator = PrecisionEstimator('intensity', target=0.01)
+    # the precision improves as the square root of the counts
+    assert not estimator.is_precise(decay(5000.))
+    assert estimator.is_precise(decay(20000.))
+    with pytest.raises(ValueError):
+        PrecisionEstimator('phase')
+
+
+@pytest.fixture
+def controller():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller._refresh = 0.02
+    controller._n_bins = 50
+    controller.update_simulation_data()
+    return controller
+
+
+@pytest.mark.parametrize('min_time', (0., 0.2))
+def test_worker_waits_min_time(controller, min_time):
+    worker = TcspcWorker(controller)
+    # precise from the first frame on
+    worker.precision = PrecisionEstimator('intensity', target=1.)
+    worker.min_time = min_time
+    saved = []
+    worker.dte_signal.connect(saved.append)
+    worker.start(50, 0, 0, Axis('Time', units='µs',
+                                data=controller.get_x_axis(), index=0))
+    assert len(saved) == 1
+    elapsed = saved[0].get_data_from_name('precision')[1][0]
+    assert elapsed >= min_time
+    if min_time == 0:
+        assert controller.acquisition_counter == 1
+    else:
+        assert controller.acquisition_counter > 1
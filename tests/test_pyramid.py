@@ -0,0 +1,47 @@
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.processing.pyramid import HistogramPyramid
+
+
+def test_levels_match_direct_reduction():
+    rng = np.random.default_rng(1)
+    hist = rng.poisson(20., 37).astype(float)
+    pyramid = HistogramPyramid(len(hist))
+    pyramid.set(hist)
+    assert len(pyramid.levels[-1]['sum']) == 1
+    for level, arrays in enumerate(pyramid.levels):
+        width = 2 ** level
+        chunks = [hist[i:i + width] for i in range(0, len(hist), width)]
+        assert np.allclose(arrays['sum'], [c.sum() for c in chunks])
+        assert np.allclose(arrays['min'], [c.min() for c in chunks])
+        assert np.allclose(arrays['max'], [c.max() for c in chunks])
+
+
+def test_incremental_add_equals_set():
+    rng = np.random.default_rng(2)
+    pyramid = HistogramPyramid(100)
+    total = np.zeros(100)
+    for i in range(20):
+        frame = np.zeros(100)
+        start = rng.integers(0, 90)
+        frame[start:start + 10] = rng.poisson(3., 10)
+        total += frame
+        pyramid.add(frame)
+    reference = HistogramPyramid(100)
+    reference.set(total)
+    for level, expected in zip(pyramid.levels, reference.levels):
+        for key in ['min', 'max', 'sum']:
+            assert np.allclose(level[key], expected[key])
+
+
+def test_view_size_is_bounded():
+    pyramid = HistogramPyramid(10000)
+    pyramid.set(np.ones(10000))
+    level, first, mins, maxs, sums = pyramid.view(0, 10000, 1000)
+    assert len(sums) <= 1000 and first == 0
+    assert np.allclose(sums, 2 ** level)
+    level, first, mins, maxs, sums = pyramid.view(1000, 1200, 1000)
+    assert level == 0 and first == 1000 and len(sums) == 200
+    level, first, mins, maxs, sums = pyramid.view(1001, 9000, 100)
+    assert len(sums) <= 101 and first <= 1001
+    assert first + len(sums) * 2 ** level >= 9000
@@ -0,0 +1,54 @@
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.processing.refresh_tuner import \
+    RefreshTuner
+
+
+def tuned(count_rate, baudrate, n_bins=100, parse=0., refresh=0.2,
+          **kwargs):
+    """Refresh chosen after a few frames of count_rate over baudrate"""
+    tuner = RefreshTuner(**kwargs)
+    for _ in range(5):
+        n_bytes = tuner.predicted_bytes(refresh, n_bins, count_rate)
+        stats = { 'refresh': refresh, 'bytes': n_bytes,
+                  'read': 10. * n_bytes / baudrate + parse,
+                  'counts': count_rate * refresh }
+        tuner.update(stats, n_bins, baudrate)
+    return tuner.operating_point['refresh']
+
+
+@pytest.mark.parametrize('count_rate', (1e2, 1e5, 1e8))
+@pytest.mark.parametrize('baudrate', (1200, 115200, 2000000))
+def test_refresh_within_limits(count_rate, baudrate):
+    refresh = tuned(count_rate, baudrate, n_bins=1000, min_refresh=0.1,
+                    max_refresh=1.)
+    assert 0.1 <= refresh <= 1.
+
+
+def test_refresh_follows_link_load():
+    # a fast link leaves the whole latency to the frame, whatever the counts
+    assert tuned(1e4, 2000000) == pytest.approx(0.5, rel=0.02)
+    assert tuned(1e7, 2000000) == pytest.approx(tuned(1e3, 2000000),
+                                                rel=0.01)
+    # transfer and parse times are taken from the latency
+    assert tuned(1e3, 19200) < 0.4
+    assert tuned(1e4, 19200, parse=0.1) < tuned(1e4, 19200)
+    # until the frame is as long as its transfer, which grows with the
+    # digits per bin
+    assert tuned(1e7, 9600) > tuned(1e3, 9600)
+
+
+def test_frame_not_shorter_than_its_transfer():
+    refresh = tuned(1e6, 2400, min_refresh=0.01, max_refresh=10.)
+    tuner = RefreshTuner()
+    size = tuner.predicted_bytes(refresh, 100, 1e6)
+    assert refresh >= 10. * size / 2400 * 0.99
+
+
+def test_hysteresis():
+    tuner = RefreshTuner(target_latency=0.5, hysteresis=0.2)
+    stats = { 'refresh': 0.45, 'bytes': 300, 'read': 300 * 10 / 2000000,
+              'counts': 1000 }
+    assert tuner.update(stats, 100, 2000000) is None
+    stats['refresh'] = 0.2
+    assert tuner.update(stats, 100, 2000000) == pytest.approx(0.5, rel=0.02)
@@ -0,0 +1,59 @@
+import multiprocessing
+import uuid
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.streaming.shared_memory import \
+    HistogramPublisher, HistogramReader
+
+
+@pytest.fixture
+def name():
+    return 'tcspc_test_%s' % uuid.uuid4().hex[:8]
+
+
+def _read_frames(name, n_frames, queue):
+    # every frame consists of constant histograms, torn reads would mix them
+    torn = 0
+    frames = set()
+    with HistogramReader(name) as reader:
+        while len(frames) < n_frames:
+            settings, current, total = reader.read()
+            if len(current) == 0:
+                continue
+            torn += np.ptp(current) != 0 or np.any(total != 2 * current)
+            frames.add(settings['frame'])
+    queue.put(torn)
+
+
+def test_publish_and_read(name):
+    with HistogramPublisher(name, max_bins=100) as publisher:
+        publisher.publish(np.arange(10.), np.arange(10.) * 2, offset=0.1,
+                          bin_size=0.05, refresh=0.5)
+        with HistogramReader(name) as reader:
+            settings, current, total = reader.read()
+            assert settings['n_bins'] == 10
+            assert settings['bin_size'] == 0.05
+            assert np.allclose(total, 2 * current)
+            assert not reader.new_frame()
+            _, view, _, sequence = reader.views()
+            publisher.publish(np.ones(10), np.ones(10))
+            assert reader.new_frame()
+            assert not reader.valid(sequence)
+            assert view[0] == 1
+
+
+def test_no_torn_reads_across_processes(name):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    with HistogramPublisher(name, max_bins=5000) as publisher:
+        publisher.publish(np.zeros(5000), np.zeros(5000))
+        reader = context.Process(target=_read_frames, args=(name, 50, queue))
+        reader.start()
+        i = 0
+        while reader.is_alive():
+            i += 1
+            publisher.publish(np.full(5000, i), np.full(5000, 2 * i))
+        reader.join()
+    assert queue.get(timeout=1) == 0
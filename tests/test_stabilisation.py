@@ -0,0 +1,60 @@
+from time import perf_counter, sleep
+
+import numpy as np
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.stabilisation import \
+    RateEstimator, LoopTimer
+
+
+def test_batches_match_sample_by_sample():
+    rng = np.random.default_rng(1)
+    rates = rng.poisson(1000, 50) / 0.01
+    durations = np.full(50, 0.01)
+    batch = RateEstimator(0.1, threshold=0.)
+    single = RateEstimator(0.1, threshold=0.)
+    batch.update(rates[:7], durations[:7])
+    batch.update(rates[7:], durations[7:])
+    for rate, duration in zip(rates, durations):
+        single.update(rate, duration)
+    assert np.isclose(batch.estimate, single.estimate)
+    assert abs(batch.estimate - 1e5) < 3e3
+
+
+def test_step_followed_within_one_sample():
+    estimator = RateEstimator(1., threshold=5.)
+    estimator.update(np.full(20, 1e4), 0.01)
+    assert estimator.update(2e4, 0.01) == 2e4
+    assert estimator.n_steps == 1
+    # noise does not reset the average
+    estimator.update(2e4 + np.sqrt(2e4 / 0.01), 0.01)
+    assert estimator.n_steps == 1
+
+
+def test_loop_timer():
+    timer = LoopTimer(4)
+    assert np.isnan(timer.period())
+    for _ in range(6):
+        timer.tick()
+        sleep(0.01)
+    assert timer.n_periods == 5
+    assert 0.009 < timer.period() < 0.05
+    assert timer.jitter() < timer.period()
+
+
+def test_pending_rates_are_read_at_once():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.update_simulation_data()
+    controller.refresh = 0.01
+    controller.start_spc()
+    assert len(controller.read_rates()) == 1
+    start = perf_counter()
+    sleep(0.055)
+    rates = controller.read_rates()
+    # the sleep may last longer on a loaded machine
+    assert 4 <= len(rates) <= (perf_counter() - start) / 0.01 + 1
+    assert controller.acquisition_counter == 1 + len(rates)
+    controller.stop()
@@ -0,0 +1,63 @@
+import sys
+from time import sleep
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.streaming.server import StreamServer, \
+    StreamClient, HISTOGRAMS, TAGS
+
+
+def wait_for_clients(server, n_clients):
+    for _ in range(100):
+        if len(server.clients) == n_clients:
+            return
+        sleep(0.01)
+    raise TimeoutError
+
+
+def test_histograms_and_tags():
+    with StreamServer('127.0.0.1:0') as server:
+        address = '127.0.0.1:%d' % server.address[1]
+        with StreamClient(address, timeout=5) as client:
+            wait_for_clients(server, 1)
+            server.send_histograms(np.arange(5.), np.arange(5.) * 2, 0.1, 0.05)
+            tags = np.zeros(3, dtype=TcspcArduinoController.tag_dtype)
+            tags['time'] = [1, 5, 9]
+            server.send_tags(tags)
+
+            info, (current, total) = client.read_frame()
+            assert info['kind'] == HISTOGRAMS
+            assert info['bin_size'] == 0.05
+            assert np.allclose(total, 2 * current)
+            info, (received,) = client.read_frame()
+            assert info['kind'] == TAGS and info['frame'] == 2
+            assert np.array_equal(received['time'], [1, 5, 9])
+
+
+def test_slow_client_drops_oldest_frames():
+    with StreamServer('127.0.0.1:0', queue_size=4) as server:
+        address = '127.0.0.1:%d' % server.address[1]
+        with StreamClient(address, timeout=5) as slow, \
+             StreamClient(address, timeout=5) as fast:
+            wait_for_clients(server, 2)
+            # large frames fill the socket buffers of the slow client
+            n_frames = 200
+            for i in range(n_frames):
+                server.send_histograms(np.full(100000, i), np.zeros(100000))
+                assert fast.read_frame()[0]['frame'] == i + 1
+            assert max(server.dropped) > 0
+            frames = [slow.read_frame()[0]['frame'] for _ in range(5)]
+            assert frames == sorted(frames)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Unix sockets')
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / 'tcspc.sock')
+    with StreamServer(path) as server:
+        with StreamClient(path, timeout=5) as client:
+            wait_for_clients(server, 1)
+            server.send_histograms(np.ones(3), np.ones(3))
+            assert np.allclose(client.read_frame()[1][0], 1.)
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+
+
+def test_sweep_thresholds_include_stop():
+    thresholds = TcspcArduinoController.sweep_thresholds(-1., 1., 0.1)
+    assert len(thresholds) == 21
+    assert np.isclose(thresholds[-1], 1.)
+
+
+def test_simulated_discriminator_curve():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.update_simulation_data()
+    controller.count_rate = 1000000
+    thresholds, counts = controller.threshold_sweep(-1., 5., 0.25, 0.001)
+    assert len(counts) == len(thresholds) == 25
+    # noise peak at 0 mV, photon plateau below the pulse height
+    assert np.argmax(counts) == np.argmin(np.abs(thresholds))
+    plateau = counts[(thresholds > 1.2) & (thresholds < 1.5)]
+    assert np.all(plateau > 500)
+    assert counts[-1] < 10
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='pseudo terminals')
+def test_sweep_reply_is_read_in_bulk():
+    import tty
+    from serial import Serial
+    from pymodaq_plugins_tcspc_arduino.hardware.serial_transport import \
+        SerialTransport
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    controller = TcspcArduinoController()
+    controller.serial = Serial(os.ttyname(slave), timeout=1.)
+    controller.transport = SerialTransport(controller.serial)
+    expected = np.arange(11, dtype='<u4') * 1000
+
+    def board():
+        command = b''
+        while not command.endswith(b'\r'):
+            command += os.read(master, 100)
+        assert command.split()[0] == b'sweep'
+        os.write(master, b'sweep 11\r\n' + expected.tobytes())
+
+    thread = threading.Thread(target=board)
+    thread.start()
+    try:
+        thresholds, counts = controller.threshold_sweep(0., 1., 0.1, 0.001)
+    finally:
+        thread.join()
+        controller.serial.close()
+        os.close(master)
+        os.close(slave)
+    assert np.allclose(thresholds, np.linspace(0., 1., 11))
+    assert np.array_equal(counts, expected)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='pseudo terminals')
+def test_sweep_waits_for_the_line():
+    import select
+    import tty
+    from serial import Serial
+    from pymodaq_plugins_tcspc_arduino.hardware.serial_transport import \
+        SerialTransport
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    controller = TcspcArduinoController()
+    controller.serial = Serial(os.ttyname(slave), timeout=1.)
+    controller.transport = SerialTransport(controller.serial)
+    results = []
+    sweep = threading.Thread(target=lambda: results.append(
+        controller.threshold_sweep(0., 1., 0.5, 0.001)))
+    # a query of another thread holds the line
+    controller._property_lock.acquire()
+    sweep.start()
+    try:
+        written = select.select([master], [], [], 0.1)[0]
+        controller._property_lock.release()
+        assert written == []
+        command = b''
+        while not command.endswith(b'\r'):
+            command += os.read(master, 100)
+        assert command.split()[0] == b'sweep'
+        os.write(master, b'sweep 3\r\n'
+                 + np.arange(3, dtype='<u4').tobytes())
+    finally:
+        sweep.join()
+        controller.serial.close()
+        os.close(master)
+        os.close(slave)
+    assert np.array_equal(results[0][1], np.arange(3))
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from pymodaq.utils.data import Axis
+
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_1D.\
+    daq_1Dviewer_tcspc_arduino import TcspcWorker
+from pymodaq_plugins_tcspc_arduino.daq_viewer_plugins.plugins_2D.\
+    daq_2Dviewer_tcspc_flim import FlimWorker
+from pymodaq_plugins_tcspc_arduino.hardware.tcspc_arduino_controller import \
+    TcspcArduinoController
+from pymodaq_plugins_tcspc_arduino.processing.checkpoint import \
+    AccumulationCheckpoint
+from pymodaq_plugins_tcspc_arduino.processing.corrections import \
+    HistogramCorrector
+
+
+@pytest.fixture
+def controller():
+    controller = TcspcArduinoController()
+    controller.port = ''
+    controller.connect()
+    controller.n_bins = 20
+    controller.refresh = 0.01
+    controller.pixel_time = 0.
+    controller.update_simulation_data()
+    return controller
+
+
+def fail_after(controller, name, n_frames):
+    """Make a read method of the controller fail after n_frames frames"""
+    read = getattr(controller, name)
+    calls = []
+
+    def failing(*args):
+        calls.append(True)
+        if len(calls) > n_frames:
+            raise TimeoutError("Incomplete frame")
+        return read(*args)
+
+    setattr(controller, name, failing)
+
+
+def delay_axis(controller):
+    return Axis('Time', units='µs', data=controller.get_x_axis(), index=0)
+
+
+def run(worker, start, *args):
+    messages = []
+    worker.status_signal.connect(messages.append)
+    start(*args)
+    assert not worker.worker_running
+    assert not worker.controller.is_acquiring
+    assert len(messages) == 1 and messages[0].endswith("Incomplete frame")
+    return messages[0]
+
+
+def test_accumulation_saves_checkpoint(controller, tmp_path):
+    fail_after(controller, 'read_histogram', 3)
+    worker = TcspcWorker(controller)
+    worker.checkpoint = AccumulationCheckpoint(tmp_path / 'checkpoint.bin',
+                                               interval=100.)
+    message = run(worker, worker.start, 20, 0, 0, delay_axis(controller))
+    assert message.startswith("Acquisition ended after 3 frames")
+    state, total = worker.checkpoint.load()
+    assert state['n_frames'] == 3 and np.allclose(total, worker.last_total)
+    worker.checkpoint.close()
+    worker.checkpoint = None
+    # the worker accepts the next grab
+    fail_after(controller, 'read_histogram', 0)
+    run(worker, worker.start, 20, 0, 0, delay_axis(controller))
+
+
+@pytest.mark.parametrize('mode', ('correlation', 'bursts'))
+def test_tag_modes(controller, mode):
+    fail_after(controller, 'read_tags', 2)
+    worker = TcspcWorker(controller)
+    if mode == 'correlation':
+        run(worker, worker.start_correlation, 4, 4, 1, 0.)
+    else:
+        run(worker, worker.start_bursts, 5, 10., 5, 0.,
+            delay_axis(controller))
+
+
+def test_kinetic_series(controller):
+    fail_after(controller, 'read_histogram', 2)
+    worker = TcspcWorker(controller)
+    run(worker, worker.start_kinetic, 0.01, 0, 10, 100,
+        delay_axis(controller))
+
+
+def test_flim(controller):
+    fail_after(controller, 'read_pixels', 2)
+    worker = FlimWorker(controller)
+    message = run(worker, worker.start, 1,
+                  Axis(data=np.arange(4.), index=1),
+                  Axis(data=np.arange(3.), index=0), delay_axis(controller))
+    assert message.startswith("FLIM ended after 0 frames")
+
+
+def test_resumed_accumulation_keeps_corrected_total(controller, tmp_path):
+    path = tmp_path / 'checkpoint.bin'
+    fail_after(controller, 'read_histogram', 3)
+    worker = TcspcWorker(controller)
+    worker.checkpoint = AccumulationCheckpoint(path, interval=100.)
+    run(worker, worker.start, 20, 0, 0, delay_axis(controller))
+    worker.checkpoint.close()
+
+    del controller.read_histogram
+    fail_after(controller, 'read_histogram', 5)
+    worker = TcspcWorker(controller)
+    worker.checkpoint = AccumulationCheckpoint(path, interval=100.)
+    worker.resume = True
+    # corrections changing no count
+    worker.corrector = HistogramCorrector(pile_up=False, dnl=False,
+                                          background=False)
+    results = []
+    worker.dte_signal_temp.connect(results.append)
+    worker.status_signal.connect(results.append)
+    worker.start(20, 0, 0, delay_axis(controller))
+    worker.checkpoint.close()
+    assert results[0].startswith("Resumed 3 frames")
+    corrected = results[-2].get_data_from_name('tcspc corrected')
+    assert np.allclose(corrected[1], worker.last_total)